@@ -1,38 +1,56 @@
 import os
-from groq import Groq
+import time
+import asyncio
 import json
+from functools import partial
 from dotenv import load_dotenv
 
-# Load environment variables FIRST
-load_dotenv()
+# Run on its own this module reads .env itself (app.py loads it before
+# importing us); before the imports below, which read their settings
+if __name__ == "__main__":
+    load_dotenv()
 
-# THEN initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+from cache import generation_cache, make_cache_key, CACHE_USE, CACHE_BYPASS
+from similarity import similarity_index
+from stream_parser import StreamingCodeParser, SECTIONS
+from extractor import extract_code
+from singleflight import inflight, make_key
+from history import history_manager, estimate_tokens
+from log_writer import generation_logs
+from prompts import (
+    resolve_component_type, detect_theme, get_ui_generation_prompt, get_patch_prompt,
+    get_modification_prompt
+)
+from metrics import (
+    label_scope, stage, record_stage, count_tokens, count_parse_fallback, count_failure,
+    count_route, count_truncation
+)
+from patching import (
+    PatchError, select_sections, parse_patch, apply_patch, validate_patch_result
+)
+from upstream import UpstreamClient
+from router import model_router
+from budget import output_budget, continuation_messages
+from admission import admission, as_rejection
 
-# Model to use (Groq's fastest and best model for code)
-MODEL = "llama-3.3-70b-versatile"
+# Maximum concurrent upstream calls from the async serving path
+MAX_UPSTREAM_CONCURRENCY = int(os.getenv("FLEXIUI_MAX_UPSTREAM_CONCURRENCY", 64))
+_upstream_semaphore = None
 
-# ============================================
-# FUNCTION 1: Chat with Bot
-# ============================================
-def chat_with_bot(user_message, conversation_history=None):
-    """
-    General chat function - answers questions about FlexiUI
-    
-    Args:
-        user_message (str): The user's question
-        conversation_history (list): Previous messages (optional)
-    
-    Returns:
-        str: Bot's response
-    """
-    try:
-        # If no history, start fresh
-        if conversation_history is None:
-            conversation_history = []
-        
-        # System prompt - tells AI who it is and what it does
-        system_prompt = """You are FlexiUI Assistant, a helpful AI that helps users create UI components.
+# The Groq client (see upstream.py: pooled connections, deadlines, retries,
+# key rotation, hedging and a circuit breaker). Nothing connects until the
+# first call. Point GROQ_BASE_URL at fake_groq.py for load tests and
+# offline work.
+client = UpstreamClient.from_env(async_connections=MAX_UPSTREAM_CONCURRENCY)
+
+# Default model; each request's model is picked by the router (see router.py)
+MODEL = model_router.default_model
+
+# Sampling temperature for UI generation (part of the cache key)
+GENERATION_TEMPERATURE = 0.8
+
+# System prompt - tells AI who it is and what it does
+CHAT_SYSTEM_PROMPT = """You are FlexiUI Assistant, a helpful AI that helps users create UI components.
 
 Your capabilities:
 - Generate HTML, CSS, and JavaScript code
@@ -46,101 +64,793 @@ Guidelines:
 - When providing code, format it properly
 - If user asks to create something, suggest they use the "Generate UI" feature
 """
-        
-        # Build messages array
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        
-        # Add conversation history
-        for msg in conversation_history:
-            messages.append(msg)
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Call Groq API
+
+# System prompt for UI generation - forces a JSON answer
+UI_SYSTEM_PROMPT = """You are an expert frontend developer. 
+Generate clean, modern, and responsive HTML/CSS/JS code.
+
+IMPORTANT: Return ONLY valid JSON in this exact format:
+{
+  "html": "your html code here",
+  "css": "your css code here",
+  "js": "your javascript code here (or empty string if not needed)"
+}
+
+Do not include any explanations, just the JSON."""
+
+# ============================================
+# HELPERS: Build request messages
+# ============================================
+def build_chat_messages(user_message, conversation_history=None, metrics=None, session_state=None):
+    """
+    Build the messages array for a chat request
+    
+    Long histories are trimmed to the token budget: recent turns are kept
+    verbatim and older ones folded into a rolling summary (see history.py).
+    
+    Args:
+        user_message (str): The user's question
+        conversation_history (list): Previous messages (optional)
+        metrics (dict): Filled with history trimming metrics (optional)
+        session_state (dict): For server-side sessions: {"summary": ...} in,
+                              updated "summary" and "folded" count out
+    
+    Returns:
+        list: Messages for the chat completions API
+    """
+    system_message = {"role": "system", "content": CHAT_SYSTEM_PROMPT}
+    user_entry = {"role": "user", "content": user_message}
+    
+    if session_state is not None:
+        messages, history_metrics, summary, folded = history_manager.fit_session(
+            system_message, session_state.get("summary") or "", conversation_history, user_entry
+        )
+        session_state["summary"] = summary
+        session_state["folded"] = folded
+    else:
+        messages, history_metrics = history_manager.fit(
+            system_message, conversation_history, user_entry
+        )
+    
+    if metrics is not None:
+        metrics.update(history_metrics)
+    
+    return messages
+
+def build_ui_messages(prompt, component_type="general"):
+    """
+    Build the messages array for a UI generation request
+    
+    Args:
+        prompt (str): Description of what to create
+        component_type (str): Type of component
+    
+    Returns:
+        list: Messages for the chat completions API
+    """
+    # Get the specialized prompt
+    full_prompt = get_ui_generation_prompt(prompt, component_type)
+    
+    return [
+        {"role": "system", "content": UI_SYSTEM_PROMPT},
+        {"role": "user", "content": full_prompt}
+    ]
+
+def lookup_generation(prompt, component_type="general", cache_mode=CACHE_USE, model=MODEL):
+    """
+    Check the cache and similarity index before calling Groq
+    
+    Args:
+        prompt (str): Description of what to create
+        component_type (str): Type of component
+        cache_mode (str): "use", "bypass" or "refresh"
+        model (str): The route's primary model (part of the cache key)
+    
+    Returns:
+        tuple: (cache_key, stored code or None)
+    """
+    resolved_type = resolve_component_type(component_type)
+    theme = detect_theme(prompt)
+    
+    cache_key = make_cache_key(prompt, resolved_type, theme, model, GENERATION_TEMPERATURE)
+    if cache_mode != CACHE_USE:
+        return cache_key, None
+    
+    # Serve repeated requests from the cache
+    cached = generation_cache.get(cache_key)
+    if cached is not None:
+        return cache_key, cached
+    
+    # Then try a near-duplicate of an earlier prompt
+    similar = similarity_index.find(prompt, resolved_type, theme)
+    if similar is not None:
+        generation_cache.set(cache_key, similar)
+    return cache_key, similar
+
+def error_code_result(error):
+    """Code payload returned when generation fails"""
+    return {
+        "error": str(error),
+        "html": "<p>Error generating code</p>",
+        "css": "",
+        "js": ""
+    }
+
+def _usage(response):
+    """Token counts of a completion (if the API reported them)"""
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None)
+    }
+
+def raise_if_overloaded(error):
+    """
+    Re-raise "busy, retry later" errors (admission control shedding, upstream
+    429/503, open circuit breaker) as AdmissionRejected, so routes answer
+    429/503 with Retry-After instead of an error payload
+    """
+    rejection = as_rejection(error)
+    if rejection is not None:
+        raise rejection from error
+
+def log_request(prompt, component_type, started, error=None, model=None, output_tokens=None):
+    """Queue a GenerationLog record (written in the background, see log_writer.py)"""
+    generation_logs.record(
+        prompt, component_type, time.perf_counter() - started,
+        str(error) if error is not None else None, model, output_tokens
+    )
+
+def route_request(component_type, prompt, metrics=None):
+    """
+    Pick the model for a request (see router.py)
+    
+    Args:
+        component_type (str): Resolved component type, "chat", "modify" or "probe"
+        prompt (str): The user's prompt or message
+        metrics (dict): Gets the decision under "routing" (optional)
+    
+    Returns:
+        dict: The router's decision (model, tier, reason, primary)
+    """
+    decision = model_router.route(component_type, prompt)
+    count_route(component_type, decision["model"], decision["reason"])
+    if metrics is not None:
+        metrics["routing"] = dict(decision)
+    return decision
+
+def record_outcome(decision, component_type, latency, code_data=None):
+    """Tell the router how an upstream call went (unusable code counts as a parse failure)"""
+    parse_failed = code_data is not None and (
+        "partial_sections" in code_data or "missing_sections" in code_data
+        or not any(code_data.get(section) for section in ("html", "css", "js"))
+    )
+    model_router.record(decision["model"], component_type, latency, parse_failed)
+
+def note_cached(metrics, cached):
+    """Mark a reported routing decision as served from the cache/similarity index"""
+    if metrics is not None and "routing" in metrics:
+        metrics["routing"]["cached"] = cached
+
+def note_fresh(metrics, fresh):
+    """
+    Report whether this call produced the result itself (not a cache or
+    similarity hit, nor a copy of an identical request's result in flight);
+    only those are saved as new projects
+    """
+    if metrics is not None:
+        metrics["fresh"] = fresh
+
+def usable_code(code_data):
+    """
+    Is a generation result worth keeping (saving, caching, reusing)?
+    
+    Errors, answers with cut-off or missing sections (see
+    extract_code_manually) and answers without any HTML are not.
+    """
+    return (
+        "error" not in code_data
+        and "partial_sections" not in code_data and "missing_sections" not in code_data
+        and bool((code_data.get("html") or "").strip())
+    )
+
+# ============================================
+# HELPERS: Output budgets and continuation (see budget.py)
+# ============================================
+def _record_budget(budget_key, output_tokens, continuations, cut_off):
+    """Remember an answer's size and count truncated answers"""
+    output_budget.record(*budget_key, output_tokens, continuations, cut_off)
+    if continuations or cut_off:
+        count_truncation("cut_off" if cut_off else "continued")
+
+def _admit(kind, messages, max_tokens):
+    """
+    Wait for upstream quota before a call (see admission.py)
+    
+    Args:
+        kind (str): "chat" or "generate" (priority class)
+        messages (list): Request messages
+        max_tokens (int): The call's max_tokens
+    
+    Raises:
+        AdmissionRejected: The call was shed
+    """
+    tokens = sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+    admission.acquire(kind, tokens)
+
+async def _admit_async(kind, messages, max_tokens):
+    """Async version of _admit"""
+    tokens = sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+    await admission.acquire_async(kind, tokens)
+
+def _complete(messages, model, temperature, budget_key):
+    """
+    Call Groq with an adaptive max_tokens, continuing answers that hit it
+    
+    Args:
+        messages (list): Request messages
+        model (str): Model to call
+        temperature (float): Sampling temperature
+        budget_key (tuple): (kind, component_type, theme), see budget.py
+    
+    Returns:
+        tuple: (answer text, completion tokens over all calls)
+    """
+    max_tokens = output_budget.budget(*budget_key)
+    parts, output_tokens = [], 0
+    request = messages
+    for continuation in range(output_budget.max_continuations + 1):
+        _admit(budget_key[0], request, max_tokens)
         response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7,  # Controls randomness (0-2)
-            max_tokens=1000,  # Maximum response length
+            model=model,
+            messages=request,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            admit=partial(_admit, budget_key[0], request, max_tokens),
         )
-        
-        # Extract the response text
-        bot_response = response.choices[0].message.content
-        
-        return bot_response
-        
-    except Exception as e:
-        return f"Error: {str(e)}"
+        usage = _usage(response)
+        count_tokens(**usage)
+        content = response.choices[0].message.content or ""
+        parts.append(content)
+        call_tokens = usage["completion_tokens"] or estimate_tokens(content)
+        admission.refund(max_tokens - call_tokens)
+        output_tokens += call_tokens
+        cut_off = response.choices[0].finish_reason == "length"
+        if not cut_off:
+            break
+        request = continuation_messages(messages, "".join(parts))
+    _record_budget(budget_key, output_tokens, continuation, cut_off)
+    return "".join(parts), output_tokens
+
+async def _complete_async(messages, model, temperature, budget_key):
+    """Async version of _complete"""
+    max_tokens = output_budget.budget(*budget_key)
+    parts, output_tokens = [], 0
+    request = messages
+    for continuation in range(output_budget.max_continuations + 1):
+        await _admit_async(budget_key[0], request, max_tokens)
+        response = await client.create_async(
+            model=model,
+            messages=request,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            admit=partial(_admit_async, budget_key[0], request, max_tokens),
+        )
+        usage = _usage(response)
+        count_tokens(**usage)
+        content = response.choices[0].message.content or ""
+        parts.append(content)
+        call_tokens = usage["completion_tokens"] or estimate_tokens(content)
+        admission.refund(max_tokens - call_tokens)
+        output_tokens += call_tokens
+        cut_off = response.choices[0].finish_reason == "length"
+        if not cut_off:
+            break
+        request = continuation_messages(messages, "".join(parts))
+    _record_budget(budget_key, output_tokens, continuation, cut_off)
+    return "".join(parts), output_tokens
+
+def _stream_complete(messages, model, temperature, budget_key, outcome):
+    """
+    Streaming version of _complete
+    
+    Yields:
+        str: Text chunks as they arrive (continuations included); outcome
+             gets "output_tokens" at the end
+    """
+    max_tokens = output_budget.budget(*budget_key)
+    parts, output_tokens = [], 0
+    request = messages
+    for continuation in range(output_budget.max_continuations + 1):
+        _admit(budget_key[0], request, max_tokens)
+        stream = client.chat.completions.create(
+            model=model,
+            messages=request,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            admit=partial(_admit, budget_key[0], request, max_tokens),
+        )
+        finish_reason = None
+        call_parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                call_parts.append(text)
+                yield text
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+        parts.extend(call_parts)
+        call_tokens = estimate_tokens("".join(call_parts))
+        admission.refund(max_tokens - call_tokens)
+        output_tokens += call_tokens
+        cut_off = finish_reason == "length"
+        if not cut_off:
+            break
+        request = continuation_messages(messages, "".join(parts))
+    _record_budget(budget_key, output_tokens, continuation, cut_off)
+    outcome["output_tokens"] = output_tokens
+
+# ============================================
+# FUNCTION 1: Chat with Bot
+# ============================================
+def chat_with_bot(user_message, conversation_history=None, metrics=None, session_state=None):
+    """
+    General chat function - answers questions about FlexiUI
+    
+    Args:
+        user_message (str): The user's question
+        conversation_history (list): Previous messages (optional)
+        metrics (dict): Filled with history trimming metrics and the routing
+                        decision (optional)
+        session_state (dict): Rolling summary state for server-side sessions (optional)
+    
+    Returns:
+        str: Bot's response
+    """
+    decision = route_request("chat", user_message, metrics)
+    with label_scope(component_type="chat", model=decision["model"]):
+        started = time.perf_counter()
+        try:
+            messages = build_chat_messages(user_message, conversation_history, metrics, session_state)
+            
+            # Identical requests already in flight share one upstream call
+            outcome = {}
+            reply = inflight.do(
+                make_key("chat", decision["model"], messages), _chat_upstream, messages, decision, outcome
+            )
+            log_request(user_message, "chat", started, model=decision["model"],
+                        output_tokens=outcome.get("output_tokens"))
+            return reply
+            
+        except Exception as e:
+            count_failure()
+            log_request(user_message, "chat", started, e)
+            raise_if_overloaded(e)
+            return f"Error: {str(e)}"
+
+def _chat_upstream(messages, decision, outcome):
+    """Call Groq for a chat reply"""
+    # Call Groq API (temperature 0.7; max_tokens from the chat output budget)
+    upstream_started = time.perf_counter()
+    with stage("upstream_total"):
+        reply, outcome["output_tokens"] = _complete(messages, decision["model"], 0.7, ("chat", "chat", None))
+    record_outcome(decision, "chat", time.perf_counter() - upstream_started)
+    return reply
+
+def stream_chat_with_bot(user_message, conversation_history=None, metrics=None, session_state=None):
+    """
+    Streaming version of chat_with_bot
+    
+    Args:
+        user_message (str): The user's question
+        conversation_history (list): Previous messages (optional)
+        metrics (dict): Filled with history trimming metrics and the routing
+                        decision (optional)
+        session_state (dict): Rolling summary state for server-side sessions (optional)
+    
+    Yields:
+        tuple: ("token", text) for each chunk, then ("done", full response)
+    """
+    decision = route_request("chat", user_message, metrics)
+    with label_scope(component_type="chat", model=decision["model"]):
+        started = time.perf_counter()
+        try:
+            messages = build_chat_messages(user_message, conversation_history, metrics, session_state)
+            
+            upstream_started = time.perf_counter()
+            outcome = {}
+            parts = []
+            for text in _stream_complete(messages, decision["model"], 0.7, ("chat", "chat", None), outcome):
+                if not parts:
+                    record_stage("upstream_ttft", time.perf_counter() - upstream_started)
+                parts.append(text)
+                yield "token", text
+            record_stage("upstream_total", time.perf_counter() - upstream_started)
+            record_outcome(decision, "chat", time.perf_counter() - upstream_started)
+            
+            log_request(user_message, "chat", started, model=decision["model"],
+                        output_tokens=outcome["output_tokens"])
+            yield "done", "".join(parts)
+            
+        except Exception as e:
+            count_failure()
+            log_request(user_message, "chat", started, e)
+            raise_if_overloaded(e)
+            yield "done", f"Error: {str(e)}"
 
 # ============================================
 # FUNCTION 2: Generate UI Component
 # ============================================
-def generate_ui_component(prompt, component_type="general"):
+def generate_ui_component(prompt, component_type="general", cache_mode=CACHE_USE, metrics=None):
     """
     Generate HTML/CSS/JS code based on user prompt
     
     Args:
         prompt (str): Description of what to create
         component_type (str): Type of component (navbar, hero, card, etc.)
+        cache_mode (str): "use" (default), "bypass" or "refresh"
+        metrics (dict): Filled with the routing decision (optional)
     
     Returns:
         dict: Contains html, css, and js code
     """
-    try:
-        # Import prompts from prompts.py (we'll create this next)
-        from prompts import get_ui_generation_prompt
-        
-        # Get the specialized prompt
-        full_prompt = get_ui_generation_prompt(prompt, component_type)
-        
-        # Call Groq API
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert frontend developer. 
-Generate clean, modern, and responsive HTML/CSS/JS code.
+    resolved_type = resolve_component_type(component_type)
+    decision = route_request(resolved_type, prompt, metrics)
+    with label_scope(component_type=resolved_type, model=decision["model"]):
+        started = time.perf_counter()
+        try:
+            with stage("cache_lookup"):
+                cache_key, stored = lookup_generation(prompt, component_type, cache_mode, decision["primary"])
+            model = None
+            outcome = {}
+            if stored is None:
+                # Identical requests already in flight share one upstream call
+                model = decision["model"]
+                stored = inflight.do(
+                    f"ui:{cache_mode}:{model}:{cache_key}",
+                    _generate_upstream, prompt, component_type, cache_key, cache_mode, decision, outcome
+                )
+            note_cached(metrics, model is None)
+            note_fresh(metrics, "output_tokens" in outcome)
+            log_request(prompt, component_type, started, model=model,
+                        output_tokens=outcome.get("output_tokens"))
+            return stored
+            
+        except Exception as e:
+            count_failure()
+            log_request(prompt, component_type, started, e)
+            raise_if_overloaded(e)
+            return error_code_result(e)
+
+def _generate_upstream(prompt, component_type, cache_key, cache_mode, decision, outcome):
+    """Call Groq for a UI component and cache the parsed result"""
+    messages = build_ui_messages(prompt, component_type)
+    resolved_type = resolve_component_type(component_type)
+    budget_key = ("generate", resolved_type, detect_theme(prompt))
+    
+    # Call Groq API (answers cut off at max_tokens are continued)
+    upstream_started = time.perf_counter()
+    with stage("upstream_total"):
+        ai_response, outcome["output_tokens"] = _complete(
+            messages, decision["model"], GENERATION_TEMPERATURE, budget_key
+        )
+    latency = time.perf_counter() - upstream_started
+    
+    # Parse JSON from response
+    with stage("parse"):
+        code_data = parse_code_from_response(ai_response)
+    record_outcome(decision, resolved_type, latency, code_data)
+    require_code(code_data)
+    
+    # Remember complete results for identical requests (a degraded answer
+    # would otherwise be served for the whole TTL)
+    if cache_mode != CACHE_BYPASS and usable_code(code_data):
+        generation_cache.set(cache_key, code_data)
+    
+    return code_data
+
+def stream_ui_component(prompt, component_type="general", cache_mode=CACHE_USE, metrics=None):
+    """
+    Streaming version of generate_ui_component
+    
+    Args:
+        prompt (str): Description of what to create
+        component_type (str): Type of component
+        cache_mode (str): "use" (default), "bypass" or "refresh"
+        metrics (dict): Filled with the routing decision (optional)
+    
+    Yields:
+        tuple: ("token", text) for each chunk, ("section", {"section", "value"})
+               as soon as html/css/js is complete, then ("done", code dict)
+    """
+    resolved_type = resolve_component_type(component_type)
+    decision = route_request(resolved_type, prompt, metrics)
+    with label_scope(component_type=resolved_type, model=decision["model"]):
+        started = time.perf_counter()
+        try:
+            with stage("cache_lookup"):
+                cache_key, stored = lookup_generation(prompt, component_type, cache_mode, decision["primary"])
+            note_cached(metrics, stored is not None)
+            if stored is not None:
+                log_request(prompt, component_type, started)
+                yield "done", stored
+                return
+            
+            messages = build_ui_messages(prompt, component_type)
+            budget_key = ("generate", resolved_type, detect_theme(prompt))
+            
+            upstream_started = time.perf_counter()
+            outcome = {}
+            parser = StreamingCodeParser()
+            first_token = True
+            for text in _stream_complete(messages, decision["model"], GENERATION_TEMPERATURE,
+                                         budget_key, outcome):
+                if first_token:
+                    record_stage("upstream_ttft", time.perf_counter() - upstream_started)
+                    first_token = False
+                yield "token", text
+                for event in parser.feed(text):
+                    yield "section", event
+            latency = time.perf_counter() - upstream_started
+            record_stage("upstream_total", latency)
+            
+            # Non-JSON and cut-off answers go through the regular
+            # parse/fallback path (which also reports what's missing)
+            with stage("parse"):
+                code_data = parser.close()
+                if code_data is None or not parser.complete:
+                    code_data = parse_code_from_response(parser.text())
+            record_outcome(decision, resolved_type, latency, code_data)
+            require_code(code_data)
+            
+            if cache_mode != CACHE_BYPASS and usable_code(code_data):
+                generation_cache.set(cache_key, code_data)
+            
+            note_fresh(metrics, True)
+            log_request(prompt, component_type, started, model=decision["model"],
+                        output_tokens=outcome["output_tokens"])
+            yield "done", code_data
+            
+        except Exception as e:
+            count_failure()
+            log_request(prompt, component_type, started, e)
+            raise_if_overloaded(e)
+            yield "done", error_code_result(e)
+
+# ============================================
+# MODIFY UI COMPONENT (patch-based)
+# ============================================
+
+# System prompt for modifications - forces a JSON patch answer
+PATCH_SYSTEM_PROMPT = """You are an expert frontend developer editing existing code.
+Answer with the smallest set of search/replace edits that makes the requested change.
 
 IMPORTANT: Return ONLY valid JSON in this exact format:
 {
-  "html": "your html code here",
-  "css": "your css code here",
-  "js": "your javascript code here (or empty string if not needed)"
+  "edits": [{"section": "html|css|js", "find": "exact existing text", "replace": "new text"}]
 }
 
 Do not include any explanations, just the JSON."""
-                },
-                {
-                    "role": "user",
-                    "content": full_prompt
-                }
-            ],
-            temperature=0.8,
-            max_tokens=2000,
+
+# A patch for a small edit is short; anything longer means a rewrite
+PATCH_MAX_TOKENS = 800
+
+def modify_ui_component(current_code, modification_request, metrics=None):
+    """
+    Apply a modification request to existing code
+    
+    The model sees only the sections the request is about and answers with
+    search/replace edits, which are applied and checked here. If the patch
+    can't be parsed, is empty, edits a section the model wasn't shown, can't
+    be applied or breaks the code's structure, the change is made with a
+    full rewrite instead (get_modification_prompt).
+    
+    Args:
+        current_code (dict): Current html/css/js
+        modification_request (str): What the user wants to change
+        metrics (dict): Filled with mode, sections sent, edits, token usage and
+                        the routing decision (optional)
+    
+    Returns:
+        dict: Updated html, css and js code
+    """
+    metrics = metrics if metrics is not None else {}
+    decision = route_request("modify", modification_request, metrics)
+    with label_scope(component_type="modify", model=decision["model"]):
+        try:
+            sections = select_sections(current_code, modification_request)
+            with stage("prompt_build"):
+                messages = [
+                    {"role": "system", "content": PATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": get_patch_prompt(current_code, modification_request, sections)}
+                ]
+            
+            _admit("generate", messages, PATCH_MAX_TOKENS)
+            upstream_started = time.perf_counter()
+            with stage("upstream_total"):
+                response = client.chat.completions.create(
+                    model=decision["model"],
+                    messages=messages,
+                    temperature=0.2,
+                    max_tokens=PATCH_MAX_TOKENS,
+                    admit=partial(_admit, "generate", messages, PATCH_MAX_TOKENS),
+                )
+            latency = time.perf_counter() - upstream_started
+            usage = _usage(response)
+            count_tokens(**usage)
+            metrics.update(mode="patch", sections=sections, **usage)
+            
+            try:
+                with stage("patch_apply"):
+                    edits = parse_patch(response.choices[0].message.content, sections)
+                    updated = apply_patch(current_code, edits)
+                    problems = validate_patch_result(current_code, updated)
+                if problems:
+                    raise PatchError("; ".join(problems))
+            except PatchError as e:
+                model_router.record(decision["model"], "modify", latency, parse_failed=True)
+                metrics["patch_error"] = str(e)
+                return _rewrite_upstream(current_code, modification_request, metrics, decision)
+            
+            model_router.record(decision["model"], "modify", latency)
+            metrics["edits"] = len(edits)
+            return updated
+            
+        except Exception as e:
+            count_failure()
+            raise_if_overloaded(e)
+            return error_code_result(e)
+
+def _rewrite_upstream(current_code, modification_request, metrics, decision):
+    """
+    Full-rewrite fallback for modifications
+    
+    Goes through _complete like a generation: the budget adapts to the size
+    of earlier rewrites and an answer cut off at max_tokens is continued.
+    """
+    messages = [
+        {"role": "system", "content": UI_SYSTEM_PROMPT},
+        {"role": "user", "content": get_modification_prompt(current_code, modification_request)}
+    ]
+    with stage("upstream_total"):
+        ai_response, output_tokens = _complete(
+            messages, decision["model"], 0.2, ("generate", "modify", None)
         )
-        
-        # Get the response
-        ai_response = response.choices[0].message.content
-        
-        # Parse JSON from response
+    metrics["mode"] = "rewrite"
+    metrics["completion_tokens"] = (metrics.get("completion_tokens") or 0) + output_tokens
+    # Estimated: _complete only reports the completion tokens
+    metrics["prompt_tokens"] = (metrics.get("prompt_tokens") or 0) + sum(
+        estimate_tokens(message["content"]) for message in messages
+    )
+    
+    code_data = parse_code_from_response(ai_response)
+    require_code(code_data)
+    return code_data
+
+# ============================================
+# ASYNC VERSIONS (used by asgi_app.py)
+# ============================================
+def upstream_semaphore():
+    """
+    Semaphore bounding concurrent async upstream calls
+    
+    Created on first use so it binds to the running event loop.
+    """
+    global _upstream_semaphore
+    if _upstream_semaphore is None:
+        _upstream_semaphore = asyncio.Semaphore(MAX_UPSTREAM_CONCURRENCY)
+    return _upstream_semaphore
+
+async def chat_with_bot_async(user_message, conversation_history=None, metrics=None,
+                              session_state=None):
+    """
+    Async version of chat_with_bot
+    
+    Returns:
+        str: Bot's response
+    """
+    decision = route_request("chat", user_message, metrics)
+    with label_scope(component_type="chat", model=decision["model"]):
+        started = time.perf_counter()
+        try:
+            messages = build_chat_messages(user_message, conversation_history, metrics, session_state)
+            
+            outcome = {}
+            reply = await inflight.do_async(
+                make_key("chat", decision["model"], messages), _chat_upstream_async, messages, decision,
+                outcome
+            )
+            log_request(user_message, "chat", started, model=decision["model"],
+                        output_tokens=outcome.get("output_tokens"))
+            return reply
+            
+        except Exception as e:
+            count_failure()
+            log_request(user_message, "chat", started, e)
+            raise_if_overloaded(e)
+            return f"Error: {str(e)}"
+
+async def _chat_upstream_async(messages, decision, outcome):
+    waiting = time.perf_counter()
+    async with upstream_semaphore():
+        upstream_started = time.perf_counter()
+        record_stage("queue", upstream_started - waiting)
+        with stage("upstream_total"):
+            reply, outcome["output_tokens"] = await _complete_async(
+                messages, decision["model"], 0.7, ("chat", "chat", None)
+            )
+    record_outcome(decision, "chat", time.perf_counter() - upstream_started)
+    return reply
+
+async def generate_ui_component_async(prompt, component_type="general", cache_mode=CACHE_USE,
+                                      metrics=None):
+    """
+    Async version of generate_ui_component
+    
+    Cache and similarity lookups touch SQLite, so they run in a worker
+    thread; only the upstream call is awaited on the event loop.
+    
+    Returns:
+        dict: Contains html, css, and js code
+    """
+    resolved_type = resolve_component_type(component_type)
+    decision = route_request(resolved_type, prompt, metrics)
+    with label_scope(component_type=resolved_type, model=decision["model"]):
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            with stage("cache_lookup"):
+                cache_key, stored = await loop.run_in_executor(
+                    None, lookup_generation, prompt, component_type, cache_mode, decision["primary"]
+                )
+            model = None
+            outcome = {}
+            if stored is None:
+                model = decision["model"]
+                stored = await inflight.do_async(
+                    f"ui:{cache_mode}:{model}:{cache_key}",
+                    _generate_upstream_async, prompt, component_type, cache_key, cache_mode, decision,
+                    outcome
+                )
+            note_cached(metrics, model is None)
+            note_fresh(metrics, "output_tokens" in outcome)
+            log_request(prompt, component_type, started, model=model,
+                        output_tokens=outcome.get("output_tokens"))
+            return stored
+            
+        except Exception as e:
+            count_failure()
+            log_request(prompt, component_type, started, e)
+            raise_if_overloaded(e)
+            return error_code_result(e)
+
+async def _generate_upstream_async(prompt, component_type, cache_key, cache_mode, decision, outcome):
+    messages = build_ui_messages(prompt, component_type)
+    resolved_type = resolve_component_type(component_type)
+    budget_key = ("generate", resolved_type, detect_theme(prompt))
+    
+    waiting = time.perf_counter()
+    async with upstream_semaphore():
+        upstream_started = time.perf_counter()
+        record_stage("queue", upstream_started - waiting)
+        with stage("upstream_total"):
+            ai_response, outcome["output_tokens"] = await _complete_async(
+                messages, decision["model"], GENERATION_TEMPERATURE, budget_key
+            )
+    latency = time.perf_counter() - upstream_started
+    
+    with stage("parse"):
         code_data = parse_code_from_response(ai_response)
-        
-        return code_data
-        
-    except Exception as e:
-        return {
-            "error": str(e),
-            "html": "<p>Error generating code</p>",
-            "css": "",
-            "js": ""
-        }
+    record_outcome(decision, resolved_type, latency, code_data)
+    require_code(code_data)
+    
+    if cache_mode != CACHE_BYPASS and usable_code(code_data):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, generation_cache.set, cache_key, code_data)
+    
+    return code_data
 
 # ============================================
 # FUNCTION 3: Parse Code from AI Response
@@ -185,7 +895,27 @@ def parse_code_from_response(ai_response):
         
     except json.JSONDecodeError:
         # If JSON parsing fails, try to extract code manually
-        return extract_code_manually(ai_response)
+        count_parse_fallback()
+        with stage("fallback_extract"):
+            return extract_code_manually(ai_response)
+
+class NoCodeError(ValueError):
+    """The model answered without any html/css/js (a refusal, prose only, ...)"""
+
+def require_code(code_data):
+    """
+    Turn an answer with no code at all into an error
+    
+    Answers with only some sections missing or cut off are still returned
+    (marked with missing_sections/partial_sections), but never cached or
+    saved; see usable_code().
+    
+    Raises:
+        NoCodeError: Every section is empty
+    """
+    if not any((code_data.get(section) or "").strip() for section in SECTIONS):
+        missing = code_data.get("missing_sections") or list(SECTIONS)
+        raise NoCodeError(f"The model's answer contained no code (missing: {', '.join(missing)})")
 
 # ============================================
 # FUNCTION 4: Manual Code Extraction (Fallback)
@@ -194,42 +924,22 @@ def extract_code_manually(text):
     """
     Fallback method to extract code if JSON parsing fails
     
+    Handles prose-wrapped and cut-off JSON (repaired), markdown code fences
+    and bare code; see extractor.py.
+    
     Args:
-        text (str): Raw text with code blocks
+        text (str): Raw response text
     
     Returns:
-        dict: Extracted HTML, CSS, JS
+        dict: Extracted HTML, CSS, JS. Sections that were cut off or never
+              arrived are listed under "partial_sections" / "missing_sections"
+              (only present when there are any).
     """
-    result = {
-        "html": "",
-        "css": "",
-        "js": ""
-    }
-    
-    # Simple extraction logic
-    # Look for ```html, ```css, ```javascript blocks
-    lines = text.split('\n')
-    current_type = None
-    current_code = []
-    
-    for line in lines:
-        if '```html' in line.lower():
-            current_type = 'html'
-            current_code = []
-        elif '```css' in line.lower():
-            current_type = 'css'
-            current_code = []
-        elif '```javascript' in line.lower() or '```js' in line.lower():
-            current_type = 'js'
-            current_code = []
-        elif '```' in line and current_type:
-            # End of code block
-            result[current_type] = '\n'.join(current_code)
-            current_type = None
-            current_code = []
-        elif current_type:
-            current_code.append(line)
-    
+    result, report = extract_code(text)
+    if report["partial"]:
+        result["partial_sections"] = report["partial"]
+    if report["missing"]:
+        result["missing_sections"] = report["missing"]
     return result
 
 # ============================================
@@ -243,11 +953,14 @@ def test_groq_connection():
         bool: True if working, False otherwise
     """
     try:
+        prompt = "Say 'hello' if you're working!"
+        messages = [
+            {"role": "user", "content": prompt}
+        ]
+        _admit("chat", messages, 10)
         response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "user", "content": "Say 'hello' if you're working!"}
-            ],
+            model=route_request("probe", prompt)["model"],
+            messages=messages,
             max_tokens=10
         )
         return True
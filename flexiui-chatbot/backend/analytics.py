@@ -0,0 +1,448 @@
+"""
+Latency and Error Analytics for FlexiUI
+
+GenerationLog grows with every request, so percentile queries over the raw
+table get slower as it grows. Instead, every batch the log writer inserts
+also updates two rollup tables (see models.py):
+
+- generation_rollups_minute: one row per (minute, component_type)
+- generation_rollups_hour:   one row per (hour, component_type)
+
+Each row keeps count, error count, latency sum and a fixed-bucket latency
+histogram. Histograms merge by adding counts, so percentiles for any window
+are computed from a handful of rollup rows, whatever the size of the log.
+
+The histogram buckets grow geometrically (x1.2), which bounds the
+percentile error to a few percent of the value.
+"""
+
+import os
+import json
+import time
+from operator import add
+from itertools import zip_longest
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, bindparam
+
+from models import GenerationLog, GenerationRollupMinute, GenerationRollupHour
+
+LOG_TABLE = GenerationLog.__table__
+
+RESOLUTIONS = {
+    "minute": (GenerationRollupMinute.__table__, timedelta(minutes=1)),
+    "hour": (GenerationRollupHour.__table__, timedelta(hours=1)),
+}
+
+# Upper bounds (seconds) of the latency buckets: 10ms .. ~10min, x1.2 each
+HISTOGRAM_BOUNDS = tuple(round(0.01 * 1.2 ** i, 6) for i in range(61))
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+# Minute rollups are only kept this long (hour rollups are kept forever)
+MINUTE_RETENTION = timedelta(days=float(os.getenv("FLEXIUI_ROLLUP_MINUTE_DAYS", 7)))
+PRUNE_INTERVAL = 3600
+
+_last_prune = 0.0
+
+# ============================================
+# LATENCY HISTOGRAM
+# ============================================
+
+def bucket_start(moment, resolution):
+    """Start of the minute/hour a timestamp falls in"""
+    if resolution == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+# One count per bound, plus the overflow bucket
+HISTOGRAM_SIZE = len(HISTOGRAM_BOUNDS) + 1
+
+
+def empty_histogram():
+    return [0] * HISTOGRAM_SIZE
+
+
+def merge_histograms(target, histogram):
+    """Add the counts of one histogram into another (in place)"""
+    target[:] = map(add, target, histogram)
+    return target
+
+
+def load_histogram(text):
+    """Stored histograms drop their trailing zero buckets"""
+    counts = json.loads(text or "[]")
+    return counts + [0] * (HISTOGRAM_SIZE - len(counts))
+
+
+def dump_histogram(histogram):
+    end = len(histogram)
+    while end and not histogram[end - 1]:
+        end -= 1
+    return json.dumps(histogram[:end], separators=(",", ":"))
+
+
+def sum_histograms(stored):
+    """
+    Merge many stored histograms (parsed in one json call, summed per column)
+
+    Args:
+        stored (list): JSON texts as written by dump_histogram
+
+    Returns:
+        list: Merged counts
+    """
+    counts = json.loads("[" + ",".join(text or "[]" for text in stored) + "]")
+    merged = [sum(column) for column in zip_longest(*counts, fillvalue=0)]
+    return merged + [0] * (HISTOGRAM_SIZE - len(merged))
+
+
+def percentile(histogram, total, fraction):
+    """
+    Estimate a percentile from a histogram
+
+    Interpolates linearly inside the bucket the percentile falls in.
+
+    Args:
+        histogram (list): Count per bucket
+        total (int): Sum of the counts
+        fraction (float): 0.0 - 1.0
+
+    Returns:
+        float: Seconds (None for an empty histogram)
+    """
+    if not total:
+        return None
+    rank = fraction * total
+    running = 0
+    for index, count in enumerate(histogram):
+        if count and running + count >= rank:
+            if index >= len(HISTOGRAM_BOUNDS):
+                return HISTOGRAM_BOUNDS[-1]
+            lower = HISTOGRAM_BOUNDS[index - 1] if index else 0.0
+            upper = HISTOGRAM_BOUNDS[index]
+            return round(lower + (upper - lower) * (rank - running) / count, 4)
+        running += count
+    return HISTOGRAM_BOUNDS[-1]
+
+# ============================================
+# MAINTAINING THE ROLLUPS
+# ============================================
+
+def aggregate(records, totals=None):
+    """
+    Fold log records into per-bucket totals
+
+    Args:
+        records (iterable): Dicts (or rows) with created_at, component_type,
+                            success and generation_time
+        totals (dict): Totals to add to (for folding several chunks)
+
+    Returns:
+        dict: (resolution, bucket_start, component_type) ->
+              [count, error_count, latency_sum, histogram]
+    """
+    totals = {} if totals is None else totals
+    for record in records:
+        created_at = record["created_at"]
+        seconds = record["generation_time"] or 0.0
+        index = bisect_left(HISTOGRAM_BOUNDS, seconds)
+        failed = 0 if record["success"] else 1
+
+        for resolution in RESOLUTIONS:
+            key = (resolution, bucket_start(created_at, resolution), record["component_type"] or "")
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = [0, 0, 0.0, empty_histogram()]
+            entry[0] += 1
+            entry[1] += failed
+            entry[2] += seconds
+            entry[3][index] += 1
+    return totals
+
+
+def write_rollups(conn, totals):
+    """
+    Add aggregated totals into the rollup tables
+
+    Run this in the transaction that inserted the logs: the insert already
+    holds SQLite's write lock, so the read-modify-write below can't race
+    another process's writer.
+    """
+    for resolution, (table, _) in RESOLUTIONS.items():
+        entries = {
+            (start, component_type): entry
+            for (res, start, component_type), entry in totals.items()
+            if res == resolution
+        }
+        if not entries:
+            continue
+
+        existing = conn.execute(
+            select(table).where(
+                table.c.bucket_start.in_({start for start, _ in entries}),
+                table.c.component_type.in_({component_type for _, component_type in entries})
+            )
+        ).mappings().all()
+        existing = {(row["bucket_start"], row["component_type"]): row for row in existing}
+
+        inserts, updates = [], []
+        for (start, component_type), (count, errors, latency_sum, histogram) in entries.items():
+            row = existing.get((start, component_type))
+            values = {
+                "b_start": start,
+                "b_type": component_type,
+                "count": count,
+                "error_count": errors,
+                "latency_sum": latency_sum,
+                "histogram": histogram,
+            }
+            if row is None:
+                inserts.append(values)
+            else:
+                values["count"] += row["count"]
+                values["error_count"] += row["error_count"]
+                values["latency_sum"] += row["latency_sum"]
+                values["histogram"] = merge_histograms(load_histogram(row["histogram"]), histogram)
+                updates.append(values)
+
+        for values in inserts + updates:
+            values["histogram"] = dump_histogram(values["histogram"])
+        values = dict(
+            count=bindparam("count"), error_count=bindparam("error_count"),
+            latency_sum=bindparam("latency_sum"), histogram=bindparam("histogram")
+        )
+        if inserts:
+            conn.execute(
+                table.insert().values(
+                    bucket_start=bindparam("b_start"), component_type=bindparam("b_type"), **values
+                ),
+                inserts
+            )
+        if updates:
+            conn.execute(
+                table.update()
+                .where(table.c.bucket_start == bindparam("b_start"))
+                .where(table.c.component_type == bindparam("b_type"))
+                .values(**values),
+                updates
+            )
+
+
+def update_rollups(conn, records):
+    """
+    Roll a batch of freshly inserted GenerationLog records up
+    (called from app.write_generation_logs, same transaction)
+
+    Also drops expired minute rollups, at most once per PRUNE_INTERVAL.
+    """
+    global _last_prune
+    write_rollups(conn, aggregate(records))
+
+    if time.monotonic() - _last_prune > PRUNE_INTERVAL:
+        _last_prune = time.monotonic()
+        table = RESOLUTIONS["minute"][0]
+        conn.execute(table.delete().where(
+            table.c.bucket_start < datetime.utcnow() - MINUTE_RETENTION
+        ))
+
+
+def backfill_rollups(conn, chunk_size=50000):
+    """
+    Build the rollups from existing logs (one-time migration)
+
+    Does nothing unless the hour rollups are empty and there are logs.
+    Runs in the caller's transaction; if two processes race, the second
+    one's write fails instead of counting the logs twice.
+
+    Returns:
+        int: Log rows rolled up
+    """
+    hour_table = RESOLUTIONS["hour"][0]
+    if conn.execute(select(hour_table.c.bucket_start).limit(1)).first() is not None:
+        return 0
+
+    columns = (LOG_TABLE.c.id, LOG_TABLE.c.created_at, LOG_TABLE.c.component_type,
+               LOG_TABLE.c.success, LOG_TABLE.c.generation_time)
+    totals = {}
+    rolled = 0
+    last_id = 0
+    cutoff = datetime.utcnow() - MINUTE_RETENTION
+    while True:
+        rows = conn.execute(
+            select(*columns).where(LOG_TABLE.c.id > last_id)
+            .order_by(LOG_TABLE.c.id).limit(chunk_size)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        rolled += len(rows)
+        aggregate([row for row in rows if row["created_at"] is not None], totals)
+
+    totals = {
+        key: entry for key, entry in totals.items()
+        if key[0] == "hour" or key[1] >= cutoff
+    }
+    write_rollups(conn, totals)
+    return rolled
+
+# ============================================
+# QUERIES
+# ============================================
+
+def window(hours, resolution, now=None):
+    """
+    Bucket-aligned (since, until) covering the last `hours` hours
+
+    The first bucket is the one containing now - hours, so the window can
+    start up to one bucket earlier than asked.
+    """
+    until = now or datetime.utcnow()
+    return bucket_start(until - timedelta(hours=hours), resolution), until
+
+
+def _rollup_rows(conn, resolution, since, until, component_type=None):
+    table = RESOLUTIONS[resolution][0]
+    query = select(
+        table.c.bucket_start, table.c.component_type, table.c.count,
+        table.c.error_count, table.c.latency_sum, table.c.histogram
+    ).where(table.c.bucket_start >= since, table.c.bucket_start <= until)
+    if component_type:
+        query = query.where(table.c.component_type == component_type)
+    return conn.execute(query.order_by(table.c.bucket_start)).all()
+
+
+def _group(rows, key):
+    """
+    Merge rollup rows that share a key
+
+    Returns:
+        dict: key value -> [count, error_count, latency_sum, histogram]
+    """
+    groups = {}
+    for row in rows:
+        count, errors, latency_sum, histogram = row[2:]
+        entry = groups.get(row[key])
+        if entry is None:
+            entry = groups[row[key]] = [0, 0, 0.0, []]
+        entry[0] += count
+        entry[1] += errors
+        entry[2] += latency_sum
+        entry[3].append(histogram)
+    for entry in groups.values():
+        entry[3] = sum_histograms(entry[3])
+    return groups
+
+
+def _summarize(count, errors, latency_sum, histogram, percentiles):
+    result = {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "mean": round(latency_sum / count, 4) if count else None,
+    }
+    for p in percentiles:
+        result[f"p{p:g}"] = percentile(histogram, count, p / 100)
+    return result
+
+
+def latency_series(conn, resolution, since, until, component_type=None,
+                   percentiles=DEFAULT_PERCENTILES):
+    """
+    Latency percentiles and error rate per bucket
+
+    Args:
+        conn: SQLAlchemy connection
+        resolution (str): "minute" or "hour"
+        since, until (datetime): Bucket start range (UTC)
+        component_type (str): Only this type (all types merged when None)
+        percentiles (tuple): Percentiles to estimate (0-100)
+
+    Returns:
+        list: [{"bucket": iso start, "count", "errors", "error_rate", "mean", "p50", ...}]
+    """
+    buckets = _group(_rollup_rows(conn, resolution, since, until, component_type), 0)
+    return [
+        dict(bucket=start.isoformat(), **_summarize(*entry, percentiles))
+        for start, entry in sorted(buckets.items())
+    ]
+
+
+def latency_summary(conn, resolution, since, until, percentiles=DEFAULT_PERCENTILES):
+    """
+    Latency percentiles and error rate per component type over a window
+
+    Returns:
+        dict: component_type -> summary, plus "all" for every type merged
+    """
+    types = _group(_rollup_rows(conn, resolution, since, until), 1)
+
+    overall = [0, 0, 0.0, empty_histogram()]
+    for count, errors, latency_sum, histogram in types.values():
+        overall[0] += count
+        overall[1] += errors
+        overall[2] += latency_sum
+        merge_histograms(overall[3], histogram)
+
+    summary = {name: _summarize(*entry, percentiles) for name, entry in sorted(types.items())}
+    summary["all"] = _summarize(*overall, percentiles)
+    return summary
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    import random
+    from sqlalchemy import create_engine
+
+    print("Testing Analytics...\n")
+
+    engine = create_engine("sqlite://")
+    for table in (LOG_TABLE, RESOLUTIONS["minute"][0], RESOLUTIONS["hour"][0]):
+        table.create(engine)
+
+    random.seed(7)
+    now = datetime.utcnow()
+    records = [
+        {
+            "prompt": "p", "component_type": random.choice(["button", "card"]),
+            "success": random.random() > 0.1, "error_message": None,
+            "created_at": now - timedelta(minutes=random.randint(0, 180)),
+            "generation_time": random.lognormvariate(0, 0.6)
+        }
+        for _ in range(20000)
+    ]
+
+    # Incremental (in writer-sized batches) vs one-shot backfill
+    with engine.begin() as conn:
+        for i in range(0, len(records), 200):
+            conn.execute(LOG_TABLE.insert(), records[i:i + 200])
+            update_rollups(conn, records[i:i + 200])
+        incremental = latency_summary(conn, "hour", *window(4, "hour", now))
+        for table in (RESOLUTIONS["minute"][0], RESOLUTIONS["hour"][0]):
+            conn.execute(table.delete())
+        backfilled = backfill_rollups(conn)
+        rebuilt = latency_summary(conn, "hour", *window(4, "hour", now))
+    print(f"1. {'✅' if incremental == rebuilt else '❌'} Incremental rollups match a "
+          f"backfill of {backfilled} rows")
+
+    exact = sorted(r["generation_time"] for r in records)
+    for p in DEFAULT_PERCENTILES:
+        true_value = exact[int(len(exact) * p / 100) - 1]
+        estimate = incremental["all"][f"p{p}"]
+        error = abs(estimate - true_value) / true_value
+        print(f"2. {'✅' if error < 0.05 else '❌'} p{p}: {estimate:.3f}s "
+              f"(exact {true_value:.3f}s, {error:.1%} off)")
+
+    errors = sum(not r["success"] for r in records)
+    ok = incremental["all"]["errors"] == errors
+    print(f"3. {'✅' if ok else '❌'} Error count {incremental['all']['errors']} (expected {errors})")
+
+    with engine.connect() as conn:
+        series = latency_series(conn, "minute", *window(1, "minute", now), component_type="card")
+    print(f"4. Last hour, per minute (card): {len(series)} buckets, latest {series[-1]}")
+
+    print("\n✅ Analytics working!")
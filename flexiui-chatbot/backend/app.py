@@ -1,33 +1,434 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify, Response, stream_with_context, g, current_app
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import json
+import time
+import base64
+import threading
+from datetime import datetime, timezone
+from functools import partial
+from sqlalchemy import tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import our AI service (we'll create this next)
-from ai_service import generate_ui_component, chat_with_bot
+from ai_service import (
+    generate_ui_component, chat_with_bot, stream_ui_component, stream_chat_with_bot,
+    modify_ui_component, usable_code, client as upstream_client
+)
+from upstream import import_sdk
+from cache import generation_cache, CACHE_MODES, CACHE_USE
+from similarity import similarity_index
+from singleflight import inflight
+from batch import iter_batch, validate_items
+from models import db, Project, GenerationLog, enable_sqlite_wal, ensure_indexes, ensure_columns
+from log_writer import generation_logs
+from blobs import code_blobs, migrate_inline_code
+from search import ensure_search_index, index_project, search_projects
+from router import model_router
+from budget import output_budget
+from admission import admission, AdmissionRejected, enter_client, exit_client
+from compression import response_compressor, make_etag
+from analytics import (
+    RESOLUTIONS, DEFAULT_PERCENTILES, update_rollups, backfill_rollups,
+    window, latency_series, latency_summary
+)
+import metrics
+from sessions import create_session, get_session, live_history, record_turn, full_history
+from prompts import detect_theme, detect_themes, resolve_component_type
 
-# Initialize Flask app
-app = Flask(__name__)
+# Every route lives on this blueprint; create_app() (at the bottom) builds
+# the Flask app around it
+api = Blueprint('api', __name__)
 
-# Enable CORS (allows frontend to connect from any origin)
-# CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
+# Request headers the frontend may send cross-origin (X-Client-Id is the
+# admission fairness key), and response headers it may read
+CORS_ALLOW_HEADERS = ["Content-Type", "X-Client-Id", "If-None-Match"]
+CORS_EXPOSE_HEADERS = ["Retry-After", "ETag"]
 
-# Enable CORS properly
-CORS(app, resources={
-    r"/api/*": {
-        "origins": "*",
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+# ============================================
+# Project helpers
+# ============================================
+def save_project(prompt, component_type, code):
+    """
+    Store a generated component and add it to the search and similarity
+    indexes
+    
+    Returns:
+        Project: The saved project
+    """
+    component_type = resolve_component_type(component_type)
+    project = Project(
+        name=prompt[:200],
+        prompt=prompt,
+        component_type=component_type
+    )
+    db.session.add(project)
+    project.write_code(code)
+    db.session.flush()
+    index_project(db.session.connection(), project.id, project.name, prompt, code.get('html'))
+    db.session.commit()
+    
+    similarity_index.add(project.id, prompt, component_type, detect_theme(prompt))
+    return project
+
+def load_project_code(app, project_id):
+    """
+    Load the code of a saved project (used by the similarity index)
+    
+    Pushes its own app context so it also works from the async server's
+    worker threads. Projects changed through /api/modify-ui no longer hold
+    what their prompt generated, so they are not served (other workers'
+    indexes may still point at them).
+    """
+    with app.app_context():
+        project = db.session.get(Project, project_id)
+        if project is None or project.modified_at is not None:
+            return None
+        return project.read_code()
+
+PROJECT_PAGE_SIZE = 20
+MAX_PROJECT_PAGE_SIZE = 100
+
+def encode_cursor(project):
+    """Opaque /api/projects cursor pointing just past a project"""
+    raw = f"{project.created_at.isoformat()}|{project.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (created_at, id)
+    
+    Raises:
+        ValueError: Malformed cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, project_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(project_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def parse_fields(value, default):
+    """
+    Parse a fields= projection ("id,name,created_at")
+    
+    Raises:
+        ValueError: Unknown field
+    """
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in Project.FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Use any of: {', '.join(Project.FIELDS)}")
+    return fields or default
+
+def project_query(fields):
+    """Project query that only loads the columns `fields` needs"""
+    columns = {Project.column_name(name) for name in ('id', 'created_at', *fields)}
+    return db.session.query(Project).options(
+        load_only(*(getattr(Project, name) for name in columns))
+    )
+
+def list_projects(cursor=None, limit=PROJECT_PAGE_SIZE, fields=Project.LIST_FIELDS):
+    """
+    One page of saved projects, newest first
+    
+    Keyset pagination: the cursor holds the (created_at, id) of the last
+    project sent, so every page is an index range scan on
+    ix_projects_created_id however deep it is.
+    
+    Returns:
+        tuple: (projects, next_cursor or None)
+    """
+    query = project_query(fields)
+    if cursor:
+        query = query.filter(tuple_(Project.created_at, Project.id) < decode_cursor(cursor))
+    
+    projects = query.order_by(
+        Project.created_at.desc(), Project.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = encode_cursor(projects[limit - 1]) if len(projects) > limit else None
+    return projects[:limit], next_cursor
+
+def warm_similarity_index(app):
+    """
+    Load the most recent saved prompts into the similarity index (projects
+    changed through /api/modify-ui are left out, see load_project_code)
+    
+    FLEXIUI_SIMILARITY_WARM_LIMIT - how many projects to load (default 100000)
+    """
+    limit = int(os.getenv('FLEXIUI_SIMILARITY_WARM_LIMIT', 100000))
+    with app.app_context():
+        rows = db.session.query(
+            Project.id, Project.prompt, Project.component_type
+        ).filter(Project.modified_at.is_(None)).order_by(Project.id.desc()).limit(limit).all()
+    
+    # Oldest first, so the newest project wins for identical prompts
+    rows.reverse()
+    themes = detect_themes([prompt for _, prompt, _ in rows])
+    for (project_id, prompt, component_type), theme in zip(rows, themes):
+        similarity_index.add(
+            project_id, prompt, resolve_component_type(component_type), theme
+        )
+
+def generation_payload(prompt, component_type, generated_code, routing=None, fresh=False):
+    """
+    Save a new generation and build the /api/generate-ui response body
+    
+    routing is the model router's decision (see router.py), if known.
+    fresh: the result came from this request's own upstream call (see
+    ai_service.note_fresh). Cache and similarity hits are already saved,
+    so they get no new project (project_id is None).
+    """
+    # Save new, complete generations so similar prompts can reuse them
+    project_id = None
+    if fresh and usable_code(generated_code):
+        project_id = save_project(prompt, component_type, generated_code).id
+    
+    return {
+        "success": True,
+        "code": generated_code,
+        "prompt": prompt,
+        "project_id": project_id,
+        "routing": routing
     }
-})
+
+# ============================================
+# Chat session helpers
+# ============================================
+def open_chat(data):
+    """
+    Work out where the history of a chat request comes from
+    
+    - "session_id": history is loaded from the server-side session
+    - "conversation_history": legacy stateless mode, client sends everything
+    - neither: a new session is started
+    
+    Returns:
+        tuple: (session or None, history, session_state or None), or None if
+               the session id is unknown or expired
+    """
+    if data.get('session_id'):
+        session = get_session(str(data['session_id']))
+        if session is None:
+            return None
+        return session, live_history(session), {"summary": session.summary or ""}
+    
+    if 'conversation_history' in data:
+        return None, data.get('conversation_history') or [], None
+    
+    session = create_session()
+    return session, [], {"summary": ""}
+
+def close_chat(session, session_state, user_message, bot_response, payload):
+    """
+    Store the turn in the session (if any) and add its id to the response
+    """
+    if session is None:
+        return payload
+    if not bot_response.startswith("Error:"):
+        record_turn(
+            session, user_message, bot_response,
+            session_state["summary"], session_state.get("folded", 0)
+        )
+    payload["session_id"] = session.id
+    return payload
+
+# ============================================
+# Server-Sent Events helpers
+# ============================================
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """
+    Wrap a generator of SSE messages in an unbuffered streaming response
+    """
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # stop nginx from buffering the stream
+        }
+    )
+
+def write_generation_logs(app, records):
+    """
+    Insert a batch of GenerationLog records and update the analytics
+    rollups in one transaction (called from the log writer's background thread)
+    """
+    with app.app_context():
+        db.session.execute(GenerationLog.__table__.insert(), records)
+        update_rollups(db.session.connection(), records)
+        db.session.commit()
+
+# ============================================
+# Request metrics (see metrics.py; skipped when FLEXIUI_METRICS=0)
+# ============================================
+def start_request_metrics():
+    """Label everything recorded during the request with its route"""
+    g.metrics_started = time.perf_counter()
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_token = metrics.enter_request(g.metrics_route)
+
+def note_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+def finish_request_metrics(error=None):
+    """
+    Record the request duration (runs after streamed responses finish)
+    """
+    if 'metrics_started' not in g:
+        return
+    metrics.observe_request(
+        g.metrics_route, request.method, g.get('metrics_status', 500),
+        time.perf_counter() - g.metrics_started
+    )
+    metrics.exit_request(g.pop('metrics_token'))
+
+
+# ============================================
+# Compression and conditional GETs (see compression.py)
+# ============================================
+def finish_response(response):
+    """
+    ETag and If-None-Match for GETs, then the negotiated encoding
+    
+    Streamed responses (SSE) and ones a route already encoded (see
+    generation_response()) are left alone.
+    """
+    if response.is_streamed or response.status_code != 200 or 'Accept-Encoding' in response.vary:
+        return response
+    body = response.get_data()
+    etag = None
+    if request.method in ('GET', 'HEAD'):
+        etag = response.headers.get('ETag') or make_etag(body)
+        matched = response_compressor.not_modified(request.headers.get('If-None-Match'), etag)
+        if matched:
+            return not_modified_response(response, matched)
+    encoded, encoding = response_compressor.encode(body, request.headers.get('Accept-Encoding'), etag)
+    if encoding:
+        response.set_data(encoded)
+    return set_encoding_headers(response, encoding, etag)
+
+def set_encoding_headers(response, encoding, etag=None):
+    for name, value in response_compressor.headers(encoding, etag):
+        if name == 'Vary':
+            response.vary.add(value)
+        else:
+            response.headers[name] = value
+    return response
+
+def not_modified_response(response, etag):
+    """Turn a response into a bodyless 304 (etag: the tag the client sent)"""
+    response.status_code = 304
+    response.set_data(b'')
+    response.headers.pop('Content-Type', None)
+    response.headers.pop('Content-Length', None)
+    response.headers['ETag'] = etag
+    response.vary.add('Accept-Encoding')
+    return response
+
+def generation_response(payload):
+    """
+    /api/generate-ui response, compressed with the generation's cached code
+    segment when the client takes gzip
+    """
+    body, encoding = response_compressor.encode_generation(payload, request.headers.get('Accept-Encoding'))
+    return set_encoding_headers(Response(body, mimetype='application/json'), encoding)
+
+def project_etag(project, fields):
+    """
+    Strong ETag of a project's detail body, from its code blob hashes and
+    metadata (the code itself isn't loaded)
+    """
+    return make_etag(','.join(fields), *(
+        getattr(project, Project.column_name(field)) for field in fields
+    ))
+
+
+# ============================================
+# Admission control (see admission.py; skipped without an upstream quota)
+# ============================================
+def start_admission_scope():
+    """Tag the request's upstream calls with its client (for fair queueing)"""
+    g.admission_token = enter_client(request.headers.get('X-Client-Id') or request.remote_addr)
+
+def finish_admission_scope(error=None):
+    exit_client(g.pop('admission_token', None))
+
+def overloaded_payload(error):
+    """Body of a 429/503 answer for a shed request"""
+    return {
+        "success": False,
+        "error": str(error),
+        "status": error.status,
+        "retry_after": int(error.retry_after_header())
+    }
+
+def overloaded_response(error):
+    """429/503 answer with Retry-After for a shed request"""
+    return jsonify(overloaded_payload(error)), error.status, {"Retry-After": error.retry_after_header()}
+
+def seed_model_router(app, limit=2000):
+    """
+    Give the model router the latencies of recent upstream-served requests
+    
+    Only rows with output_tokens made the upstream call themselves;
+    requests that waited for an identical one in flight (singleflight.py)
+    logged their wait. The time is the request's, so a little above the
+    upstream's own latency. Rows older than the router's max sample age
+    are dropped by the router.
+    """
+    with app.app_context():
+        rows = db.session.query(
+            GenerationLog.model, GenerationLog.component_type, GenerationLog.generation_time,
+            GenerationLog.created_at
+        ).filter(
+            GenerationLog.model.isnot(None), GenerationLog.success.is_(True),
+            GenerationLog.output_tokens.isnot(None)
+        ).order_by(GenerationLog.id.desc()).limit(limit).all()
+    model_router.load_history(
+        (model, component_type if component_type == "chat" else resolve_component_type(component_type),
+         seconds, created_at.replace(tzinfo=timezone.utc).timestamp())
+        for model, component_type, seconds, created_at in reversed(rows)
+    )
+
+def seed_output_budget(app, limit=5000):
+    """
+    Give the output budgets the answer sizes of recent upstream-served
+    requests (see budget.py)
+    """
+    with app.app_context():
+        rows = db.session.query(
+            GenerationLog.component_type, GenerationLog.prompt, GenerationLog.output_tokens
+        ).filter(
+            GenerationLog.output_tokens.isnot(None)
+        ).order_by(GenerationLog.id.desc()).limit(limit).all()
+    rows.reverse()
+    themes = detect_themes([prompt for _, prompt, _ in rows])
+    output_budget.load_history(
+        ("chat", "chat", None, tokens) if component_type == "chat"
+        else ("generate", resolve_component_type(component_type), theme, tokens)
+        for (component_type, _, tokens), theme in zip(rows, themes)
+    )
+
 
 # ============================================
 # ROUTE 1: Test endpoint to check if server is running
 # ============================================
-@app.route('/', methods=['GET'])
+@api.route('/', methods=['GET'])
 def home():
     """
     Simple test endpoint
@@ -38,14 +439,26 @@ def home():
         "status": "success",
         "endpoints": {
             "chat": "/api/chat",
-            "generate": "/api/generate-ui"
+            "chat_stream": "/api/chat/stream",
+            "chat_session": "/api/chat/sessions/<session_id>",
+            "generate": "/api/generate-ui",
+            "generate_stream": "/api/generate-ui/stream",
+            "generate_batch": "/api/generate-ui/batch",
+            "modify": "/api/modify-ui",
+            "projects": "/api/projects",
+            "projects_search": "/api/projects/search?q=",
+            "project": "/api/projects/<project_id>",
+            "cache_stats": "/api/cache/stats",
+            "metrics": "/api/metrics",
+            "analytics_latency": "/api/analytics/latency",
+            "analytics_summary": "/api/analytics/summary"
         }
     })
 
 # ============================================
 # ROUTE 2: Chat endpoint
 # ============================================
-@app.route('/api/chat', methods=['POST'])
+@api.route('/api/chat', methods=['POST'])
 def chat():
     """
     Handle chat messages from user
@@ -53,8 +466,12 @@ def chat():
     Expected JSON:
     {
         "message": "How do I create a navbar?",
-        "conversation_history": []  # optional
+        "session_id": "..."          # optional: continue a server-side session
+        "conversation_history": []  # optional: stateless mode, no session
     }
+    
+    Without either, a new session is started and its "session_id" is
+    returned; later messages only need to send that id.
     """
     try:
         # Get data from request
@@ -67,27 +484,105 @@ def chat():
             }), 400
         
         user_message = data['message']
-        conversation_history = data.get('conversation_history', [])
+        opened = open_chat(data)
+        if opened is None:
+            return jsonify({
+                "error": "Unknown or expired session"
+            }), 404
+        session, conversation_history, session_state = opened
         
         # Get response from AI
-        bot_response = chat_with_bot(user_message, conversation_history)
+        history_metrics = {}
+        bot_response = chat_with_bot(
+            user_message, conversation_history, history_metrics, session_state
+        )
+        routing = history_metrics.pop("routing", None)
         
-        return jsonify({
+        return jsonify(close_chat(session, session_state, user_message, bot_response, {
             "success": True,
             "response": bot_response,
-            "timestamp": os.time.time()
-        })
+            "timestamp": time.time(),
+            "history": history_metrics,
+            "routing": routing
+        }))
         
+    except AdmissionRejected as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@api.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming chat (Server-Sent Events)
+    
+    Same JSON body as /api/chat. Emits "token" events as text arrives and a
+    final "done" event with the same payload /api/chat returns.
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or 'message' not in data:
+        return jsonify({
+            "error": "Please provide a message"
+        }), 400
+    
+    user_message = data['message']
+    opened = open_chat(data)
+    if opened is None:
+        return jsonify({
+            "error": "Unknown or expired session"
+        }), 404
+    session, conversation_history, session_state = opened
+    
+    def events():
+        # Comment line so headers go out before the first token
+        yield ": stream open\n\n"
+        history_metrics = {}
+        try:
+            for kind, value in stream_chat_with_bot(
+                user_message, conversation_history, history_metrics, session_state
+            ):
+                if kind == "token":
+                    yield sse_event("token", {"text": value})
+                else:
+                    routing = history_metrics.pop("routing", None)
+                    yield sse_event("done", close_chat(session, session_state, user_message, value, {
+                        "success": True,
+                        "response": value,
+                        "timestamp": time.time(),
+                        "history": history_metrics,
+                        "routing": routing
+                    }))
+        except AdmissionRejected as e:
+            # Headers are already out: the status travels in the event
+            yield sse_event("error", overloaded_payload(e))
+    
+    return sse_response(events())
+
+@api.route('/api/chat/sessions/<session_id>', methods=['GET'])
+def chat_session_history(session_id):
+    """
+    Full message log of a chat session (for redrawing the chat window)
+    """
+    session = get_session(session_id)
+    if session is None:
+        return jsonify({
+            "error": "Unknown or expired session"
+        }), 404
+    
+    return jsonify({
+        "success": True,
+        "session": session.to_dict(),
+        "messages": full_history(session)
+    })
+
 # ============================================
 # ROUTE 3: Generate UI Component endpoint
 # ============================================
-@app.route('/api/generate-ui', methods=['POST'])
+@api.route('/api/generate-ui', methods=['POST'])
 def generate_ui():
     """
     Generate UI component from prompt
@@ -95,7 +590,8 @@ def generate_ui():
     Expected JSON:
     {
         "prompt": "Create a dark navbar with logo",
-        "component_type": "navbar"  # optional
+        "component_type": "navbar",  # optional
+        "cache": "bypass"            # optional: "use" (default), "bypass" or "refresh"
     }
     """
     try:
@@ -110,16 +606,242 @@ def generate_ui():
         
         prompt = data['prompt']
         component_type = data.get('component_type', 'general')
+        cache_mode = data.get('cache', CACHE_USE)
+        
+        if cache_mode not in CACHE_MODES:
+            return jsonify({
+                "error": f"Invalid cache mode. Use one of: {', '.join(CACHE_MODES)}"
+            }), 400
         
         # Generate UI using AI
-        generated_code = generate_ui_component(prompt, component_type)
+        generation_metrics = {}
+        generated_code = generate_ui_component(prompt, component_type, cache_mode, generation_metrics)
+        
+        return generation_response(generation_payload(
+            prompt, component_type, generated_code, generation_metrics.get("routing"),
+            generation_metrics.get("fresh", False)
+        ))
+        
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@api.route('/api/generate-ui/stream', methods=['POST'])
+def generate_ui_stream():
+    """
+    Streaming UI generation (Server-Sent Events)
+    
+    Same JSON body as /api/generate-ui. Emits "token" events with raw model
+    output, a "section" event as soon as each of html/css/js is complete,
+    and a final "done" event with the same payload /api/generate-ui returns.
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or 'prompt' not in data:
+        return jsonify({
+            "error": "Please provide a prompt"
+        }), 400
+    
+    prompt = data['prompt']
+    component_type = data.get('component_type', 'general')
+    cache_mode = data.get('cache', CACHE_USE)
+    
+    if cache_mode not in CACHE_MODES:
+        return jsonify({
+            "error": f"Invalid cache mode. Use one of: {', '.join(CACHE_MODES)}"
+        }), 400
+    
+    def events():
+        yield ": stream open\n\n"
+        try:
+            generation_metrics = {}
+            for kind, value in stream_ui_component(prompt, component_type, cache_mode, generation_metrics):
+                if kind == "token":
+                    yield sse_event("token", {"text": value})
+                elif kind == "section":
+                    yield sse_event("section", value)
+                else:
+                    yield sse_event("done", generation_payload(
+                        prompt, component_type, value, generation_metrics.get("routing"),
+                        generation_metrics.get("fresh", False)
+                    ))
+        except AdmissionRejected as e:
+            yield sse_event("error", overloaded_payload(e))
+        except Exception as e:
+            yield sse_event("error", {"success": False, "error": str(e)})
+    
+    return sse_response(events())
+
+@api.route('/api/generate-ui/batch', methods=['POST'])
+def generate_ui_batch():
+    """
+    Generate several components in parallel
+    
+    Expected JSON:
+    {
+        "items": [
+            {"prompt": "Dark navbar with logo", "component_type": "navbar"},
+            {"prompt": "Pricing card", "component_type": "card"}
+        ],
+        "cache": "use",   # optional, applies to every item
+        "stream": false   # optional: true streams results (SSE) as they finish
+    }
+    
+    Results carry their input "index", per-item "success"/"error" and "time".
+    Without streaming they are returned in input order. Streamed results are
+    "result" events, except items whose project couldn't be saved, which
+    come as "error" events.
+    """
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({
+            "error": "Please provide items"
+        }), 400
+    
+    items = data.get('items')
+    cache_mode = data.get('cache', CACHE_USE)
+    
+    error = validate_items(items)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    if cache_mode not in CACHE_MODES:
+        return jsonify({
+            "error": f"Invalid cache mode. Use one of: {', '.join(CACHE_MODES)}"
+        }), 400
+    
+    def finish(result):
+        # New projects are saved here, on the request thread. A failed save
+        # fails its own item, not the rest of the batch; returns True then
+        result["project_id"] = None
+        if not (result.pop("fresh") and usable_code(result["code"])):
+            return False
+        try:
+            result["project_id"] = save_project(
+                result["prompt"], result["component_type"], result["code"]
+            ).id
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            result["success"] = False
+            result["error"] = f"Could not save the project: {e}"
+            return True
+        return False
+    
+    start = time.perf_counter()
+    
+    if data.get('stream'):
+        def events():
+            yield ": stream open\n\n"
+            for result in iter_batch(items, cache_mode):
+                save_failed = finish(result)
+                yield sse_event("error" if save_failed else "result", result)
+            yield sse_event("done", {
+                "success": True,
+                "count": len(items),
+                "total_time": round(time.perf_counter() - start, 3)
+            })
+        
+        return sse_response(events())
+    
+    try:
+        results = [None] * len(items)
+        for result in iter_batch(items, cache_mode):
+            finish(result)
+            results[result["index"]] = result
+        
+        return jsonify({
+            "success": True,
+            "results": results,
+            "total_time": round(time.perf_counter() - start, 3)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+# ============================================
+# ROUTE 4: Modify a saved UI component
+# ============================================
+@api.route('/api/modify-ui', methods=['POST'])
+def modify_ui():
+    """
+    Change a saved project's code
+    
+    The code stays on the server: the client sends the project id and what
+    to change, the model answers with a small patch (see patching.py) and
+    the project is updated in place.
+    
+    Expected JSON:
+    {
+        "project_id": 12,
+        "modification": "Make the button red"
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'project_id' not in data or not data.get('modification'):
+            return jsonify({
+                "error": "Please provide a project_id and a modification"
+            }), 400
+        
+        project_id = data['project_id']
+        if not isinstance(project_id, int) or isinstance(project_id, bool):
+            return jsonify({
+                "error": "project_id must be an integer"
+            }), 400
+        
+        project = db.session.get(Project, project_id)
+        if project is None:
+            return jsonify({
+                "error": "Project not found"
+            }), 404
+        
+        current_code = project.read_code()
+        modification_metrics = {}
+        updated_code = modify_ui_component(current_code, data['modification'], modification_metrics)
+        
+        if 'error' in updated_code:
+            return jsonify({
+                "success": False,
+                "error": updated_code['error']
+            }), 502
+        
+        # A cut-off or incomplete rewrite must not replace the saved code
+        if not usable_code(updated_code):
+            missing = updated_code.get('partial_sections', []) + updated_code.get('missing_sections', [])
+            return jsonify({
+                "success": False,
+                "error": f"The modified code is incomplete ({', '.join(missing) or 'html'}); "
+                         "the project was not changed"
+            }), 502
+        
+        project.write_code(updated_code)
+        project.modified_at = datetime.utcnow()
+        index_project(
+            db.session.connection(), project.id, project.name, project.prompt, updated_code.get('html')
+        )
+        db.session.commit()
+        
+        # Near-duplicates of the original prompt must not get the edited code
+        similarity_index.remove(project.id)
         
         return jsonify({
             "success": True,
-            "code": generated_code,
-            "prompt": prompt
+            "code": updated_code,
+            "project_id": project.id,
+            "modification": modification_metrics
         })
         
+    except AdmissionRejected as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({
             "success": False,
@@ -127,18 +849,398 @@ def generate_ui():
         }), 500
 
 # ============================================
-# ROUTE 4: Health check
+# ROUTE 5: Saved projects
+# ============================================
+@api.route('/api/projects', methods=['GET'])
+def projects_list():
+    """
+    Saved projects, newest first, without their code by default
+    
+    Query parameters:
+        cursor: next_cursor from the previous page (omit for the first page)
+        limit: Projects per page (default 20, max 100)
+        fields: Comma-separated projection, e.g. "id,name,created_at"
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', PROJECT_PAGE_SIZE)), 1), MAX_PROJECT_PAGE_SIZE)
+        fields = parse_fields(request.args.get('fields'), Project.LIST_FIELDS)
+        projects, next_cursor = list_projects(request.args.get('cursor'), limit, fields)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    return jsonify({
+        "success": True,
+        "projects": [project.to_dict(fields) for project in projects],
+        "next_cursor": next_cursor
+    })
+
+MAX_SEARCH_OFFSET = 1000
+
+@api.route('/api/projects/search', methods=['GET'])
+def projects_search():
+    """
+    Full-text search over project names, prompts and generated page text
+    
+    Query parameters:
+        q: Search text (every word must match; "word*" matches a prefix)
+        limit: Results per page (default 20, max 100)
+        offset: Results to skip (max 1000)
+    
+    Results are best match first, each with a <mark>-highlighted snippet.
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"success": False, "error": "Please provide a search query (q)"}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', PROJECT_PAGE_SIZE)), 1), MAX_PROJECT_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit and offset must be integers"}), 400
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        return jsonify({"success": False, "error": f"offset must be between 0 and {MAX_SEARCH_OFFSET}"}), 400
+    
+    results, has_more = search_projects(db.session.connection(), q, limit, offset)
+    return jsonify({
+        "success": True,
+        "query": q,
+        "results": results,
+        "next_offset": offset + limit if has_more else None
+    })
+
+@api.route('/api/projects/<int:project_id>', methods=['GET'])
+def project_detail(project_id):
+    """
+    One saved project, code included
+    
+    Query parameters:
+        fields: Comma-separated projection (default: every field)
+    
+    Sends a strong ETag; If-None-Match with it gets a 304 before any code
+    is read from the blob store.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), Project.FIELDS)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    project = project_query(fields).filter(Project.id == project_id).first()
+    if project is None:
+        return jsonify({"success": False, "error": "Project not found"}), 404
+    
+    etag = project_etag(project, fields)
+    matched = response_compressor.not_modified(request.headers.get('If-None-Match'), etag)
+    if matched:
+        return not_modified_response(Response(), matched)
+    
+    response = jsonify({"success": True, "project": project.to_dict(fields)})
+    response.headers['ETag'] = etag
+    return response
+
 # ============================================
-@app.route('/api/health', methods=['GET'])
+# ROUTE 6: Generation cache statistics
+# ============================================
+@api.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Hit/miss counters for the generation cache, similarity index,
+    request coalescing and the request log writer
+    """
+    return jsonify({
+        "success": True,
+        "cache": generation_cache.stats(),
+        "similarity": similarity_index.stats(),
+        "inflight": inflight.stats(),
+        "request_log": generation_logs.stats(),
+        "code_blobs": code_blobs.stats()
+    })
+
+# ============================================
+# ROUTE 7: Prometheus metrics
+# ============================================
+@api.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Per-stage latency histograms, token usage and parse fallbacks in the
+    Prometheus text format
+    """
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ============================================
+# ROUTE 8: Latency and error analytics (from the rollup tables)
+# ============================================
+MAX_ANALYTICS_BUCKETS = 10000
+
+def analytics_window():
+    """
+    Parse the shared analytics query parameters
+    
+    Returns:
+        tuple: (resolution, since, until, percentiles)
+    
+    Raises:
+        ValueError: Invalid parameter (message is sent back as a 400)
+    """
+    resolution = request.args.get('resolution', 'hour')
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Invalid resolution. Use one of: {', '.join(RESOLUTIONS)}")
+    
+    try:
+        hours = float(request.args.get('hours', 24))
+        percentiles = tuple(
+            float(p) for p in request.args.get('percentiles', '').split(',') if p.strip()
+        ) or DEFAULT_PERCENTILES
+    except ValueError:
+        raise ValueError("hours and percentiles must be numbers")
+    
+    if hours <= 0 or not all(0 < p <= 100 for p in percentiles):
+        raise ValueError("hours must be positive and percentiles between 0 and 100")
+    if hours * 3600 / RESOLUTIONS[resolution][1].total_seconds() > MAX_ANALYTICS_BUCKETS:
+        raise ValueError(f"Too many {resolution} buckets; use a shorter window or hour resolution")
+    
+    since, until = window(hours, resolution)
+    return resolution, since, until, percentiles
+
+@api.route('/api/analytics/latency', methods=['GET'])
+def analytics_latency():
+    """
+    Latency percentiles and error rate per minute/hour bucket
+    
+    Query parameters:
+        resolution: "minute" or "hour" (default "hour")
+        hours: Window ending now (default 24)
+        component_type: Only this type (default: all types merged)
+        percentiles: Comma-separated, e.g. "50,95,99" (default)
+    """
+    try:
+        resolution, since, until, percentiles = analytics_window()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    series = latency_series(
+        db.session.connection(), resolution, since, until,
+        request.args.get('component_type'), percentiles
+    )
+    return jsonify({
+        "success": True,
+        "resolution": resolution,
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        "buckets": series
+    })
+
+@api.route('/api/analytics/summary', methods=['GET'])
+def analytics_summary():
+    """
+    Latency percentiles and error rate per component type over a window
+    
+    Query parameters: resolution, hours, percentiles (see /api/analytics/latency)
+    """
+    try:
+        resolution, since, until, percentiles = analytics_window()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    return jsonify({
+        "success": True,
+        "resolution": resolution,
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        "component_types": latency_summary(
+            db.session.connection(), resolution, since, until, percentiles
+        )
+    })
+
+# ============================================
+# ROUTE 9: Health check
+# ============================================
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """
     Check if API is healthy
+    
+    "degraded" while the upstream circuit breaker is open (Groq calls are
+    failing and new ones fail fast). "router" shows the model routing
+    decisions so far and the latency/parse failures seen per model,
+    "output_budget" the max_tokens budgets, truncations and tokens saved,
+    "admission" the shared upstream quota, queue and requests shed,
+    "compression" the bytes saved, 304s sent and encoding time.
     """
+    upstream = upstream_client.stats()
     return jsonify({
-        "status": "healthy",
-        "groq_api_configured": bool(os.getenv('GROQ_API_KEY'))
+        "status": "healthy" if upstream["breaker"] == "closed" else "degraded",
+        "groq_api_configured": bool(os.getenv('GROQ_API_KEY') or os.getenv('GROQ_API_KEYS')),
+        "upstream": upstream,
+        "router": model_router.stats(),
+        "output_budget": output_budget.stats(),
+        "admission": admission.stats(),
+        "compression": response_compressor.stats()
     })
 
+# ============================================
+# App factory and warm-up
+# ============================================
+def create_app(config=None):
+    """
+    Build the Flask app
+    
+    Cheap on purpose (new workers start fast, and a missing API key doesn't
+    break the import): the database, the model router/output budget
+    history, the upstream clients and the similarity index are set up by
+    warm_up() - on the first request, or up front by a launcher (see
+    gunicorn.conf.py). FLEXIUI_WARM_ON_START=1 warms up here instead.
+    
+    Args:
+        config (dict): Flask config overrides (e.g. SQLALCHEMY_DATABASE_URI)
+    
+    Returns:
+        Flask: The app
+    """
+    app = Flask(__name__)
+    
+    # Database (relative SQLite paths live in the instance/ folder)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///flexiui.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config or {})
+    db.init_app(app)
+    
+    # Enable CORS (allows frontend to connect from any origin)
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": "*",
+            "methods": ["GET", "POST", "OPTIONS"],
+            "allow_headers": CORS_ALLOW_HEADERS,
+            "expose_headers": CORS_EXPOSE_HEADERS
+        }
+    })
+    
+    app.extensions['flexiui'] = {"prepared": False, "worker": None, "lock": threading.Lock()}
+    app.before_request(ensure_warm)
+    if metrics.ENABLED:
+        app.before_request(start_request_metrics)
+        app.after_request(note_response_status)
+        app.teardown_request(finish_request_metrics)
+    if admission.enabled:
+        app.before_request(start_admission_scope)
+        app.teardown_request(finish_admission_scope)
+    # Registered last so it runs first: the metrics see the final status
+    app.after_request(finish_response)
+    
+    app.register_blueprint(api)
+    
+    # Background helpers that need the app (and its context)
+    similarity_index.loader = partial(load_project_code, app)
+    generation_logs.sink = partial(write_generation_logs, app)
+    
+    if os.getenv('FLEXIUI_WARM_ON_START') == '1':
+        warm_up(app)
+    return app
+
+def prepare_database(app):
+    """Create tables and run the migrations added after the database was created"""
+    with app.app_context():
+        enable_sqlite_wal(db.engine)
+        migrate_schema()
+        
+        # Rollups are derived data: the app works without them (the
+        # analytics routes just start from an empty history)
+        try:
+            with db.engine.begin() as conn:
+                rolled = backfill_rollups(conn)
+            if rolled:
+                print(f"📊 Rolled up {rolled} existing generation logs")
+        except Exception as e:
+            print(f"⚠️  Analytics backfill skipped: {e}")
+
+def migrate_schema():
+    """
+    Create missing tables, then add the columns, indexes, blob storage and
+    search index that came after the database was created
+    
+    One transaction, and errors propagate: the models need this schema, so
+    a failed migration stops the start instead of leaving a half-migrated
+    database behind. On SQLite the transaction takes the write lock up front
+    (BEGIN IMMEDIATE), so a worker starting at the same time waits for the
+    other one's migration (up to FLEXIUI_MIGRATION_TIMEOUT_S, default 600)
+    and then finds nothing left to do.
+    """
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            timeout_ms = int(float(os.getenv('FLEXIUI_MIGRATION_TIMEOUT_S', 600)) * 1000)
+            conn.exec_driver_sql(f"PRAGMA busy_timeout = {timeout_ms}")
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        db.metadata.create_all(conn)
+        added = ensure_columns(conn)
+        ensure_indexes(conn)
+        blob_report = migrate_inline_code(conn)
+        searchable = ensure_search_index(conn)
+        conn.commit()
+    if added:
+        print(f"🧱 Added columns: {', '.join(added)}")
+    if blob_report:
+        print(f"📦 Moved project code to the blob store: {blob_report} "
+              f"(run migrate_blobs.py to VACUUM the file)")
+    if searchable:
+        print(f"🔎 Indexed {searchable} existing projects for search")
+
+def prepare_app(app):
+    """
+    Fork-safe part of the warm-up: database setup, routing/budget history
+    and the groq SDK import
+    
+    Leaves no open connections or threads behind, so a pre-fork server can
+    run it once in the master process and every worker inherits the result
+    (see gunicorn.conf.py).
+    """
+    state = app.extensions['flexiui']
+    with state["lock"]:
+        if state["prepared"]:
+            return
+        prepare_database(app)
+        seed_model_router(app)
+        seed_output_budget(app)
+        import_sdk()
+        with app.app_context():
+            db.engine.dispose()
+        state["prepared"] = True
+
+def init_worker(app):
+    """
+    Per-process part of the warm-up: upstream clients and the similarity
+    index loader thread (run in each worker, after any fork)
+    """
+    state = app.extensions['flexiui']
+    with state["lock"]:
+        if state["worker"] == os.getpid():
+            return
+        # Connections inherited from a parent process aren't ours to use
+        with app.app_context():
+            db.engine.dispose()
+        upstream_client.reset()
+        # Without a key the first call reports the SDK's error instead
+        if all(upstream_client.api_keys):
+            upstream_client.connect()
+        threading.Thread(target=warm_similarity_index, args=(app,), daemon=True).start()
+        state["worker"] = os.getpid()
+
+def warm_up(app):
+    """Everything a request needs, set up once per process (idempotent)"""
+    prepare_app(app)
+    init_worker(app)
+
+def is_warm(app):
+    state = app.extensions['flexiui']
+    return state["prepared"] and state["worker"] == os.getpid()
+
+def ensure_warm():
+    """before_request hook: warm up on the first request not preceded by warm_up()"""
+    app = current_app._get_current_object()
+    if not is_warm(app):
+        warm_up(app)
+
+# Module-level app for `python app.py`, WSGI servers (app:app) and asgi_app.py
+app = create_app()
+
 # ============================================
 # Run the Flask app
 # ============================================
@@ -0,0 +1,282 @@
+"""
+Async (ASGI) Server for FlexiUI
+
+Serves /api/chat and /api/generate-ui natively on asyncio, so a pending
+Groq call costs a coroutine instead of a whole worker thread. Concurrent
+upstream calls are bounded by FLEXIUI_MAX_UPSTREAM_CONCURRENCY. Every other
+route is handed to the regular Flask app.
+Native answers are compressed the same way as the Flask ones (see
+compression.py).
+
+The app warms up (database, upstream clients, see app.warm_up) during
+the ASGI lifespan startup, before the first request is accepted.
+
+Run with:
+    uvicorn asgi_app:application --host 0.0.0.0 --port 5000
+or with several workers, see gunicorn.conf.py.
+"""
+
+import json
+import time
+import asyncio
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app, generation_payload, open_chat, close_chat, overloaded_payload, \
+    warm_up, is_warm, CORS_EXPOSE_HEADERS
+from ai_service import chat_with_bot_async, generate_ui_component_async
+from admission import AdmissionRejected, admission_scope
+from compression import response_compressor
+from cache import CACHE_MODES, CACHE_USE
+from sessions import get_session
+import metrics
+
+# Everything that isn't served natively goes through Flask
+wsgi_fallback = WsgiToAsgi(flask_app)
+
+JSON_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", ", ".join(CORS_EXPOSE_HEADERS).encode()),
+]
+
+# ============================================
+# HELPERS
+# ============================================
+
+async def read_json(receive):
+    """
+    Read the whole request body and decode it as JSON
+
+    Returns:
+        dict: Parsed body, or None if it isn't valid JSON
+    """
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return None
+
+
+async def send_json(send, payload, status=200, headers=(), scope=None):
+    """
+    Send a JSON response (headers: extra (name, value) byte pairs)
+
+    With the request's scope, a 200 body is compressed as its
+    Accept-Encoding allows (see compression.py).
+    """
+    body = json.dumps(payload).encode("utf-8")
+    if scope is not None and status == 200:
+        body, encoding = response_compressor.encode(body, request_header(scope, b"accept-encoding"))
+        headers = list(headers) + encoding_headers(encoding)
+    await send_body(send, body, status, headers)
+
+
+async def send_generation(send, scope, payload):
+    """Send a /api/generate-ui payload (see ResponseCompressor.encode_generation)"""
+    body, encoding = response_compressor.encode_generation(
+        payload, request_header(scope, b"accept-encoding")
+    )
+    await send_body(send, body, 200, encoding_headers(encoding))
+
+
+async def send_body(send, body, status, headers):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": JSON_HEADERS + list(headers) + [(b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def encoding_headers(encoding):
+    return [(name.lower().encode(), value.encode()) for name, value in response_compressor.headers(encoding)]
+
+
+async def send_overloaded(send, error):
+    """429/503 answer with Retry-After for a shed request (see admission.py)"""
+    await send_json(send, overloaded_payload(error), error.status,
+                    [(b"retry-after", error.retry_after_header().encode())])
+
+
+def request_header(scope, name):
+    """First value of a request header (name: lower-case bytes), or None"""
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_id(scope):
+    """Admission client of a request: X-Client-Id header, else the remote address"""
+    return request_header(scope, b"x-client-id") or (scope.get("client") or ("",))[0]
+
+
+def run_in_app_context(func, *args):
+    """Call a Flask/DB helper inside an app context (from a worker thread)"""
+    with flask_app.app_context():
+        return func(*args)
+
+# ============================================
+# ROUTE: Chat
+# ============================================
+
+def open_chat_by_id(data):
+    """open_chat(), returning the session id (ORM objects stay in their app context)"""
+    opened = open_chat(data)
+    if opened is None:
+        return None
+    session, history, session_state = opened
+    return (session.id if session is not None else None), history, session_state
+
+
+def close_chat_by_id(session_id, session_state, user_message, bot_response, payload):
+    """close_chat() for a session id from open_chat_by_id()"""
+    session = get_session(session_id) if session_id is not None else None
+    return close_chat(session, session_state, user_message, bot_response, payload)
+
+
+async def chat(scope, receive, send):
+    """Async version of POST /api/chat"""
+    try:
+        data = await read_json(receive)
+
+        if not isinstance(data, dict) or "message" not in data:
+            await send_json(send, {"error": "Please provide a message"}, 400)
+            return
+
+        # Session reads and writes are blocking DB calls
+        loop = asyncio.get_running_loop()
+        opened = await loop.run_in_executor(None, run_in_app_context, open_chat_by_id, data)
+        if opened is None:
+            await send_json(send, {"error": "Unknown or expired session"}, 404)
+            return
+        session_id, conversation_history, session_state = opened
+
+        history_metrics = {}
+        bot_response = await chat_with_bot_async(
+            data["message"], conversation_history, history_metrics, session_state
+        )
+        routing = history_metrics.pop("routing", None)
+
+        payload = await loop.run_in_executor(
+            None, run_in_app_context, close_chat_by_id, session_id, session_state,
+            data["message"], bot_response, {
+                "success": True,
+                "response": bot_response,
+                "timestamp": time.time(),
+                "history": history_metrics,
+                "routing": routing
+            }
+        )
+        await send_json(send, payload, scope=scope)
+
+    except AdmissionRejected as e:
+        await send_overloaded(send, e)
+    except Exception as e:
+        await send_json(send, {"success": False, "error": str(e)}, 500)
+
+# ============================================
+# ROUTE: Generate UI
+# ============================================
+
+async def generate_ui(scope, receive, send):
+    """Async version of POST /api/generate-ui"""
+    try:
+        data = await read_json(receive)
+
+        if not isinstance(data, dict) or "prompt" not in data:
+            await send_json(send, {"error": "Please provide a prompt"}, 400)
+            return
+
+        prompt = data["prompt"]
+        component_type = data.get("component_type", "general")
+        cache_mode = data.get("cache", CACHE_USE)
+
+        if cache_mode not in CACHE_MODES:
+            await send_json(send, {
+                "error": f"Invalid cache mode. Use one of: {', '.join(CACHE_MODES)}"
+            }, 400)
+            return
+
+        generation_metrics = {}
+        generated_code = await generate_ui_component_async(
+            prompt, component_type, cache_mode, generation_metrics
+        )
+
+        # Saving the project is a blocking DB write
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(
+            None, run_in_app_context, generation_payload, prompt, component_type, generated_code,
+            generation_metrics.get("routing"), generation_metrics.get("fresh", False)
+        )
+        await send_generation(send, scope, payload)
+
+    except AdmissionRejected as e:
+        await send_overloaded(send, e)
+    except Exception as e:
+        await send_json(send, {"success": False, "error": str(e)}, 500)
+
+
+async def run_with_metrics(handler, scope, receive, send):
+    """Run a native route with the same request metrics the Flask hooks record"""
+    status = [500]
+
+    async def send_and_note_status(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+        await send(message)
+
+    started = time.perf_counter()
+    token = metrics.enter_request(scope["path"])
+    try:
+        await handler(scope, receive, send_and_note_status)
+    finally:
+        metrics.observe_request(scope["path"], "POST", status[0], time.perf_counter() - started)
+        metrics.exit_request(token)
+
+
+NATIVE_ROUTES = {
+    "/api/chat": chat,
+    "/api/generate-ui": generate_ui,
+}
+
+# ============================================
+# ASGI ENTRY POINT
+# ============================================
+
+async def application(scope, receive, send):
+    """ASGI application"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, warm_up, flask_app)
+                except Exception as e:
+                    # Tells the server not to start serving with a half-built app
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    handler = NATIVE_ROUTES.get(scope.get("path"))
+    if scope["type"] == "http" and scope["method"] == "POST" and handler is not None:
+        # Servers without lifespan support: warm up on the first request
+        if not is_warm(flask_app):
+            await asyncio.get_running_loop().run_in_executor(None, warm_up, flask_app)
+        with admission_scope(client=client_id(scope)):
+            if not metrics.ENABLED:
+                await handler(scope, receive, send)
+                return
+            await run_with_metrics(handler, scope, receive, send)
+        return
+
+    await wsgi_fallback(scope, receive, send)
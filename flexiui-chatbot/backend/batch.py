@@ -0,0 +1,115 @@
+"""
+Batch UI Generation for FlexiUI
+
+Fans a list of {prompt, component_type} items out to generate_ui_component
+on a bounded thread pool, so a whole page kit takes about as long as its
+slowest component instead of the sum of all of them.
+
+Items queue for upstream quota in the "batch" priority class (behind chat
+and single generations, see admission.py); an item that is shed gets an
+error and "retry_after" instead of code.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ai_service import generate_ui_component
+from admission import AdmissionRejected, admission_scope, current_client
+from cache import CACHE_USE
+from metrics import label_scope, record_stage
+from prompts import resolve_component_type
+
+# Worker threads shared by all batch requests
+BATCH_WORKERS = int(os.getenv("FLEXIUI_BATCH_WORKERS", 8))
+
+# Largest batch accepted in one request
+MAX_BATCH_ITEMS = int(os.getenv("FLEXIUI_MAX_BATCH_ITEMS", 20))
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+# ============================================
+# VALIDATION
+# ============================================
+
+def validate_items(items):
+    """
+    Check a batch request's items
+
+    Args:
+        items: Value of the "items" field
+
+    Returns:
+        str: Error message, or None if the batch is valid
+    """
+    if not isinstance(items, list) or not items:
+        return "Please provide a non-empty list of items"
+    if len(items) > MAX_BATCH_ITEMS:
+        return f"A batch can contain at most {MAX_BATCH_ITEMS} items"
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("prompt"):
+            return f"Item {index} needs a prompt"
+    return None
+
+# ============================================
+# RUNNING A BATCH
+# ============================================
+
+def _generate_item(index, item, cache_mode, submitted, client):
+    """Generate one item and time it"""
+    prompt = item["prompt"]
+    component_type = item.get("component_type", "general")
+
+    start = time.perf_counter()
+    generation_metrics = {}
+    retry_after = None
+    try:
+        # Worker threads don't inherit the request's labels (the model label
+        # is set by generate_ui_component once the request is routed) or
+        # its admission client
+        with label_scope(route="/api/generate-ui/batch",
+                         component_type=resolve_component_type(component_type)), \
+                admission_scope(client=client, priority="batch"):
+            record_stage("queue", start - submitted)
+            code = generate_ui_component(prompt, component_type, cache_mode, generation_metrics)
+        error = code.get("error")
+    except AdmissionRejected as e:
+        code, error, retry_after = None, str(e), int(e.retry_after_header())
+    except Exception as e:
+        code, error = None, str(e)
+
+    result = {
+        "index": index,
+        "prompt": prompt,
+        "component_type": component_type,
+        "success": error is None,
+        "code": code,
+        "error": error,
+        "routing": generation_metrics.get("routing"),
+        "fresh": generation_metrics.get("fresh", False),
+        "time": round(time.perf_counter() - start, 3)
+    }
+    if retry_after is not None:
+        result["retry_after"] = retry_after
+    return result
+
+
+def iter_batch(items, cache_mode=CACHE_USE):
+    """
+    Generate every item in parallel
+
+    Args:
+        items (list): [{"prompt": ..., "component_type": ...}, ...]
+        cache_mode (str): Cache mode applied to every item
+
+    Yields:
+        dict: One result per item, in completion order
+    """
+    submitted = time.perf_counter()
+    client = current_client()
+    futures = [
+        _executor.submit(_generate_item, index, item, cache_mode, submitted, client)
+        for index, item in enumerate(items)
+    ]
+    for future in as_completed(futures):
+        yield future.result()
@@ -0,0 +1,174 @@
+"""
+Benchmark: admission control under a burst against a rate-limited upstream
+
+Starts the fake Groq upstream (fake_groq.py) with a requests/tokens per
+minute quota, and two app processes sharing one working directory (so they
+share the admission database, like workers on one host). Then, for a fixed
+time, drives both processes at once with:
+
+- bulk: closed-loop /api/generate-ui/batch requests from one client
+- chat: interactive /api/chat users (one request, then a short pause)
+
+twice:
+
+- off: no admission control (the old behaviour: every worker calls the
+       upstream and 429s come back after the upstream client's retries)
+- on:  FLEXIUI_UPSTREAM_RPM/TPM set just under the upstream's quota
+       (see admission.py)
+
+Reported per run and kind: requests, answered, shed with 429/503 (with
+Retry-After), other failures ("Error: ..." chat replies, failed batch
+items), p50/p95 latency of the answered ones, and the 429s the upstream
+itself sent.
+
+Usage:
+    python bench_admission.py [seconds] [bulk_clients] [chat_users]
+"""
+
+import os
+import sys
+import json
+import asyncio
+
+import httpx
+
+from bench_load import start, stop, percentile, UPSTREAM_DEFAULTS
+
+QUOTA = {"rpm": "120", "tpm": "150000"}
+
+UPSTREAM = dict(UPSTREAM_DEFAULTS, **{
+    "FLEXIUI_FAKE_LATENCY": "lognormal:0.3:0.3",
+    "FLEXIUI_FAKE_RPM": QUOTA["rpm"],
+    "FLEXIUI_FAKE_TPM": QUOTA["tpm"],
+})
+
+# The app's buckets and the upstream's can't tick in lockstep (requests
+# reach the upstream a little after they are admitted), so the app is
+# configured slightly under the real quota
+QUOTA_SHARE = 0.95
+
+RUNS = {
+    "off": {},
+    "on": {"FLEXIUI_UPSTREAM_RPM": str(float(QUOTA["rpm"]) * QUOTA_SHARE),
+           "FLEXIUI_UPSTREAM_TPM": str(float(QUOTA["tpm"]) * QUOTA_SHARE)},
+}
+
+APP_PROCESSES = 2
+BATCH_ITEMS = 4
+CHAT_PAUSE = 0.5
+
+
+def new_result():
+    return {"requests": 0, "answered": 0, "shed_429": 0, "shed_503": 0, "failed": 0, "latencies": []}
+
+
+async def bulk_client(http, urls, result, stop_at, offset):
+    """Closed loop of batch requests (one client id for all of them)"""
+    loop = asyncio.get_running_loop()
+    i = 0
+    while loop.time() < stop_at:
+        body = {"items": [{"prompt": f"A pricing card #{offset}-{i}-{n}", "component_type": "card"}
+                          for n in range(BATCH_ITEMS)], "cache": "bypass"}
+        started = loop.time()
+        response = await http.post(f"{urls[i % len(urls)]}/api/generate-ui/batch", json=body,
+                                   headers={"X-Client-Id": "bulk"})
+        i += 1
+        for item in response.json().get("results") or []:
+            result["requests"] += 1
+            if item["success"]:
+                result["answered"] += 1
+                result["latencies"].append(loop.time() - started)
+            elif "retry_after" in item:
+                result["shed_429"] += 1
+            else:
+                result["failed"] += 1
+
+
+async def chat_user(http, urls, result, stop_at, user):
+    """One interactive user: a message, a short pause, the next message"""
+    loop = asyncio.get_running_loop()
+    i = 0
+    while loop.time() < stop_at:
+        started = loop.time()
+        response = await http.post(f"{urls[i % len(urls)]}/api/chat",
+                                   json={"message": f"How do I center a div? ({user}-{i})",
+                                         "conversation_history": []},
+                                   headers={"X-Client-Id": f"user-{user}"})
+        i += 1
+        result["requests"] += 1
+        body = response.json()
+        if response.status_code == 200 and not body["response"].startswith("Error:"):
+            result["answered"] += 1
+            result["latencies"].append(loop.time() - started)
+        elif response.status_code in (429, 503):
+            result[f"shed_{response.status_code}"] += 1
+        else:
+            result["failed"] += 1
+        await asyncio.sleep(CHAT_PAUSE)
+
+
+async def run_load(urls, seconds, bulk_clients, chat_users):
+    results = {"bulk": new_result(), "chat": new_result()}
+    stop_at = asyncio.get_running_loop().time() + seconds
+    async with httpx.AsyncClient(timeout=300) as http:
+        await asyncio.gather(
+            *(bulk_client(http, urls, results["bulk"], stop_at, n) for n in range(bulk_clients)),
+            *(chat_user(http, urls, results["chat"], stop_at, n) for n in range(chat_users))
+        )
+        admission = (await http.get(f"{urls[0]}/api/health")).json().get("admission")
+    return results, admission
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    bulk_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    chat_users = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    runs = {}
+    for run, overrides in RUNS.items():
+        # A fresh upstream per run, so each starts with a full quota
+        env = dict(UPSTREAM, **os.environ)
+        upstream_port, upstream = start(["fake_groq.py"], env)
+        workdir = os.path.join("/tmp", f"flexiui-admission-{os.getpid()}-{run}")
+        os.makedirs(workdir, exist_ok=True)
+        app_env = dict(env, **overrides, **{
+            "GROQ_API_KEY": "benchmark",
+            "GROQ_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+            "FLEXIUI_CACHE_DB": os.path.join(workdir, "cache.db"),
+            "FLEXIUI_ADMISSION_DB": os.path.join(workdir, "admission.db"),
+        })
+        apps = []
+        try:
+            for _ in range(APP_PROCESSES):
+                apps.append(start(["bench_async.py", "--flask", "32"], app_env))
+            urls = [f"http://127.0.0.1:{port}" for port, _ in apps]
+            results, admission = asyncio.run(run_load(urls, seconds, bulk_clients, chat_users))
+            upstream_stats = httpx.get(f"http://127.0.0.1:{upstream_port}/stats").json()
+            runs[run] = results, admission, upstream_stats
+        finally:
+            for _, app in apps:
+                stop(app)
+            stop(upstream)
+
+    print(f"{seconds:.0f}s, {APP_PROCESSES} app processes, {bulk_clients} bulk clients "
+          f"({BATCH_ITEMS} items per batch), {chat_users} chat users, upstream quota {json.dumps(QUOTA)}\n")
+    print(f"{'run':<5}{'kind':<6}{'requests':>9}{'answered':>10}{'429':>6}{'503':>6}{'failed':>8}"
+          f"{'p50':>9}{'p95':>9}")
+    for run, (results, _, _) in runs.items():
+        for kind, result in results.items():
+            latencies = sorted(result["latencies"])
+            p50 = f"{percentile(latencies, 50) * 1000:.0f}ms" if latencies else "-"
+            p95 = f"{percentile(latencies, 95) * 1000:.0f}ms" if latencies else "-"
+            print(f"{run:<5}{kind:<6}{result['requests']:>9}{result['answered']:>10}{result['shed_429']:>6}"
+                  f"{result['shed_503']:>6}{result['failed']:>8}{p50:>9}{p95:>9}")
+
+    for run, (_, admission, upstream_stats) in runs.items():
+        print(f"\n{run}: upstream requests {upstream_stats.get('requests', 0)}, "
+              f"upstream 429s {upstream_stats.get('quota_429', 0)}")
+        if admission.get("enabled"):
+            print(f"    admission (shared, first process' counters): {json.dumps(admission)}")
+
+
+if __name__ == "__main__":
+    main()
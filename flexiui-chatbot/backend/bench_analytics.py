@@ -0,0 +1,148 @@
+"""
+Benchmark: analytics queries on the raw log vs the rollup tables
+
+Grows a GenerationLog table (30 days of timestamps, 8 component types,
+rollups maintained as in the app) and, at each size, times:
+
+- raw 24h:      p50/p95/p99 per hour over the last 24h from generation_logs
+                (composite index range scan + sort in Python)
+- raw 30d:      count/errors/mean per component type over 30 days (full scan)
+- rollup 24h:   latency_series(hour, last 24h)
+- rollup 30d:   latency_summary(hour, last 30 days, with percentiles)
+
+The raw queries grow with the log; the rollup queries read the same
+~24 / ~5760 rollup rows at every size.
+
+Usage:
+    python bench_analytics.py [sizes]      e.g. 10000,100000,1000000,10000000
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, func, case
+
+from models import enable_sqlite_wal
+from analytics import (
+    LOG_TABLE, RESOLUTIONS, aggregate, write_rollups, window,
+    latency_series, latency_summary
+)
+
+TYPES = ["button", "card", "form", "navbar", "modal", "table", "hero", "general"]
+DAYS = 30
+CHUNK = 50000
+
+
+def fill(engine, count, now, rng):
+    """
+    Append `count` random logs (and their rollups) in chunks
+
+    Each call walks through the 30 days in time order, chunk by chunk, like
+    the log writer does in production (rollup updates stay local).
+    """
+    span = DAYS * 86400
+    chunks = max(1, -(-count // CHUNK))
+    for chunk in range(chunks):
+        size = min(CHUNK, count - chunk * CHUNK)
+        slice_start = span * chunk / chunks
+        offsets = sorted(slice_start + rng.random() * span / chunks for _ in range(size))
+        records = [
+            {
+                "prompt": "p",
+                "component_type": rng.choice(TYPES),
+                "success": rng.random() > 0.05,
+                "created_at": now - timedelta(seconds=span - offset),
+                "generation_time": rng.lognormvariate(0.3, 0.5)
+            }
+            for offset in offsets
+        ]
+        with engine.begin() as conn:
+            conn.execute(LOG_TABLE.insert(), records)
+            write_rollups(conn, aggregate(records))
+
+
+def raw_hourly_percentiles(conn, since):
+    """Per-hour p50/p95/p99 straight from generation_logs"""
+    hours = {}
+    rows = conn.execute(
+        select(LOG_TABLE.c.created_at, LOG_TABLE.c.generation_time)
+        .where(LOG_TABLE.c.created_at >= since)
+    )
+    for created_at, seconds in rows:
+        hours.setdefault(created_at.replace(minute=0, second=0, microsecond=0), []).append(seconds)
+    result = {}
+    for hour, values in hours.items():
+        values.sort()
+        result[hour] = [values[min(len(values) - 1, int(len(values) * p))] for p in (0.5, 0.95, 0.99)]
+    return result
+
+
+def raw_type_summary(conn, since):
+    """Per-type count/errors/mean straight from generation_logs"""
+    return conn.execute(
+        select(
+            LOG_TABLE.c.component_type, func.count(),
+            func.sum(case((LOG_TABLE.c.success, 0), else_=1)),
+            func.avg(LOG_TABLE.c.generation_time)
+        ).where(LOG_TABLE.c.created_at >= since).group_by(LOG_TABLE.c.component_type)
+    ).all()
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(",")]
+
+    path = os.path.join(tempfile.mkdtemp(prefix="flexiui-analytics-"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    enable_sqlite_wal(engine)
+    for table in (LOG_TABLE, RESOLUTIONS["minute"][0], RESOLUTIONS["hour"][0]):
+        table.create(engine)
+
+    now = datetime.utcnow()
+    day = window(24, "hour", now)
+    month = window(DAYS * 24, "hour", now)
+    rng = random.Random(42)
+
+    print(f"Logs spread over {DAYS} days, {len(TYPES)} component types\n")
+    print(f"{'rows':>10}{'fill s':>8}{'raw 24h':>11}{'raw 30d':>11}{'rollup 24h':>12}{'rollup 30d':>12}")
+
+    rows = 0
+    for size in sizes:
+        start = time.perf_counter()
+        fill(engine, size - rows, now, rng)
+        fill_s = time.perf_counter() - start
+        rows = size
+
+        with engine.connect() as conn:
+            raw_day = timed(lambda: raw_hourly_percentiles(conn, day[0]), repeat=1 if size > 10 ** 6 else 3)
+            raw_month = timed(lambda: raw_type_summary(conn, month[0]), repeat=1 if size > 10 ** 6 else 3)
+            rollup_day = timed(lambda: latency_series(conn, "hour", *day))
+            rollup_month = timed(lambda: latency_summary(conn, "hour", *month))
+
+            # Sanity check: the rollup p95 tracks the exact one
+            exact = raw_hourly_percentiles(conn, day[0])
+            series = {b["bucket"]: b for b in latency_series(conn, "hour", *day)}
+            worst = max(
+                abs(series[hour.isoformat()]["p95"] - values[1]) / values[1]
+                for hour, values in exact.items()
+            )
+
+        print(f"{size:>10}{fill_s:>8.1f}{raw_day:>9.1f}ms{raw_month:>9.1f}ms"
+              f"{rollup_day:>10.2f}ms{rollup_month:>10.2f}ms   (worst hourly p95 error {worst:.1%})")
+
+
+if __name__ == "__main__":
+    main()
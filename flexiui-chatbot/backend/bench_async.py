@@ -0,0 +1,222 @@
+"""
+Benchmark: threaded Flask server vs async (ASGI) server
+
+Both servers talk to a local fake Groq upstream that answers every chat
+completion after a fixed delay, so the numbers show how many pending
+generations each server can hold rather than how fast Groq is.
+
+Usage:
+    python bench_async.py [concurrency] [requests] [upstream_latency_s] [flask_threads]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import subprocess
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ============================================
+# FAKE UPSTREAM
+# ============================================
+
+async def serve_fake_upstream(port, latency):
+    """Minimal keep-alive HTTP server answering /openai/v1/chat/completions"""
+    content = json.dumps({"html": "<p>ok</p>", "css": "p { color: red; }", "js": ""})
+    body = json.dumps({
+        "id": "bench", "object": "chat.completion", "created": 0, "model": "bench",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+    }).encode()
+    head = (
+        b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+        b"content-length: " + str(len(body)).encode() + b"\r\n\r\n"
+    )
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in request_head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+                await asyncio.sleep(latency)
+                writer.write(head + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=2048)
+    async with server:
+        await server.serve_forever()
+
+# ============================================
+# SERVERS UNDER TEST
+# ============================================
+
+def serve_flask(port, threads):
+    """Flask app on a fixed-size thread pool (like gunicorn --threads)"""
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 2048
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, app, handler=QuietHandler).serve_forever()
+
+
+def serve_asgi(port):
+    import uvicorn
+    uvicorn.run("asgi_app:application", host="127.0.0.1", port=port,
+                log_level="warning", backlog=2048)
+
+# ============================================
+# LOAD GENERATOR
+# ============================================
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30, poll=0.1):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(poll)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def drive(port, concurrency, total):
+    """Send `total` chat requests with `concurrency` in flight"""
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    # Small pools: httpcore's pool bookkeeping is quadratic in its size
+    clients = [
+        httpx.AsyncClient(limits=httpx.Limits(max_connections=16), timeout=300)
+        for _ in range(-(-concurrency // 16))
+    ]
+
+    async def worker(http):
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await http.post(
+                    f"http://127.0.0.1:{port}/api/chat",
+                    json={"message": f"question {i}"}
+                )
+                if response.status_code != 200 or response.json()["response"].startswith("Error"):
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(clients[i // 16]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for http in clients:
+        await http.aclose()
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000),
+    }
+
+
+def run_case(name, args, env, concurrency, total):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, __file__, *args, str(port)], cwd=HERE, env=env
+    )
+    try:
+        wait_for_port(port)
+        result = asyncio.run(drive(port, concurrency, total))
+    finally:
+        process.terminate()
+        process.wait()
+    print(f"{name:<22}{json.dumps(result)}")
+    return result
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 800
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+
+    upstream_port = free_port()
+    upstream = subprocess.Popen(
+        [sys.executable, __file__, "--upstream", str(latency), str(upstream_port)], cwd=HERE
+    )
+    wait_for_port(upstream_port)
+
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+        "FLEXIUI_CACHE_DISK": "0",
+        "DATABASE_URL": "sqlite://",
+        "FLEXIUI_MAX_UPSTREAM_CONCURRENCY": str(max(concurrency, 1)),
+    })
+
+    print(f"concurrency={concurrency} requests={total} upstream latency={latency}s "
+          f"flask threads={threads}\n")
+    try:
+        run_case(f"flask ({threads} threads)", ["--flask", str(threads)], env, concurrency, total)
+        run_case("asgi (asyncio)", ["--asgi"], env, concurrency, total)
+    finally:
+        upstream.terminate()
+        upstream.wait()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--upstream"]:
+        asyncio.run(serve_fake_upstream(int(sys.argv[3]), float(sys.argv[2])))
+    elif sys.argv[1:2] == ["--flask"]:
+        serve_flask(int(sys.argv[3]), int(sys.argv[2]))
+    elif sys.argv[1:2] == ["--asgi"]:
+        serve_asgi(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: inline code columns vs the content-addressed blob store
+
+Builds a database in the old layout (html/css/js inline in projects) with
+generated components that repeat the way real ones do: every component
+ships the same CSS reset, many share the same button/card styles, and a
+share of projects are cached results saved again verbatim. Then migrates
+a copy with migrate_inline_code + VACUUM and compares:
+
+- file size (and the blob_report of the migrated copy)
+- time to read one project's code: inline SELECT vs read_code through the
+  blob store, with a cold and a warm LRU
+
+Usage:
+    python bench_blobs.py [projects] [duplicate_share]     e.g. 20000 0.3
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine, text
+
+from blobs import BlobStore, migrate_inline_code
+from models import Project
+
+RESET = (
+    "*, *::before, *::after { box-sizing: border-box; margin: 0; padding: 0; }\n"
+    "body { font-family: system-ui, -apple-system, sans-serif; line-height: 1.5; }\n"
+    "img { max-width: 100%; display: block; }\n"
+    "button { font: inherit; cursor: pointer; border: none; }\n"
+)
+STYLES = [
+    f".btn-{name} {{ background: {color}; color: #fff; padding: 0.75rem 1.5rem; "
+    f"border-radius: 8px; transition: transform 0.2s ease; }}\n"
+    f".btn-{name}:hover {{ transform: translateY(-2px); box-shadow: 0 4px 12px rgba(0,0,0,0.2); }}\n"
+    for name, color in (("primary", "#667eea"), ("danger", "#e53935"), ("success", "#43a047"),
+                        ("dark", "#1a1a2e"), ("accent", "#ff6b6b"))
+]
+LEGACY_SCHEMA = """
+CREATE TABLE projects (
+    id INTEGER NOT NULL, name VARCHAR(200) NOT NULL, prompt TEXT NOT NULL,
+    html_code TEXT, css_code TEXT, js_code TEXT, component_type VARCHAR(50),
+    created_at DATETIME, updated_at DATETIME, views INTEGER, PRIMARY KEY (id)
+)
+"""
+
+
+def make_component(rng, i):
+    cards = "\n".join(
+        f'  <div class="card">\n    <h3 class="card__title">Item {i}-{n}</h3>\n'
+        f'    <p class="card__text">Generated description for item {n} of component {i}.</p>\n'
+        f'    <button class="btn-primary">Open</button>\n  </div>'
+        for n in range(rng.randint(2, 6))
+    )
+    return {
+        "html": f'<section class="grid grid--{i}">\n{cards}\n</section>',
+        "css": RESET + rng.choice(STYLES) + f".grid--{i} {{ display: grid; gap: {rng.randint(8, 32)}px; }}\n",
+        "js": "" if rng.random() < 0.6 else (
+            "document.querySelectorAll('.btn-primary').forEach(b => "
+            "b.addEventListener('click', () => b.classList.toggle('active')));"
+        ),
+    }
+
+
+def build_legacy(path, count, duplicate_share, rng):
+    engine = create_engine(f"sqlite:///{path}")
+    made = []
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_SCHEMA))
+        rows = []
+        for i in range(count):
+            if made and rng.random() < duplicate_share:
+                code = rng.choice(made)  # cached result saved again
+            else:
+                code = make_component(rng, i)
+                made.append(code)
+            rows.append({
+                "id": i + 1, "name": f"Component {i}", "prompt": f"Generate component {i}",
+                "html": code["html"], "css": code["css"], "js": code["js"]
+            })
+        conn.execute(text(
+            "INSERT INTO projects (id, name, prompt, html_code, css_code, js_code, component_type, views) "
+            "VALUES (:id, :name, :prompt, :html, :css, :js, 'card', 0)"
+        ), rows)
+    engine.dispose()
+
+
+def time_reads(fn, ids):
+    start = time.perf_counter()
+    for project_id in ids:
+        fn(project_id)
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    duplicate_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    rng = random.Random(3)
+
+    workdir = tempfile.mkdtemp(prefix="flexiui-blobbench-")
+    legacy = os.path.join(workdir, "legacy.db")
+    migrated = os.path.join(workdir, "migrated.db")
+    build_legacy(legacy, count, duplicate_share, rng)
+    shutil.copy(legacy, migrated)
+
+    store = BlobStore()
+    engine = create_engine(f"sqlite:///{migrated}")
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        report = migrate_inline_code(conn, store)
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    migrate_s = time.perf_counter() - start
+
+    legacy_size, migrated_size = os.path.getsize(legacy), os.path.getsize(migrated)
+    print(f"{count} projects, {duplicate_share:.0%} saved again from cache\n")
+    print(f"Migration: {migrate_s:.1f}s, {report}")
+    print(f"File size: {legacy_size / 1024 / 1024:.1f} MB inline -> "
+          f"{migrated_size / 1024 / 1024:.1f} MB with blobs "
+          f"({1 - migrated_size / legacy_size:.0%} smaller)\n")
+
+    ids = [rng.randint(1, count) for _ in range(2000)]
+    hash_columns = ", ".join(hash_column for _, hash_column in Project.CODE_FIELDS.values())
+
+    legacy_engine = create_engine(f"sqlite:///{legacy}")
+    with legacy_engine.connect() as conn:
+        inline_us = time_reads(lambda project_id: conn.execute(
+            text("SELECT html_code, css_code, js_code FROM projects WHERE id = :id"), {"id": project_id}
+        ).one(), ids)
+
+    with engine.connect() as conn:
+        def read_blobs(project_id):
+            hashes = conn.execute(
+                text(f"SELECT {hash_columns} FROM projects WHERE id = :id"), {"id": project_id}
+            ).one()
+            return store.get_many(conn, hashes)
+
+        store._cache.clear()
+        cold_us = time_reads(read_blobs, ids)
+        warm_us = time_reads(read_blobs, ids)
+
+    print(f"{'read one project':<28}{'µs':>8}")
+    print(f"{'inline columns':<28}{inline_us:>8.0f}")
+    print(f"{'blob store, cold LRU':<28}{cold_us:>8.0f}")
+    print(f"{'blob store, warm LRU':<28}{warm_us:>8.0f}")
+    print(f"\nLRU: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: fixed max_tokens vs adaptive output budgets
+
+Starts the fake Groq upstream (fake_groq.py) with answer sizes that differ
+per component type (small buttons, large footers and forms, with some
+spread), then sends the same /api/generate-ui requests (cache bypassed)
+to the app twice:
+
+- fixed:    max_tokens=2000 for everything, no continuation (the old behaviour)
+- adaptive: budgets learned per type/theme, cut-off answers continued
+            (see budget.py)
+
+Each run has a warm-up phase (so the adaptive run has sizes to learn
+from) and a measured phase. Per type, for the measured phase: answers
+delivered incomplete (partial/missing sections), the max_tokens budget
+the app ended up with, and p50 latency; then the app's budget stats
+(truncations, continuations, tokens reserved vs the fixed budget).
+
+Usage:
+    python bench_budget.py [warmup_per_type] [measured_per_type]
+"""
+
+import os
+import sys
+import json
+import asyncio
+
+import httpx
+
+from bench_load import start, stop, percentile, UPSTREAM_DEFAULTS
+
+UPSTREAM = dict(UPSTREAM_DEFAULTS, **{
+    "FLEXIUI_FAKE_LATENCY": "fixed:0.05",
+    "FLEXIUI_FAKE_TOKENS_PER_S": "5000",
+    "FLEXIUI_FAKE_TYPE_TOKENS": "button=250,card=500,navigation=900,footer=2600,form=2300",
+    "FLEXIUI_FAKE_RESPONSE_SPREAD": "0.2",
+})
+
+PROMPTS = {
+    "button": "A rounded call to action button",
+    "card": "A product card with image, title and price",
+    "navbar": "A dark navbar with logo and links",
+    "footer": "A footer with four link columns and a newsletter signup",
+    "form": "A contact form with name, email and message",
+}
+
+RUNS = {
+    "fixed": {"FLEXIUI_BUDGET_MIN_SAMPLES": str(10 ** 9), "FLEXIUI_MAX_CONTINUATIONS": "0"},
+    "adaptive": {},
+}
+
+
+async def run_type(http, component_type, start_index, count, concurrency=4):
+    """Send `count` generations of one type; returns (latencies, incomplete answers)"""
+    latencies, incomplete = [], 0
+    pending = iter(range(start_index, start_index + count))
+
+    async def worker():
+        nonlocal incomplete
+        for i in pending:
+            body = {"prompt": f"{PROMPTS[component_type]} #{i}", "component_type": component_type,
+                    "cache": "bypass"}
+            started = asyncio.get_running_loop().time()
+            code = (await http.post("/api/generate-ui", json=body)).json()["code"]
+            latencies.append(asyncio.get_running_loop().time() - started)
+            if "partial_sections" in code or "missing_sections" in code or "error" in code:
+                incomplete += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies), incomplete
+
+
+async def run_app(base_url, warmup, count):
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        for component_type in PROMPTS:
+            await run_type(http, component_type, 0, warmup)
+        before = (await http.get("/api/health")).json()["output_budget"]
+        for component_type in PROMPTS:
+            results[component_type] = await run_type(http, component_type, warmup, count)
+        after = (await http.get("/api/health")).json()["output_budget"]
+    # Stats of the measured phase only
+    phase = {name: after[name] - before[name]
+             for name in ("requests", "truncated", "continuations", "still_truncated",
+                          "reserved_tokens", "tokens_saved")}
+    return results, phase, after["budgets"]
+
+
+def main():
+    warmup = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    env = dict(UPSTREAM, **os.environ)
+    upstream_port, upstream = start(["fake_groq.py"], env)
+    runs = {}
+    try:
+        for run, overrides in RUNS.items():
+            workdir = os.path.join("/tmp", f"flexiui-budget-{os.getpid()}-{run}")
+            os.makedirs(workdir, exist_ok=True)
+            app_env = dict(env, **overrides, **{
+                "GROQ_API_KEY": "benchmark",
+                "GROQ_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+                "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+                "FLEXIUI_CACHE_DB": os.path.join(workdir, "cache.db"),
+            })
+            app_port, app = start(["bench_async.py", "--flask", "4"], app_env)
+            try:
+                runs[run] = asyncio.run(run_app(f"http://127.0.0.1:{app_port}", warmup, count))
+            finally:
+                stop(app)
+    finally:
+        stop(upstream)
+
+    print(f"{warmup} warm-up + {count} measured requests per type, upstream "
+          f"{json.dumps({k: v for k, v in UPSTREAM.items() if k.startswith('FLEXIUI_FAKE_TYPE')})}\n")
+    print(f"{'type':<8}{'fixed: incomplete':>19}{'p50':>8}{'adaptive: incomplete':>22}{'p50':>8}{'max_tokens':>12}")
+    for component_type in PROMPTS:
+        fixed = runs["fixed"][0][component_type]
+        adaptive = runs["adaptive"][0][component_type]
+        budget = runs["adaptive"][2].get(f"generate:{component_type}", 2000)
+        print(f"{component_type:<8}{fixed[1]:>15}/{count:<3}{percentile(fixed[0], 50) * 1000:>6.0f}ms"
+              f"{adaptive[1]:>18}/{count:<3}{percentile(adaptive[0], 50) * 1000:>6.0f}ms{budget:>12}")
+
+    for run in RUNS:
+        phase = runs[run][1]
+        print(f"\n{run}: {json.dumps(phase)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: response compression and conditional GETs
+
+Saves projects whose code is a realistic component (the frontend's own
+index.html, style.css and app.js, about 21 KB, made unique per project),
+then drives the app in-process with the Flask test client:
+
+- generate/first:  POST /api/generate-ui, first request for each prompt
+                   (served from the similarity index, no upstream call)
+- generate/hit:    the same prompts again (generation cache hits)
+- project:         GET /api/projects/<id>
+- project/304:     the same with If-None-Match from the first answer
+
+with these Accept-Encoding settings:
+
+- identity:    no Accept-Encoding (what every response used to be)
+- gzip:        "gzip"
+- gzip/nomemo: "gzip" with the encoded body LRU off (FLEXIUI_COMPRESS_MEMO_MB=0),
+               so every response is compressed from scratch
+- br:          "br" (only with the optional brotli package)
+
+Reported per case: body bytes on the wire, process CPU per request (the
+whole request: routing, database, serialization, compression) and the
+part of it spent encoding.
+
+Usage:
+    python bench_compression.py [projects] [rounds]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+
+# app.py reads its configuration at import time
+_workdir = tempfile.mkdtemp(prefix="flexiui-compressionbench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+os.environ["FLEXIUI_CACHE_DB"] = os.path.join(_workdir, "cache.db")
+os.environ["FLEXIUI_SIMILARITY_WARM_LIMIT"] = "0"
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from app import app, prepare_app, save_project
+from compression import response_compressor, ENCODINGS
+from cache import generation_cache
+
+FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+
+MODES = {
+    "identity": None,
+    "gzip": "gzip",
+    "gzip/nomemo": "gzip",
+}
+if "br" in ENCODINGS:
+    MODES["br"] = "br"
+
+
+def component(i):
+    """The frontend's own code as a generated component, unique per project"""
+    code = {}
+    for section, name in (("html", "index.html"), ("css", "style.css"), ("js", "app.js")):
+        with open(os.path.join(FRONTEND, name), encoding="utf-8") as f:
+            code[section] = f"/* component {i} */\n" + f.read().replace("container", f"container-{i}")
+    return code
+
+
+def seed(count):
+    """Save `count` projects; returns (project id, prompt) pairs"""
+    seeded = []
+    with app.app_context():
+        for i in range(count):
+            prompt = f"Chat assistant page with sidebar and composer, variant {i}"
+            seeded.append((save_project(prompt, "general", component(i)).id, prompt))
+    return seeded
+
+
+def timed(send):
+    """(response, CPU seconds, encoding seconds) of one request"""
+    encode_before = response_compressor.encode_seconds
+    cpu = time.process_time()
+    response = send()
+    return response, time.process_time() - cpu, response_compressor.encode_seconds - encode_before
+
+
+def run_mode(client, seeded, rounds, accept, mode):
+    headers = {"Accept-Encoding": accept} if accept else {}
+    response_compressor.clear()
+    response_compressor.memo_bytes = 0 if mode == "gzip/nomemo" else 32 * 1024 * 1024
+    results = {case: [] for case in ("generate/first", "generate/hit", "project", "project/304")}
+
+    # Every mode starts with a cold generation cache, so it sees first requests too
+    generation_cache.clear()
+    for round_number in range(rounds + 1):
+        case = "generate/first" if round_number == 0 else "generate/hit"
+        for _, prompt in seeded:
+            response, cpu, encode = timed(lambda: client.post(
+                "/api/generate-ui", json={"prompt": prompt, "component_type": "general"},
+                headers=headers
+            ))
+            assert response.status_code == 200, response.get_data(as_text=True)
+            results[case].append((len(response.data), cpu, encode))
+
+    for _ in range(rounds):
+        for project_id, _ in seeded:
+            response, cpu, encode = timed(lambda: client.get(f"/api/projects/{project_id}", headers=headers))
+            results["project"].append((len(response.data), cpu, encode))
+            etag = response.headers["ETag"]
+            response, cpu, encode = timed(lambda: client.get(
+                f"/api/projects/{project_id}", headers=dict(headers, **{"If-None-Match": etag})
+            ))
+            assert response.status_code == 304, response.status_code
+            results["project/304"].append((len(response.data), cpu, encode))
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    prepare_app(app)
+    seeded = seed(count)
+    client = app.test_client()
+    # One unmeasured pass, so the first mode doesn't pay for warming up
+    run_mode(client, seeded, 1, None, "warm-up")
+
+    raw = len(json.dumps(component(0)))
+    print(f"{count} projects (~{raw // 1024} KB of code each), {rounds} rounds, "
+          f"encodings available: {', '.join(ENCODINGS)}\n")
+    print(f"{'mode':<13}{'case':<16}{'bytes':>9}{'cpu/req':>11}{'encode/req':>12}")
+    for mode, accept in MODES.items():
+        results = run_mode(client, seeded, rounds, accept, mode)
+        for case, samples in results.items():
+            size = sum(s[0] for s in samples) / len(samples)
+            cpu = sum(s[1] for s in samples) / len(samples)
+            encode = sum(s[2] for s in samples) / len(samples)
+            print(f"{mode:<13}{case:<16}{size:>9.0f}{cpu * 1000:>9.2f}ms{encode * 1000:>10.3f}ms")
+
+    print(f"\ncompression stats: {json.dumps(response_compressor.stats())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: fallback code extraction, old line splitter vs extractor.py
+
+Builds a corpus of real-shaped model answers around generated components
+(about max_tokens=2000 worth of code each), in the shapes that miss the
+JSON fast path:
+
+- prose_json:     "Sure! Here it is:" + ```json fenced object + closing words
+- trailing_comma: JSON object with a trailing comma
+- truncated_json: JSON cut off at max_tokens (mid-html, mid-css or mid-js)
+- fenced:         ```html / ```css / ```javascript blocks with prose between
+- fenced_cut:     the same, cut off inside the last block
+- bare:           markup with inline <style>/<script>, no fences at all
+
+For each shape and extractor: time per response and how much of the
+original code came back (characters of each section recovered verbatim,
+from the start).
+
+Usage:
+    python bench_extractor.py [responses_per_shape]
+"""
+
+import sys
+import json
+import time
+import random
+
+from extractor import extract_code
+
+
+def legacy_extract(text):
+    """The line-based extract_code_manually this replaces"""
+    result = {"html": "", "css": "", "js": ""}
+    current_type = None
+    current_code = []
+    for line in text.split('\n'):
+        if '```html' in line.lower():
+            current_type = 'html'
+            current_code = []
+        elif '```css' in line.lower():
+            current_type = 'css'
+            current_code = []
+        elif '```javascript' in line.lower() or '```js' in line.lower():
+            current_type = 'js'
+            current_code = []
+        elif '```' in line and current_type:
+            result[current_type] = '\n'.join(current_code)
+            current_type = None
+            current_code = []
+        elif current_type:
+            current_code.append(line)
+    return result
+
+# ============================================
+# CORPUS
+# ============================================
+
+def make_component(rng, target_chars=7000):
+    """html/css/js of a card grid, about target_chars long in total"""
+    cards, rules, handlers = [], [], []
+    i = 0
+    while sum(map(len, cards + rules + handlers)) < target_chars:
+        cards.append(
+            f'  <article class="card card--{i}" data-id="{i}">\n'
+            f'    <img src="https://picsum.photos/seed/{i}/400/240" alt="Preview {i}">\n'
+            f'    <h3 class="card__title">Plan "{rng.choice(["Basic", "Pro", "Team"])}" #{i}</h3>\n'
+            f'    <p class="card__text">Everything you need to get started, {rng.randint(1, 99)} seats.</p>\n'
+            f'    <button class="card__cta">Choose</button>\n  </article>'
+        )
+        rules.append(
+            f".card--{i} {{\n  padding: {rng.randint(8, 32)}px;\n  border-radius: 12px;\n"
+            f"  background: linear-gradient(135deg, #{rng.randint(0, 4095):03x}, #{rng.randint(0, 4095):03x});\n}}"
+        )
+        handlers.append(
+            f"document.querySelector('.card--{i} .card__cta').addEventListener('click', () => {{\n"
+            f"  selectPlan({i});\n}});"
+        )
+        i += 1
+    return {
+        "html": '<section class="pricing-grid">\n' + "\n".join(cards) + "\n</section>",
+        "css": ".pricing-grid { display: grid; gap: 24px; }\n" + "\n".join(rules),
+        "js": "\n".join(handlers)
+    }
+
+
+def shape(kind, code, rng):
+    body = json.dumps(code, indent=2)
+    if kind == "prose_json":
+        return f"Sure! Here is your component:\n\n```json\n{body}\n```\n\nLet me know if you want changes."
+    if kind == "trailing_comma":
+        return body[:-1].rstrip() + ",\n}"
+    if kind == "truncated_json":
+        section = rng.choice(["html", "css", "js"])
+        start = body.index(f'"{section}":') + len(section) + 5
+        end = body.index('"', start + 1) if section == "js" else body.index(f'",\n', start)
+        return body[:rng.randint(start + 20, end - 1)]
+    fenced = (f"Here's the markup:\n\n```html\n{code['html']}\n```\n\nAnd the styles:\n\n"
+              f"```css\n{code['css']}\n```\n\nFinally the behaviour:\n\n```javascript\n{code['js']}\n```\n")
+    if kind == "fenced":
+        return fenced
+    if kind == "fenced_cut":
+        return fenced[:rng.randint(fenced.index("```javascript") + 40, len(fenced) - 10)]
+    return (f"{code['html']}\n<style>\n{code['css']}\n</style>\n"
+            f"<script>\n{code['js']}\n</script>")
+
+
+SHAPES = ("prose_json", "trailing_comma", "truncated_json", "fenced", "fenced_cut", "bare")
+
+
+def recovered_chars(result, truth):
+    """Characters of each section recovered verbatim from its start"""
+    total = 0
+    for name in ("html", "css", "js"):
+        got, want = result.get(name, "").strip(), truth[name].strip()
+        n = 0
+        limit = min(len(got), len(want))
+        while n < limit and got[n] == want[n]:
+            n += 1
+        total += n
+    return total
+
+# ============================================
+# RUN
+# ============================================
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(19)
+    corpus = {kind: [] for kind in SHAPES}
+    for kind in SHAPES:
+        for _ in range(count):
+            code = make_component(rng)
+            corpus[kind].append((shape(kind, code, rng), code))
+
+    print(f"{count} responses per shape, ~{sum(len(t) for t, _ in corpus['fenced']) // count} chars each\n")
+    print(f"{'shape':<16}{'extractor':<11}{'µs/resp':>9}{'recovered':>11}{'partial/missing reported':>27}")
+    for kind in SHAPES:
+        truth_chars = sum(sum(len(code[n].strip()) for n in code) for _, code in corpus[kind])
+        for name, fn in (("legacy", legacy_extract), ("extractor", lambda text: extract_code(text)[0])):
+            start = time.perf_counter()
+            results = [fn(text) for text, _ in corpus[kind]]
+            us = (time.perf_counter() - start) / count * 1e6
+            got = sum(recovered_chars(result, code) for result, (_, code) in zip(results, corpus[kind]))
+            reported = "-"
+            if name == "extractor":
+                reports = [extract_code(text)[1] for text, _ in corpus[kind]]
+                reported = f"{sum(bool(r['partial'] or r['missing']) for r in reports)}/{count}"
+            print(f"{kind:<16}{name:<11}{us:>9.0f}{got / truth_chars:>11.1%}{reported:>27}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Benchmark: end-to-end load test of /api/chat and /api/generate-ui
+
+Starts the fake Groq upstream (fake_groq.py) and the app in subprocesses,
+then drives each endpoint at a series of fixed concurrency levels (closed
+loop: every client sends its next request as soon as the last one returns)
+and reports per level:
+
+- throughput (requests/s)
+- p50 / p95 / p99 / max latency
+- error rate (non-200, or an error inside a 200 body)
+
+Generation requests use unique prompts with "cache": "bypass", so every one
+reaches the upstream. The upstream is shaped with the usual FLEXIUI_FAKE_*
+variables (latency distribution, token rate, error and malformed rates);
+the defaults here are a seeded lognormal latency. A table is printed, and
+the full results (config, every level, upstream counters) are written as
+JSON for regression tracking.
+
+Usage:
+    python bench_load.py [concurrency_levels] [requests_per_level] [server] [output.json]
+        e.g. 1,8,32,64 200 flask results.json      (server: flask or asgi)
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import subprocess
+
+import httpx
+
+from bench_async import free_port, wait_for_port
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+UPSTREAM_DEFAULTS = {
+    "FLEXIUI_FAKE_LATENCY": "lognormal:0.3:0.4",
+    "FLEXIUI_FAKE_TOKENS_PER_S": "500",
+    "FLEXIUI_FAKE_SEED": "7",
+}
+
+WARMUP_REQUESTS = 4
+
+# ============================================
+# SCENARIOS
+# ============================================
+
+def chat_request(i):
+    return "/api/chat", {"message": f"Load test question {i}: how do I center a card?"}
+
+
+def chat_failed(response):
+    return response.status_code != 200 or response.json().get("response", "").startswith("Error")
+
+
+def generate_request(i):
+    return "/api/generate-ui", {
+        "prompt": f"Create a pricing card for plan number {i}", "component_type": "card",
+        "cache": "bypass"
+    }
+
+
+def generate_failed(response):
+    return response.status_code != 200 or "error" in response.json().get("code", {})
+
+
+SCENARIOS = {
+    "chat": (chat_request, chat_failed),
+    "generate-ui": (generate_request, generate_failed),
+}
+
+# ============================================
+# LOAD GENERATOR
+# ============================================
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * pct // 100) - 1))]
+
+
+async def drive(base_url, scenario, concurrency, total, offset=0):
+    """
+    Send `total` requests with `concurrency` in flight
+
+    Returns:
+        dict: Latency percentiles (ms), throughput and errors
+    """
+    make_request, failed = SCENARIOS[scenario]
+    latencies = []
+    errors = 0
+    statuses = {}
+    next_index = iter(range(offset, offset + total))
+
+    # Small pools: httpcore's pool bookkeeping is quadratic in its size
+    clients = [
+        httpx.AsyncClient(base_url=base_url, limits=httpx.Limits(max_connections=16), timeout=300)
+        for _ in range(-(-concurrency // 16))
+    ]
+
+    async def worker(http):
+        nonlocal errors
+        for i in next_index:
+            path, body = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await http.post(path, json=body)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if failed(response):
+                    errors += 1
+            except (httpx.HTTPError, ValueError):
+                statuses["exception"] = statuses.get("exception", 0) + 1
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(clients[n // 16]) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for http in clients:
+        await http.aclose()
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 1)
+    return {
+        "endpoint": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]),
+    }
+
+# ============================================
+# PROCESSES
+# ============================================
+
+def start(args, env):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, *args, str(port)], cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL)
+    wait_for_port(port)
+    return port, process
+
+
+def stop(process):
+    process.terminate()
+    process.wait()
+
+
+def main():
+    levels = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,8,32").split(",")]
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    server = sys.argv[3] if len(sys.argv) > 3 else "flask"
+    output = sys.argv[4] if len(sys.argv) > 4 else None
+    if server not in ("flask", "asgi"):
+        sys.exit(f"Unknown server {server!r} (use flask or asgi)")
+
+    env = dict(UPSTREAM_DEFAULTS, **os.environ)
+    upstream_port, upstream = start(["fake_groq.py"], env)
+
+    workdir = os.path.join("/tmp", f"flexiui-load-{os.getpid()}")
+    os.makedirs(workdir, exist_ok=True)
+    env.update({
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        "FLEXIUI_CACHE_DB": os.path.join(workdir, "cache.db"),
+        "FLEXIUI_MAX_UPSTREAM_CONCURRENCY": str(max(levels)),
+    })
+    server_args = ["bench_async.py", "--flask", str(max(levels))] if server == "flask" \
+        else ["bench_async.py", "--asgi"]
+    app_port, app = start(server_args, env)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    results = []
+    print(f"server={server} requests/level={total} upstream="
+          f"{json.dumps({k: v for k, v in env.items() if k.startswith('FLEXIUI_FAKE_')})}\n")
+    print(f"{'endpoint':<13}{'conc':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+    try:
+        offset = 0
+        for scenario in SCENARIOS:
+            asyncio.run(drive(base_url, scenario, 1, WARMUP_REQUESTS, offset=10 ** 9))
+            for concurrency in levels:
+                result = asyncio.run(drive(base_url, scenario, concurrency, total, offset))
+                offset += total
+                results.append(result)
+                print(f"{scenario:<13}{concurrency:>6}{result['throughput_rps']:>9.1f}"
+                      f"{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}{result['p99_ms']:>9.0f}"
+                      f"{result['error_rate']:>9.1%}")
+        upstream_stats = httpx.get(f"http://127.0.0.1:{upstream_port}/stats").json()
+    finally:
+        stop(app)
+        stop(upstream)
+
+    report = {
+        "benchmark": "load",
+        "timestamp": int(time.time()),
+        "server": server,
+        "requests_per_level": total,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "upstream": upstream_stats,
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    else:
+        print("\n" + json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: request logging inline vs write-behind
+
+Worker threads simulate requests (a short sleep standing in for the
+upstream call) and log one GenerationLog record each:
+
+- inline (rollback journal): INSERT + COMMIT per request, SQLite defaults
+- inline (WAL):              INSERT + COMMIT per request, WAL + synchronous=NORMAL
+- write-behind (WAL):        LogWriter.record, batched in the background
+
+Prints request throughput and the time each request spent logging.
+
+Usage:
+    python bench_log_writer.py [threads] [requests_per_thread] [work_ms]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, func, select
+
+from models import GenerationLog, enable_sqlite_wal
+from log_writer import LogWriter
+
+TABLE = GenerationLog.__table__
+
+
+def make_engine(path, wal):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    if wal:
+        enable_sqlite_wal(engine)
+    TABLE.create(engine)
+    return engine
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_case(name, log_one, threads, per_thread, work_s, count_rows, drain=None):
+    """Run the simulated requests and print one result line"""
+    log_times = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        local = []
+        for i in range(per_thread):
+            time.sleep(work_s)  # upstream call
+            start = time.perf_counter()
+            log_one(f"worker {worker_id} prompt {i}")
+            local.append(time.perf_counter() - start)
+        with lock:
+            log_times.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if drain:
+        drain()
+    total = threads * per_thread
+    print(f"{name:<28}{total / elapsed:>10.0f} req/s"
+          f"{percentile(log_times, 0.5) * 1000:>10.3f}ms"
+          f"{percentile(log_times, 0.99) * 1000:>10.3f}ms"
+          f"{count_rows():>10}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    work_s = (float(sys.argv[3]) if len(sys.argv) > 3 else 2) / 1000
+
+    workdir = tempfile.mkdtemp(prefix="flexiui-logbench-")
+    print(f"{threads} threads x {per_thread} requests, {work_s * 1000:.0f}ms simulated work each\n")
+    print(f"{'mode':<28}{'throughput':>14}{'log p50':>12}{'log p99':>10}{'rows':>10}")
+
+    for name, wal in (("inline (rollback journal)", False), ("inline (WAL)", True)):
+        engine = make_engine(os.path.join(workdir, f"{wal}.db"), wal)
+
+        def log_inline(prompt, engine=engine):
+            with engine.begin() as conn:
+                conn.execute(TABLE.insert(), {
+                    "prompt": prompt, "component_type": "card", "success": True,
+                    "generation_time": 0.1
+                })
+
+        run_case(name, log_inline, threads, per_thread, work_s,
+                 lambda engine=engine: _count(engine))
+
+    engine = make_engine(os.path.join(workdir, "writer.db"), True)
+    writer = LogWriter(max_queue=100000)
+
+    def sink(batch):
+        with engine.begin() as conn:
+            conn.execute(TABLE.insert(), batch)
+
+    writer.sink = sink
+    run_case("write-behind (WAL)", lambda prompt: writer.record(prompt, "card", 0.1),
+             threads, per_thread, work_s, lambda: _count(engine), drain=writer.flush)
+    print(f"\nwriter: {writer.stats()}")
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(TABLE)).scalar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: patch-based modification vs full rewrite
+
+Runs a few small edits on a generated component through
+modify_ui_component (patch) and through the full-rewrite path
+(get_modification_prompt). The Groq client is replaced by a stand-in that
+answers what a well-behaved model would answer for each mode and takes
+time-to-first-token + output_tokens / tokens_per_second to do it, so the
+numbers show the effect of output size on latency.
+
+Usage:
+    python bench_modify.py [component_kb] [tokens_per_second] [ttft_s]
+"""
+
+import os
+import sys
+import json
+import time
+import types
+
+# ai_service builds its Groq client at import time
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+import ai_service
+from ai_service import modify_ui_component, _rewrite_upstream, PATCH_SYSTEM_PROMPT
+from bench_stream_parser import make_response
+from history import estimate_tokens
+from patching import apply_patch
+
+# (request, section, find, replace)
+EDITS = [
+    ("Make the first card's text color red", "css",
+     ".card--0 { padding: 0px; color: #000; }", ".card--0 { padding: 0px; color: #e53935; }"),
+    ("Change the title of card 3 to 'Pricing'", "html",
+     'Card "3"</h3>', "Pricing</h3>"),
+    ("Give card 5 more padding", "css",
+     ".card--5 { padding: 5px;", ".card--5 { padding: 24px;"),
+]
+
+# ============================================
+# STAND-IN MODEL
+# ============================================
+
+class ModelStandIn:
+    """Answers patch or rewrite requests for the current edit"""
+
+    def __init__(self, tokens_per_second, ttft):
+        self.tokens_per_second = tokens_per_second
+        self.ttft = ttft
+        self.edit = None
+        self.code = None
+
+    def create(self, messages, **kwargs):
+        section, find, replace = self.edit
+        if messages[0]["content"] == PATCH_SYSTEM_PROMPT:
+            answer = json.dumps({"edits": [{"section": section, "find": find, "replace": replace}]})
+        else:
+            answer = json.dumps(apply_patch(self.code, [
+                {"section": section, "find": find, "replace": replace}
+            ]), indent=2)
+
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        completion_tokens = estimate_tokens(answer)
+        time.sleep(self.ttft + completion_tokens / self.tokens_per_second)
+
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=answer),
+                                           finish_reason="stop")],
+            usage=types.SimpleNamespace(
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+            )
+        )
+
+
+def main():
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    tokens_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else 250
+    ttft = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+
+    code = json.loads(make_response(size_kb)[len("```json\n"):-len("\n```")])
+    model = ModelStandIn(tokens_per_second, ttft)
+    model.code = code
+    ai_service.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=model))
+
+    print(f"Component: {sum(map(len, code.values())) / 1024:.1f} KB, "
+          f"model at {tokens_per_second:.0f} tok/s + {ttft}s to first token\n")
+    print(f"{'edit':<40}{'mode':<9}{'in tok':>8}{'out tok':>9}{'latency':>10}")
+
+    totals = {"patch": [0, 0], "rewrite": [0, 0]}
+    for request, *edit in EDITS:
+        model.edit = edit
+        for mode in ("rewrite", "patch"):
+            metrics = {}
+            start = time.perf_counter()
+            if mode == "patch":
+                result = modify_ui_component(code, request, metrics)
+            else:
+                result = _rewrite_upstream(code, request, metrics, {"model": ai_service.MODEL})
+            elapsed = time.perf_counter() - start
+
+            assert edit[2] in result[edit[0]], f"{mode} did not apply the edit"
+            assert metrics["mode"] == mode, metrics
+            totals[mode][0] += metrics["completion_tokens"]
+            totals[mode][1] += elapsed
+            print(f"{request[:38]:<40}{mode:<9}{metrics['prompt_tokens']:>8}"
+                  f"{metrics['completion_tokens']:>9}{elapsed * 1000:>8.0f}ms")
+
+    print()
+    for mode, (tokens, seconds) in totals.items():
+        print(f"{mode:<8} avg output {tokens / len(EDITS):>7.0f} tokens, "
+              f"avg latency {seconds / len(EDITS) * 1000:>6.0f}ms")
+    print(f"\nOutput tokens: {totals['rewrite'][0] / totals['patch'][0]:.0f}x fewer, "
+          f"latency: {totals['rewrite'][1] / totals['patch'][1]:.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: /api/projects keyset pagination vs OFFSET + full rows
+
+Fills the projects table with generated components (code_kb of code each)
+and times fetching one page of 20 at the start, middle and end of the
+table:
+
+- offset/full:  ORDER BY created_at LIMIT 20 OFFSET n, every column
+                serialized (what a listing built on to_dict() would do)
+- keyset/list:  list_projects(cursor) as used by GET /api/projects
+                (index range scan, code columns deferred)
+
+Usage:
+    python bench_projects.py [sizes] [code_kb]     e.g. 10000,100000 6
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+# app.py reads its configuration at import time
+_workdir = tempfile.mkdtemp(prefix="flexiui-projectsbench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+os.environ["FLEXIUI_SIMILARITY_WARM_LIMIT"] = "0"
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from app import app, encode_cursor, list_projects, prepare_app
+from models import db, Project
+from blobs import code_blobs
+
+PAGE = 20
+CHUNK = 5000
+
+
+def fill(start, count, code_kb):
+    """Add projects with distinct code (stored through the blob store)"""
+    epoch = datetime(2025, 1, 1)
+    with app.app_context():
+        conn = db.session.connection()
+        for offset in range(start, start + count, CHUNK):
+            ids = range(offset, min(offset + CHUNK, start + count))
+            texts = []
+            for i in ids:
+                texts += [
+                    f"<div class=\"card card--{i}\">" + "x" * (code_kb * 1024 // 2) + "</div>",
+                    f".card--{i} {{ color: #333; }}" * (code_kb * 1024 // 2 // 26),
+                    ""
+                ]
+            hashes = code_blobs.acquire(conn, texts)
+            conn.execute(Project.__table__.insert(), [
+                {
+                    "name": f"Component {i}", "prompt": f"Generate component {i}",
+                    "html_hash": hashes[n * 3], "css_hash": hashes[n * 3 + 1], "js_hash": None,
+                    "component_type": "card", "views": 0,
+                    "created_at": epoch + timedelta(seconds=i), "updated_at": epoch
+                }
+                for n, i in enumerate(ids)
+            ])
+            db.session.commit()
+            conn = db.session.connection()
+
+
+def offset_page(depth):
+    projects = db.session.query(Project).order_by(
+        Project.created_at.desc(), Project.id.desc()
+    ).offset(depth).limit(PAGE).all()
+    return [project.to_dict() for project in projects]
+
+
+def keyset_page(depth):
+    """Keyset page after the project just before `depth` (the previous page's cursor)"""
+    cursor = None
+    if depth:
+        before = db.session.query(Project).order_by(
+            Project.created_at.desc(), Project.id.desc()
+        ).offset(depth - 1).first()
+        cursor = encode_cursor(before)
+        db.session.expunge_all()
+    start = time.perf_counter()
+    projects, _ = list_projects(cursor, PAGE, Project.LIST_FIELDS)
+    payload = [project.to_dict(Project.LIST_FIELDS) for project in projects]
+    return time.perf_counter() - start, payload
+
+
+def timed_offset(depth):
+    start = time.perf_counter()
+    payload = offset_page(depth)
+    elapsed = time.perf_counter() - start
+    db.session.expunge_all()
+    return elapsed, payload
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000").split(",")]
+    code_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    prepare_app(app)
+
+    print(f"{code_kb} KB of code per project, {PAGE} per page\n")
+    print(f"{'rows':>8}{'depth':>8}{'offset/full':>14}{'bytes':>10}{'keyset/list':>14}{'bytes':>8}")
+
+    rows = 0
+    for size in sizes:
+        fill(rows, size - rows, code_kb)
+        rows = size
+
+        with app.app_context():
+            for depth in (0, size // 2, size - PAGE):
+                offset_s, offset_payload = min((timed_offset(depth) for _ in range(3)), key=lambda r: r[0])
+                keyset_s, keyset_payload = min((keyset_page(depth) for _ in range(3)), key=lambda r: r[0])
+                db.session.expunge_all()
+                print(f"{size:>8}{depth:>8}{offset_s * 1000:>12.2f}ms{len(json.dumps(offset_payload)):>10}"
+                      f"{keyset_s * 1000:>12.2f}ms{len(json.dumps(keyset_payload)):>8}")
+
+
+if __name__ == "__main__":
+    main()
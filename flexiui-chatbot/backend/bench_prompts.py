@@ -0,0 +1,152 @@
+"""
+Benchmark: precompiled prompt builder and theme classifier (prompts.py)
+
+Compares the current prompt helpers with the previous implementation
+(f-string rebuilt on every call, six sequential substring scans):
+
+- get_ui_generation_prompt per call
+- detect_theme per call
+- detect_themes on a batch (with repeated prompts) vs detect_theme in a loop
+
+Usage:
+    python bench_prompts.py [batch_size]
+"""
+
+import sys
+import time
+import random
+
+from prompts import (
+    COMPONENT_TEMPLATES, STYLE_THEMES,
+    get_ui_generation_prompt, detect_theme, detect_themes
+)
+
+# ============================================
+# PREVIOUS IMPLEMENTATION (baseline)
+# ============================================
+
+def legacy_detect_theme(user_prompt):
+    prompt_lower = user_prompt.lower()
+    if any(word in prompt_lower for word in ["dark", "black", "night", "noir"]):
+        return "dark"
+    if any(word in prompt_lower for word in ["gaming", "neon", "futuristic", "cyber"]):
+        return "gaming"
+    if any(word in prompt_lower for word in ["colorful", "vibrant", "rainbow", "bright"]):
+        return "colorful"
+    if any(word in prompt_lower for word in ["minimal", "simple", "clean", "minimalist"]):
+        return "minimal"
+    if any(word in prompt_lower for word in ["corporate", "professional", "business"]):
+        return "corporate"
+    if any(word in prompt_lower for word in ["light", "white", "bright background"]):
+        return "light"
+    return "dark"
+
+
+def legacy_generation_prompt(user_prompt, component_type="general"):
+    component_template = COMPONENT_TEMPLATES.get(component_type, COMPONENT_TEMPLATES["general"])
+    theme_description = STYLE_THEMES.get(legacy_detect_theme(user_prompt), "")
+    prompt = f"""
+{component_template}
+
+USER REQUEST: {user_prompt}
+
+{theme_description}
+
+REQUIREMENTS:
+1. Generate clean, semantic HTML5 code
+2. Use modern CSS with flexbox/grid for layout
+3. Make it fully responsive (mobile, tablet, desktop)
+4. Add smooth transitions and hover effects
+5. Include comments in the code
+6. Use BEM naming convention for CSS classes
+7. Ensure accessibility (proper ARIA labels, semantic tags)
+8. Add JavaScript only if needed for interactivity
+
+IMPORTANT OUTPUT FORMAT:
+Return ONLY valid JSON in this exact format (no markdown, no explanations):
+{{
+  "html": "<!-- Your HTML code here -->",
+  "css": "/* Your CSS code here */",
+  "js": "// Your JavaScript code here (or empty string if not needed)"
+}}
+
+Generate professional, production-ready code that can be used immediately.
+"""
+    return prompt.strip()
+
+# ============================================
+# WORKLOAD
+# ============================================
+
+WORDS = (
+    "create a responsive navbar with logo links and a search box for my "
+    "portfolio site using soft shadows rounded corners and large headings "
+    "pricing table testimonials signup form hero banner card grid footer"
+).split()
+THEME_WORDS = ["dark", "neon", "vibrant", "simple", "business", "white", "bright background"]
+
+
+def make_prompts(count, seed=7):
+    rng = random.Random(seed)
+    prompts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(6, 30))
+        if rng.random() < 0.7:
+            words.insert(rng.randrange(len(words)), rng.choice(THEME_WORDS))
+        prompts.append(" ".join(words).capitalize())
+    return prompts
+
+
+def time_it(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, seconds, count, baseline=None):
+    per_call = seconds / count * 1e6
+    speedup = f"{baseline / seconds:>7.1f}x" if baseline else ""
+    print(f"{label:<36}{per_call:>10.2f} µs/prompt {speedup}")
+
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    prompts = make_prompts(batch_size)
+    types = list(COMPONENT_TEMPLATES)
+    pairs = [(prompt, types[i % len(types)]) for i, prompt in enumerate(prompts)]
+
+    print(f"{batch_size:,} prompts\n")
+
+    base = time_it(lambda: [legacy_generation_prompt(p, t) for p, t in pairs])
+    report("generation prompt (legacy)", base, batch_size)
+    report("generation prompt (precompiled)",
+           time_it(lambda: [get_ui_generation_prompt(p, t) for p, t in pairs]), batch_size, base)
+    themed = [(p, t, detect_theme(p)) for p, t in pairs]
+    report("  ...theme already known",
+           time_it(lambda: [get_ui_generation_prompt(p, t, th) for p, t, th in themed]), batch_size, base)
+    print()
+
+    base = time_it(lambda: [legacy_detect_theme(p) for p in prompts])
+    report("detect_theme (legacy)", base, batch_size)
+    report("detect_theme (word-boundary regex)",
+           time_it(lambda: [detect_theme(p) for p in prompts]), batch_size, base)
+    report("detect_themes (batch)",
+           time_it(lambda: detect_themes(prompts)), batch_size, base)
+
+    # Warming and batch paths see the same prompts many times
+    repeated = prompts[:batch_size // 10] * 10
+    base = time_it(lambda: [legacy_detect_theme(p) for p in repeated])
+    report("repeated prompts, legacy loop", base, batch_size)
+    report("repeated prompts, detect_themes",
+           time_it(lambda: detect_themes(repeated)), batch_size, base)
+    print()
+
+    changed = sum(legacy_detect_theme(p) != theme for p, theme in zip(prompts, detect_themes(prompts)))
+    print(f"Prompts whose theme changed (substring → whole-word/priority rules): {changed:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: model routing vs one model for everything
+
+Starts the fake Groq upstream (fake_groq.py) with the small model faster
+than the large one, then runs the same /api/generate-ui requests (cache
+bypassed) against the app twice:
+
+- single: every route mapped to the large model (the old behaviour)
+- routed: the default route table (see router.py)
+
+and reports per component type the model that answered and the p50/p95
+latency, so the gain on simple components (and the lack of change on
+complex ones) is visible.
+
+Usage:
+    python bench_router.py [requests_per_type] [concurrency]
+"""
+
+import os
+import sys
+import json
+import asyncio
+
+import httpx
+
+from bench_load import start, stop, percentile, UPSTREAM_DEFAULTS
+from router import SMALL_MODEL, LARGE_MODEL
+
+# Groq serves the 8B model at roughly three times the 70B model's speed
+UPSTREAM = dict(UPSTREAM_DEFAULTS, **{
+    "FLEXIUI_FAKE_LATENCY": "lognormal:0.5:0.3",
+    "FLEXIUI_FAKE_TOKENS_PER_S": "275",
+    "FLEXIUI_FAKE_MODEL_SPEED": f"{SMALL_MODEL}=3",
+})
+
+PROMPTS = {
+    "button": "A rounded call to action button",
+    "card": "A product card with image, title and price",
+    "general": "A badge",
+    "navbar": "A dark navbar with logo and links",
+    "hero": "A hero section with headline, subtitle and signup form",
+}
+
+RUNS = {
+    "single": {"FLEXIUI_MODEL_ROUTES": json.dumps({"models": {"small": LARGE_MODEL, "large": LARGE_MODEL}})},
+    "routed": {},
+}
+
+
+async def run_type(base_url, component_type, count, concurrency):
+    """Send `count` generations of one type; returns (latencies, models)"""
+    latencies, models = [], {}
+    pending = iter(range(count))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        async def worker():
+            for i in pending:
+                body = {"prompt": f"{PROMPTS[component_type]} #{i}", "component_type": component_type,
+                        "cache": "bypass"}
+                started = asyncio.get_running_loop().time()
+                response = await http.post("/api/generate-ui", json=body)
+                latencies.append(asyncio.get_running_loop().time() - started)
+                model = (response.json().get("routing") or {}).get("model", "?")
+                models[model] = models.get(model, 0) + 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies), models
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    env = dict(UPSTREAM, **os.environ)
+    upstream_port, upstream = start(["fake_groq.py"], env)
+    results = {}
+    try:
+        for run, overrides in RUNS.items():
+            workdir = os.path.join("/tmp", f"flexiui-router-{os.getpid()}-{run}")
+            os.makedirs(workdir, exist_ok=True)
+            app_env = dict(env, **overrides, **{
+                "GROQ_API_KEY": "benchmark",
+                "GROQ_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+                "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+                "FLEXIUI_CACHE_DB": os.path.join(workdir, "cache.db"),
+            })
+            app_port, app = start(["bench_async.py", "--flask", str(concurrency)], app_env)
+            try:
+                for component_type in PROMPTS:
+                    results[run, component_type] = asyncio.run(
+                        run_type(f"http://127.0.0.1:{app_port}", component_type, count, concurrency)
+                    )
+            finally:
+                stop(app)
+    finally:
+        stop(upstream)
+
+    print(f"{count} requests per type, concurrency {concurrency}, "
+          f"upstream {json.dumps({k: v for k, v in UPSTREAM.items() if k.startswith('FLEXIUI_FAKE_')})}\n")
+    print(f"{'type':<9}{'single p50':>12}{'p95':>8}{'routed p50':>12}{'p95':>8}{'speedup':>9}  routed to")
+    for component_type in PROMPTS:
+        single, _ = results["single", component_type]
+        routed, models = results["routed", component_type]
+        print(f"{component_type:<9}{percentile(single, 50) * 1000:>10.0f}ms{percentile(single, 95) * 1000:>6.0f}ms"
+              f"{percentile(routed, 50) * 1000:>10.0f}ms{percentile(routed, 95) * 1000:>6.0f}ms"
+              f"{percentile(single, 50) / percentile(routed, 50):>8.1f}x  {models}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: project search with LIKE vs the FTS5 index
+
+Grows a projects table (synthetic prompts and generated pages built from a
+UI vocabulary) and, at each size, times the first page (20 results) of a
+few searches:
+
+- like:  WHERE prompt LIKE '%word%' AND ... ORDER BY created_at DESC
+         (scans newest-first until 20 rows match: quick for common words,
+         a full table scan for rare ones; no ranking, no page text)
+- fts:   search_projects() - bm25-ranked, snippet highlighted
+
+Queries: a common topic, two common words, a prefix, a rare brand name and
+a word that matches nothing.
+
+Usage:
+    python bench_search.py [sizes]      e.g. 10000,100000,300000
+"""
+
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from models import Project, CodeBlob
+from search import ensure_search_index, index_projects, search_projects
+
+COMPONENTS = ["button", "navbar", "card", "form", "modal", "table", "hero", "footer", "sidebar", "pricing"]
+ADJECTIVES = ["dark", "minimal", "glassmorphism", "responsive", "animated", "rounded", "gradient",
+              "neon", "corporate", "playful", "elegant", "retro", "compact", "bold"]
+TOPICS = ["bakery", "fitness", "crypto", "travel", "school", "restaurant", "portfolio", "startup",
+          "music", "hospital", "library", "garden", "gaming", "fashion", "banking", "weather"]
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt "
+         "labore dolore magna aliqua enim minim veniam quis nostrud exercitation ullamco").split()
+
+# Made-up business names: most appear in only a handful of projects
+_brand_rng = random.Random(5)
+BRANDS = ["".join(_brand_rng.choice("bcdfghklmnprstvz") + _brand_rng.choice("aeiou") for _ in range(3))
+          for _ in range(20000)]
+
+QUERIES = ["bakery", "neon pricing", "glassmorph*", BRANDS[1234], "nonexistent"]
+CHUNK = 5000
+
+
+def make_project(rng, i, epoch):
+    component = rng.choice(COMPONENTS)
+    topic = rng.choice(TOPICS)
+    prompt = f"Create a {rng.choice(ADJECTIVES)} {component} for {rng.choice(BRANDS)}, a {topic} website"
+    paragraphs = "".join(
+        f"<p>{' '.join(rng.choice(WORDS) for _ in range(12))}</p>" for _ in range(rng.randint(2, 5))
+    )
+    html = (f'<section class="{component}"><h2>{topic.title()} {component}</h2>{paragraphs}'
+            f'<button>Get started</button><style>.{component} {{ color: red; }}</style></section>')
+    return {
+        "id": i + 1, "name": prompt[:200], "prompt": prompt, "component_type": component,
+        "created_at": epoch + timedelta(seconds=i), "updated_at": epoch, "views": 0
+    }, html
+
+
+def fill(engine, start, count, rng):
+    epoch = datetime(2025, 1, 1)
+    for offset in range(start, start + count, CHUNK):
+        made = [make_project(rng, i, epoch) for i in range(offset, min(offset + CHUNK, start + count))]
+        with engine.begin() as conn:
+            conn.execute(Project.__table__.insert(), [row for row, _ in made])
+            index_projects(conn, [(row["id"], row["name"], row["prompt"], html) for row, html in made])
+
+
+def like_search(conn, query):
+    terms = query.replace("*", "").split()
+    where = " AND ".join(f"prompt LIKE :t{n}" for n in range(len(terms)))
+    return conn.execute(text(
+        f"SELECT id, name FROM projects WHERE {where} ORDER BY created_at DESC LIMIT 20"
+    ), {f"t{n}": f"%{term}%" for n, term in enumerate(terms)}).all()
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,300000").split(",")]
+
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Project.__table__.create(engine)
+    CodeBlob.__table__.create(engine)
+    with engine.begin() as conn:
+        ensure_search_index(conn)
+
+    rng = random.Random(11)
+    header = "".join(f"{q[:18]:>20}" for q in QUERIES)
+    print(f"{'rows':>8}{'mode':>6}{header}")
+
+    rows = 0
+    for size in sizes:
+        fill(engine, rows, size - rows, rng)
+        rows = size
+        with engine.connect() as conn:
+            for mode in ("like", "fts"):
+                cells = []
+                for query in QUERIES:
+                    if mode == "like":
+                        ms, result = timed(lambda: like_search(conn, query))
+                    else:
+                        ms, (result, _) = timed(lambda: search_projects(conn, query))
+                    cells.append(f"{ms:.2f}ms ({len(result)})")
+                print(f"{size:>8}{mode:>6}" + "".join(f"{cell:>20}" for cell in cells))
+
+    with engine.connect() as conn:
+        results, _ = search_projects(conn, f"{BRANDS[1234]} website", limit=1)
+    print(f"\nTop result for '{BRANDS[1234]} website': {results[0] if results else None}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: stateless chat (full history uploaded) vs server-side sessions
+
+Runs a long conversation against /api/chat twice through the Flask test
+client, with a local fake Groq upstream that answers instantly:
+
+- stateless: the client re-sends the whole conversation_history every time
+- session:   the client sends only the session id and the new message
+
+Prints the request body size and server time (mean of the last 5 turns) at
+a few points of the conversation, so the growth (or lack of it) is visible.
+
+Usage:
+    python bench_sessions.py [turns]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+
+from bench_async import serve_fake_upstream, free_port, wait_for_port
+
+CHECKPOINTS = (1, 10, 50, 100, 200, 400)
+
+# ============================================
+# SETUP
+# ============================================
+
+def start_upstream():
+    """Fake Groq in a background thread; the app is pointed at it"""
+    port = free_port()
+    threading.Thread(
+        target=lambda: asyncio.run(serve_fake_upstream(port, 0)), daemon=True
+    ).start()
+    wait_for_port(port)
+
+    workdir = tempfile.mkdtemp(prefix="flexiui-bench-")
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'app.db')}"
+    os.environ["FLEXIUI_CACHE_DB"] = os.path.join(workdir, "cache.db")
+
+
+def user_message(turn):
+    return f"Turn {turn}: how would I make the navbar collapse on small screens? " * 3
+
+# ============================================
+# RUNS
+# ============================================
+
+def run(client, turns, use_session):
+    """
+    Chat for `turns` messages
+
+    Returns:
+        dict: checkpoint -> (request bytes, server ms)
+    """
+    history = []
+    session_id = None
+    samples = {}
+    times = []
+
+    for turn in range(1, turns + 1):
+        message = user_message(turn)
+        if use_session:
+            body = {"message": message}
+            if session_id:
+                body["session_id"] = session_id
+        else:
+            body = {"message": message, "conversation_history": history}
+
+        raw = json.dumps(body)
+        start = time.perf_counter()
+        response = client.post("/api/chat", data=raw, content_type="application/json")
+        times.append((time.perf_counter() - start) * 1000)
+        data = response.get_json()
+
+        if use_session:
+            session_id = data["session_id"]
+        else:
+            history += [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": data["response"]}
+            ]
+
+        if turn in CHECKPOINTS or turn == turns:
+            recent = times[-5:]
+            samples[turn] = (len(raw), sum(recent) / len(recent))
+    return samples
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+
+    start_upstream()
+    from app import app
+    client = app.test_client()
+
+    # Warm up imports, DB and the upstream connection
+    run(client, 2, True)
+
+    stateless = run(client, turns, use_session=False)
+    session = run(client, turns, use_session=True)
+
+    print(f"\n{'turn':>6} | {'stateless bytes':>15} {'ms':>8} | {'session bytes':>13} {'ms':>8}")
+    print("-" * 60)
+    for turn in sorted(stateless):
+        s_bytes, s_ms = stateless[turn]
+        k_bytes, k_ms = session[turn]
+        print(f"{turn:>6} | {s_bytes:>15} {s_ms:>8.2f} | {k_bytes:>13} {k_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: near-duplicate lookup latency and recall at 100k+ stored projects
+
+Half the queries are paraphrases of stored prompts (a typo, a dropped,
+added or swapped word), half are new prompts. Paraphrases never shingle
+the same as their source, so every one goes through the LSH buckets
+rather than the exact-match table.
+
+Recall: of the paraphrases whose exact Jaccard score with their source
+reaches the threshold, the share the index found.
+
+Usage:
+    python bench_similarity.py [num_projects] [num_queries]
+"""
+
+import sys
+import time
+import random
+
+from similarity import SimilarityIndex, prompt_shingles, jaccard
+
+ADJECTIVES = ["dark", "light", "minimal", "colorful", "glassy", "rounded", "sticky",
+              "animated", "responsive", "gradient", "retro", "flat", "bold", "elegant"]
+THINGS = ["navbar", "hero section", "pricing card", "footer", "login form", "signup form",
+          "profile card", "testimonial slider", "feature grid", "contact form", "sidebar",
+          "dashboard header", "product card", "newsletter box", "faq accordion"]
+EXTRAS = ["with logo", "with search bar", "with three columns", "with social icons",
+          "with a call to action", "with avatar", "with dropdown menu", "with badges",
+          "with video background", "with countdown", "with tabs", "with rating stars"]
+FILLERS = ["modern", "nice", "simple", "clean", "cool", "pretty"]
+TYPES = ["navbar", "hero", "card", "footer", "button", "form", "general"]
+THEMES = ["dark", "light", "colorful", "gaming", "corporate", "minimal"]
+
+
+def random_prompt(rng):
+    return " ".join([
+        rng.choice(ADJECTIVES), rng.choice(ADJECTIVES), rng.choice(THINGS),
+        rng.choice(EXTRAS), rng.choice(EXTRAS), str(rng.randrange(1000))
+    ])
+
+
+def typo(rng, words):
+    candidates = [i for i, word in enumerate(words) if len(word) > 3]
+    i = rng.choice(candidates)
+    word = words[i]
+    at = rng.randrange(len(word) - 1)
+    words[i] = word[:at] + word[at + 1] + word[at] + word[at + 2:]
+    return words
+
+
+def drop_word(rng, words):
+    del words[rng.randrange(len(words))]
+    return words
+
+
+def add_word(rng, words):
+    words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS))
+    return words
+
+
+def swap_words(rng, words):
+    i = rng.randrange(len(words) - 1)
+    words[i], words[i + 1] = words[i + 1], words[i]
+    return words
+
+
+PARAPHRASES = {"typo": typo, "drop": drop_word, "add": add_word, "swap": swap_words}
+
+
+def paraphrase(rng, prompt):
+    """
+    Returns:
+        tuple: (kind, paraphrased prompt), never shingling like the original
+    """
+    while True:
+        kind = rng.choice(list(PARAPHRASES))
+        changed = " ".join(PARAPHRASES[kind](rng, prompt.split()))
+        if prompt_shingles(changed) != prompt_shingles(prompt):
+            return kind, changed
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    num_projects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    rng = random.Random(7)
+
+    index = SimilarityIndex()
+    stored = []
+
+    print(f"Building index with {num_projects:,} projects...")
+    start = time.perf_counter()
+    for entry_id in range(num_projects):
+        prompt = random_prompt(rng)
+        component_type, theme = rng.choice(TYPES), rng.choice(THEMES)
+        index.add(entry_id, prompt, component_type, theme)
+        stored.append((prompt, component_type, theme))
+    build_time = time.perf_counter() - start
+    print(f"   built in {build_time:.1f}s ({build_time / num_projects * 1e6:.0f} µs/project)")
+    print(f"   {index.stats()}")
+
+    # Half the queries are paraphrases of stored prompts, half are new prompts
+    queries = []
+    for i in range(num_queries):
+        if i % 2 == 0:
+            source = rng.randrange(num_projects)
+            prompt, component_type, theme = stored[source]
+            kind, changed = paraphrase(rng, prompt)
+            score = jaccard(prompt_shingles(changed), prompt_shingles(prompt))
+            queries.append((kind, changed, component_type, theme, source, score))
+        else:
+            queries.append(("new", random_prompt(rng) + " x", rng.choice(TYPES), rng.choice(THEMES),
+                            None, 0.0))
+
+    timings = {"near-duplicate": [], "new": []}
+    # kind -> [paraphrases, above the threshold, found]
+    recall = {kind: [0, 0, 0] for kind in PARAPHRASES}
+    false_matches = 0
+    for kind, prompt, component_type, theme, source, score in queries:
+        start = time.perf_counter()
+        match = index.lookup(prompt, component_type, theme)
+        took = (time.perf_counter() - start) * 1000
+        if source is None:
+            timings["new"].append(took)
+            false_matches += match is not None
+            continue
+        timings["near-duplicate"].append(took)
+        counts = recall[kind]
+        counts[0] += 1
+        if score >= index.threshold:
+            counts[1] += 1
+            counts[2] += match is not None and match[0] == source
+
+    print(f"\nLookups: {num_queries:,}")
+    for name, values in timings.items():
+        print(f"   {name:<15} p50 {percentile(values, 50):.3f} ms, p95 {percentile(values, 95):.3f} ms, "
+              f"p99 {percentile(values, 99):.3f} ms, max {max(values):.3f} ms")
+
+    print(f"\nRecall (paraphrases scoring >= {index.threshold} with their source):")
+    for kind, (total, eligible, found) in recall.items():
+        rate = f"{found / eligible:.1%}" if eligible else "n/a"
+        print(f"   {kind:<6} {found:>5}/{eligible:<5} {rate:>6}  ({total - eligible} of {total} below the threshold)")
+    total_eligible = sum(counts[1] for counts in recall.values())
+    total_found = sum(counts[2] for counts in recall.values())
+    print(f"   all    {total_found:>5}/{total_eligible:<5} {total_found / max(1, total_eligible):>6.1%}")
+    print(f"   new prompts matched: {false_matches}/{len(timings['new'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: cold start of the app
+
+Measures, each in fresh processes (median of a few runs):
+
+- import:   `import app` in a new interpreter, with and without
+            GROQ_API_KEY (a missing key used to fail the import)
+- serving:  the app started against the fake Groq upstream (no upstream
+            latency, so only the app's own work shows), timed from process
+            start to the listening socket and to the first answered
+            /api/health, then the first and second /api/generate-ui
+
+for two modes:
+
+- lazy: the default; the first request runs app.warm_up()
+- warm: FLEXIUI_WARM_ON_START=1 warms up inside create_app(), before the
+        server listens
+
+Usage:
+    python bench_startup.py [runs]
+"""
+
+import os
+import sys
+import time
+import subprocess
+import statistics
+
+import httpx
+
+from bench_load import HERE, UPSTREAM_DEFAULTS, start, stop
+from bench_async import free_port, wait_for_port
+
+UPSTREAM = dict(UPSTREAM_DEFAULTS, **{
+    "FLEXIUI_FAKE_LATENCY": "fixed:0",
+    "FLEXIUI_FAKE_TOKENS_PER_S": "100000",
+})
+
+MODES = {
+    "lazy": {},
+    "warm": {"FLEXIUI_WARM_ON_START": "1"},
+}
+
+
+def time_import(env):
+    """Seconds for `import app` in a new interpreter (interpreter start excluded)"""
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def time_serving(env, run):
+    """Seconds to listening, the first /api/health, first and second /api/generate-ui"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "bench_async.py", "--flask", "8", str(port)],
+                               cwd=HERE, env=env, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_port(port, poll=0.005)
+        listening = time.perf_counter() - started
+        with httpx.Client(timeout=60) as http:
+            http.get(f"{url}/api/health").raise_for_status()
+            health = time.perf_counter() - started
+
+            timings = []
+            for i in range(2):
+                body = {"prompt": f"A pricing card for startup run {run}-{i}", "component_type": "card",
+                        "cache": "bypass"}
+                request_start = time.perf_counter()
+                http.post(f"{url}/api/generate-ui", json=body).raise_for_status()
+                timings.append(time.perf_counter() - request_start)
+        return listening, health, timings[0], timings[1]
+    finally:
+        stop(process)
+
+
+def ms(values):
+    values = [v for v in values if v is not None]
+    return f"{statistics.median(values) * 1000:.0f}ms" if values else "failed"
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    env = dict(UPSTREAM, **os.environ)
+    upstream_port, upstream = start(["fake_groq.py"], env)
+    workdir = os.path.join("/tmp", f"flexiui-startup-{os.getpid()}")
+    os.makedirs(workdir, exist_ok=True)
+    env.update({
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        "FLEXIUI_CACHE_DB": os.path.join(workdir, "cache.db"),
+        "FLEXIUI_ADMISSION_DB": os.path.join(workdir, "admission.db"),
+    })
+
+    try:
+        # One throwaway start creates the database, so every run below
+        # starts from the same on-disk state
+        time_serving(env, "setup")
+
+        print(f"{runs} runs each, medians\n")
+        no_key = {k: v for k, v in env.items() if k not in ("GROQ_API_KEY", "GROQ_API_KEYS")}
+        for label, import_env in (("with key", env), ("without key", no_key)):
+            for mode, overrides in MODES.items():
+                seconds = [time_import(dict(import_env, **overrides)) for _ in range(runs)]
+                print(f"{'import app (' + mode + ', ' + label + ')':<32}{ms(seconds):>8}")
+
+        print(f"\n{'mode':<6}{'listening':>11}{'first health':>14}{'first generate':>16}{'second generate':>17}")
+        for mode, overrides in MODES.items():
+            results = [time_serving(dict(env, **overrides), f"{mode}-{n}") for n in range(runs)]
+            listening, health, first, second = zip(*results)
+            print(f"{mode:<6}{ms(listening):>11}{ms(health):>14}{ms(first):>16}{ms(second):>17}")
+    finally:
+        stop(upstream)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: StreamingCodeParser vs parse_code_from_response on 100KB+ responses
+
+Compares throughput of the incremental parser (fed in model-sized chunks)
+with the current parse-then-fallback path, for both a complete response and
+one cut off at max_tokens.
+
+Usage:
+    python bench_stream_parser.py [response_kb] [chunk_size]
+"""
+
+import os
+import sys
+import json
+import time
+
+# ai_service builds its Groq client at import time
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from ai_service import parse_code_from_response
+from stream_parser import StreamingCodeParser
+
+
+def make_response(target_kb):
+    """Build a ```json fenced response of roughly target_kb kilobytes"""
+    cards, rules, handlers = [], [], []
+    i = 0
+    while sum(map(len, cards + rules + handlers)) < target_kb * 1024:
+        cards.append(
+            f'<div class="card card--{i}">\n  <h3 class="card__title">Card "{i}"</h3>\n'
+            f'  <p class="card__text">Lorem ipsum dolor sit amet, consectetur.</p>\n</div>'
+        )
+        rules.append(f".card--{i} {{ padding: {i % 24}px; color: #{i % 4096:03x}; }}")
+        handlers.append(f"document.querySelector('.card--{i}').addEventListener('click', () => toggle({i}));")
+        i += 1
+    body = json.dumps({
+        "html": "\n".join(cards),
+        "css": "\n".join(rules),
+        "js": "\n".join(handlers)
+    }, indent=2)
+    return "```json\n" + body + "\n```"
+
+
+def time_it(func, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_streaming(text, chunk_size):
+    parser = StreamingCodeParser()
+    first_section_at = None
+    for offset in range(0, len(text), chunk_size):
+        if parser.feed(text[offset:offset + chunk_size]) and first_section_at is None:
+            first_section_at = offset + chunk_size
+    return parser.close(), first_section_at
+
+
+def recovered(result):
+    return sum(len(result.get(name, "")) for name in ("html", "css", "js")) if result else 0
+
+
+def main():
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    complete = make_response(size_kb)
+    truncated = complete[:int(len(complete) * 0.8)]
+
+    print(f"Response: {len(complete) / 1024:.0f} KB, chunk size {chunk_size} chars\n")
+    print(f"{'case':<12}{'parser':<24}{'time':>10}{'MB/s':>10}{'recovered':>12}")
+
+    for label, text in (("complete", complete), ("truncated", truncated)):
+        mb = len(text) / 1e6
+
+        seconds, result = time_it(lambda: parse_code_from_response(text))
+        print(f"{label:<12}{'parse+fallback (whole)':<24}{seconds * 1000:>8.1f}ms"
+              f"{mb / seconds:>10.1f}{recovered(result):>12,}")
+
+        seconds, (result, first_at) = time_it(lambda: run_streaming(text, chunk_size))
+        print(f"{label:<12}{'streaming (chunked)':<24}{seconds * 1000:>8.1f}ms"
+              f"{mb / seconds:>10.1f}{recovered(result):>12,}")
+
+        if first_at:
+            print(f"{'':<12}first section ready after {first_at / len(text):.0%} of the response")
+        print()
+
+
+if __name__ == "__main__":
+    main()
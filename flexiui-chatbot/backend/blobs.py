@@ -0,0 +1,363 @@
+"""
+Content-Addressed Code Blob Store for FlexiUI
+
+Generated code repeats a lot across projects (shared resets, identical
+button CSS, cached results saved again and again), so projects don't store
+their html/css/js inline. Each distinct text is stored once in code_blobs,
+keyed by its sha256, zlib-compressed and reference counted; a project row
+only holds the three hashes.
+
+- acquire(): store texts (or bump the refcount of ones already stored)
+- release(): drop references; blobs nobody references are deleted
+- get_many(): read texts, through an in-memory LRU of decompressed blobs
+
+Empty code is not stored at all (its hash is None).
+"""
+
+import os
+import zlib
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from sqlalchemy import select, func, bindparam, inspect, text
+
+from models import CodeBlob, Project
+
+BLOB_TABLE = CodeBlob.__table__
+
+# Blobs smaller than this are stored uncompressed (zlib would only add bytes)
+MIN_COMPRESS_SIZE = 64
+
+
+def blob_hash(code):
+    """sha256 of a code string (the blob's key)"""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """
+    Reads/writes code_blobs on the caller's connection (so blob changes
+    commit or roll back with the project change), with a shared LRU of
+    decompressed texts
+    """
+
+    def __init__(self, cache_bytes=32 * 1024 * 1024, level=6):
+        """
+        Args:
+            cache_bytes (int): Decompressed text kept in memory (0 disables)
+            level (int): zlib compression level (1-9)
+        """
+        self.cache_bytes = cache_bytes
+        self.level = level
+
+        self._cache = OrderedDict()  # hash -> text
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_BLOB_CACHE_MB - decompressed blob LRU size (default 32)
+        FLEXIUI_BLOB_LEVEL    - zlib level (default 6)
+        """
+        return cls(
+            cache_bytes=int(float(os.getenv("FLEXIUI_BLOB_CACHE_MB", 32)) * 1024 * 1024),
+            level=int(os.getenv("FLEXIUI_BLOB_LEVEL", 6))
+        )
+
+    # ---------- encoding ----------
+
+    def encode(self, code):
+        """
+        Returns:
+            tuple: (compression, data)
+        """
+        raw = code.encode("utf-8")
+        if len(raw) >= MIN_COMPRESS_SIZE:
+            packed = zlib.compress(raw, self.level)
+            if len(packed) < len(raw):
+                return "zlib", packed
+        return "none", raw
+
+    @staticmethod
+    def decode(compression, data):
+        if compression == "zlib":
+            data = zlib.decompress(data)
+        return bytes(data).decode("utf-8")
+
+    # ---------- writes ----------
+
+    def acquire(self, conn, texts):
+        """
+        Store texts and take one reference to each
+
+        Args:
+            conn: SQLAlchemy connection (inside a transaction)
+            texts (list): Code strings
+
+        Returns:
+            list: Hash per text (None for empty text)
+        """
+        hashes = [blob_hash(code) if code else None for code in texts]
+        wanted = Counter(digest for digest in hashes if digest)
+        if not wanted:
+            return hashes
+
+        # The UPDATE takes SQLite's write lock first, so no other process
+        # can insert the same blob between the lookup and the insert below
+        conn.execute(
+            BLOB_TABLE.update()
+            .where(BLOB_TABLE.c.hash == bindparam("b_hash"))
+            .values(refcount=BLOB_TABLE.c.refcount + bindparam("b_count")),
+            [{"b_hash": digest, "b_count": count} for digest, count in wanted.items()]
+        )
+        existing = set(conn.execute(
+            select(BLOB_TABLE.c.hash).where(BLOB_TABLE.c.hash.in_(list(wanted)))
+        ).scalars())
+
+        texts_by_hash = dict(zip(hashes, texts))
+        rows = []
+        for digest, count in wanted.items():
+            if digest in existing:
+                continue
+            text_value = texts_by_hash[digest]
+            compression, data = self.encode(text_value)
+            rows.append({
+                "hash": digest, "compression": compression, "data": data,
+                "size": len(text_value.encode("utf-8")), "stored_size": len(data),
+                "refcount": count
+            })
+            self._remember(digest, text_value)
+        if rows:
+            conn.execute(BLOB_TABLE.insert(), rows)
+        return hashes
+
+    def release(self, conn, hashes):
+        """
+        Drop one reference per hash; delete blobs nobody references anymore
+        """
+        dropped = Counter(digest for digest in hashes if digest)
+        if not dropped:
+            return
+        conn.execute(
+            BLOB_TABLE.update()
+            .where(BLOB_TABLE.c.hash == bindparam("b_hash"))
+            .values(refcount=BLOB_TABLE.c.refcount - bindparam("b_count")),
+            [{"b_hash": digest, "b_count": count} for digest, count in dropped.items()]
+        )
+        conn.execute(BLOB_TABLE.delete().where(
+            BLOB_TABLE.c.hash.in_(list(dropped)), BLOB_TABLE.c.refcount <= 0
+        ))
+
+    # ---------- reads ----------
+
+    def get_many(self, conn, hashes):
+        """
+        Texts for a set of hashes (missing/None hashes are left out)
+
+        Returns:
+            dict: hash -> text
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for digest in hashes:
+                if not digest or digest in found:
+                    continue
+                text_value = self._cache.get(digest)
+                if text_value is None:
+                    missing.append(digest)
+                else:
+                    self._cache.move_to_end(digest)
+                    found[digest] = text_value
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            rows = conn.execute(
+                select(BLOB_TABLE.c.hash, BLOB_TABLE.c.compression, BLOB_TABLE.c.data)
+                .where(BLOB_TABLE.c.hash.in_(missing))
+            )
+            for digest, compression, data in rows:
+                found[digest] = self.decode(compression, data)
+                self._remember(digest, found[digest])
+        return found
+
+    def _remember(self, digest, text_value):
+        size = len(text_value)
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if digest in self._cache:
+                return
+            self._cache[digest] = text_value
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+
+    def stats(self):
+        """LRU counters"""
+        with self._lock:
+            return {
+                "cached_blobs": len(self._cache),
+                "cached_bytes": self._cached_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Shared store used by the Project model
+code_blobs = BlobStore.from_env()
+
+# ============================================
+# MIGRATION FROM INLINE CODE COLUMNS
+# ============================================
+
+INLINE_COLUMNS = ("html_code", "css_code", "js_code")
+
+
+def blob_report(conn):
+    """
+    Space used by the blob store
+
+    Returns:
+        dict: blobs, references, raw_bytes (deduplicated, uncompressed),
+              logical_bytes (what inline storage would hold), stored_bytes
+    """
+    c = BLOB_TABLE.c
+    blobs, references, raw_bytes, logical_bytes, stored_bytes = conn.execute(
+        select(
+            func.count(), func.coalesce(func.sum(c.refcount), 0), func.coalesce(func.sum(c.size), 0),
+            func.coalesce(func.sum(c.size * c.refcount), 0), func.coalesce(func.sum(c.stored_size), 0)
+        )
+    ).one()
+    return {
+        "blobs": blobs,
+        "references": references,
+        "logical_bytes": logical_bytes,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "saved_ratio": round(1 - stored_bytes / logical_bytes, 4) if logical_bytes else 0.0
+    }
+
+
+def migrate_inline_code(conn, store=code_blobs, chunk_size=1000):
+    """
+    Move html_code/css_code/js_code out of the projects table into blobs
+
+    Databases created before the blob store have the code inline. This adds
+    the hash columns, stores every project's code through the blob store,
+    then drops the inline columns. Does nothing when there's nothing to
+    migrate.
+
+    The file only shrinks after a VACUUM (migrate_blobs.py runs one).
+
+    Args:
+        conn: SQLAlchemy connection (inside a transaction)
+
+    Returns:
+        dict: blob_report() after the migration, or None if nothing was done
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("projects")}
+    if not columns & set(INLINE_COLUMNS):
+        return None
+
+    BLOB_TABLE.create(conn, checkfirst=True)
+    for field, (_, hash_column) in Project.CODE_FIELDS.items():
+        if hash_column not in columns:
+            conn.execute(text(f"ALTER TABLE projects ADD COLUMN {hash_column} VARCHAR(64)"))
+
+    inline = [field for field in INLINE_COLUMNS if field in columns]
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, {', '.join(inline)} FROM projects WHERE id > :last_id "
+            f"ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": chunk_size}).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        texts = [row[i + 1] or "" for row in rows for i in range(len(inline))]
+        hashes = store.acquire(conn, texts)
+        updates = []
+        for n, row in enumerate(rows):
+            values = {"b_id": row[0]}
+            for i, field in enumerate(inline):
+                values[Project.CODE_FIELDS[field][1]] = hashes[n * len(inline) + i]
+            updates.append(values)
+        table = Project.__table__
+        values = {Project.CODE_FIELDS[field][1]: bindparam(Project.CODE_FIELDS[field][1])
+                  for field in inline}
+        # Setting updated_at explicitly keeps its onupdate from stamping every
+        # project with the migration time (it orders listings and feeds ETags)
+        values["updated_at"] = table.c.updated_at
+        conn.execute(
+            table.update().where(table.c.id == bindparam("b_id")).values(values),
+            updates
+        )
+
+    for field in inline:
+        conn.execute(text(f"ALTER TABLE projects DROP COLUMN {field}"))
+    return blob_report(conn)
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+
+    print("Testing Blob Store...\n")
+
+    engine = create_engine("sqlite://")
+    BLOB_TABLE.create(engine)
+    store = BlobStore(cache_bytes=1024 * 1024)
+
+    reset = "* { margin: 0; padding: 0; box-sizing: border-box; }\n" * 20
+    with engine.begin() as conn:
+        first = store.acquire(conn, [reset, reset + ".a { color: red; }", ""])
+        second = store.acquire(conn, [reset])
+        report = blob_report(conn)
+    ok = first[0] == second[0] and first[2] is None and report["blobs"] == 2 and report["references"] == 3
+    print(f"1. {'✅' if ok else '❌'} Deduplicated: {report}")
+
+    store._cache.clear()
+    with engine.connect() as conn:
+        texts = store.get_many(conn, first)
+    print(f"2. {'✅' if texts[first[0]] == reset else '❌'} Round trip through zlib "
+          f"({report['logical_bytes']} bytes stored in {report['stored_bytes']})")
+
+    with engine.begin() as conn:
+        store.release(conn, [first[0], first[1]])
+        left = blob_report(conn)
+        store.release(conn, second)
+        empty = blob_report(conn)
+    ok = left["blobs"] == 1 and left["references"] == 1 and empty["blobs"] == 0
+    print(f"3. {'✅' if ok else '❌'} Unreferenced blobs deleted ({left['blobs']} then {empty['blobs']} left)")
+
+    print(f"4. LRU: {store.stats()}")
+
+    # A pre-blob-store projects table keeps its updated_at through the migration
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR(200), prompt TEXT, "
+            "html_code TEXT, css_code TEXT, js_code TEXT, component_type VARCHAR(50), "
+            "created_at DATETIME, updated_at DATETIME, views INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO projects VALUES (1, 'Nav', 'A nav', '<nav></nav>', :css, '', "
+            "'navbar', '2025-12-08 11:14:38', '2025-12-08 11:14:38', 0)"
+        ), {"css": reset})
+        migrate_inline_code(conn, store)
+        row = conn.execute(text("SELECT updated_at, css_hash FROM projects")).one()
+    ok = row[0] == "2025-12-08 11:14:38" and row[1] == first[0]
+    print(f"5. {'✅' if ok else '❌'} Inline code migrated, updated_at kept: {row[0]}")
+
+    print("\n✅ Blob store working!")
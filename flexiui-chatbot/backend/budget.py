@@ -0,0 +1,230 @@
+"""
+Adaptive Output Budgets for FlexiUI
+
+Picks max_tokens per request from the output sizes seen so far instead of
+a fixed 2000 (generation) / 1000 (chat):
+
+- sizes are remembered per (kind, component_type, theme), where kind is
+  "generate" or "chat", with the (kind, component_type) sizes as a
+  fallback for themes with few samples
+- the budget is the target percentile of those sizes times a headroom
+  factor, clamped to [minimum, maximum]
+- until enough samples exist the old fixed budgets are used
+
+Answers that still hit the budget (finish_reason "length") are continued:
+the partial answer goes back as an assistant message with a request to
+carry on exactly where it stopped (see continuation_messages()), up to
+max_continuations times. The full size of a continued answer is what gets
+remembered, so the budget for that type grows.
+
+Stats: requests, first-pass truncation rate, continuations, answers still
+cut off after all continuations, and tokens reserved compared with the
+fixed budgets ("tokens_saved", negative when a type needs more).
+
+Configured with FLEXIUI_BUDGET_* environment variables (see
+OutputBudget.from_env).
+"""
+
+import os
+import math
+import threading
+from collections import deque
+
+# The fixed budgets used before any sizes are known
+DEFAULT_BUDGETS = {"generate": 2000, "chat": 1000}
+
+# Sent after a truncated answer to get the rest of it
+CONTINUE_PROMPT = (
+    "Your answer was cut off. Continue exactly where you stopped: no repetition, "
+    "no preamble, no markdown fences - just the remaining characters."
+)
+
+
+def continuation_messages(messages, partial):
+    """
+    Messages asking the model to continue a cut-off answer
+
+    Args:
+        messages (list): The original request messages
+        partial (str): Everything the model answered so far
+
+    Returns:
+        list: messages + the partial answer + CONTINUE_PROMPT
+    """
+    return messages + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUE_PROMPT}
+    ]
+
+
+class OutputBudget:
+    """
+    Learns output sizes and hands out max_tokens budgets
+    """
+
+    def __init__(self, percentile=95, headroom=1.2, minimum=256, maximum=4000,
+                 min_samples=20, window=200, max_continuations=2):
+        """
+        Args:
+            percentile (float): Output size percentile the budget covers
+            headroom (float): Multiplier on that percentile
+            minimum (int): Smallest budget handed out
+            maximum (int): Largest budget handed out
+            min_samples (int): Sizes needed before a key's budget is used
+            window (int): Sizes remembered per key
+            max_continuations (int): Extra calls for an answer that hits the budget
+        """
+        self.percentile = percentile
+        self.headroom = headroom
+        self.minimum = minimum
+        self.maximum = maximum
+        self.min_samples = min_samples
+        self.window = window
+        self.max_continuations = max_continuations
+
+        self._sizes = {}
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.truncated = 0
+        self.continuations = 0
+        self.still_truncated = 0
+        self.reserved_tokens = 0
+        self.baseline_tokens = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_BUDGET_PERCENTILE     - output size percentile covered (default 95)
+        FLEXIUI_BUDGET_HEADROOM       - multiplier on it (default 1.2)
+        FLEXIUI_BUDGET_MIN            - smallest max_tokens (default 256)
+        FLEXIUI_BUDGET_MAX            - largest max_tokens (default 4000)
+        FLEXIUI_BUDGET_MIN_SAMPLES    - sizes needed per key (default 20)
+        FLEXIUI_MAX_CONTINUATIONS     - continuations of a cut-off answer (default 2)
+        """
+        return cls(
+            percentile=float(os.getenv("FLEXIUI_BUDGET_PERCENTILE", 95)),
+            headroom=float(os.getenv("FLEXIUI_BUDGET_HEADROOM", 1.2)),
+            minimum=int(os.getenv("FLEXIUI_BUDGET_MIN", 256)),
+            maximum=int(os.getenv("FLEXIUI_BUDGET_MAX", 4000)),
+            min_samples=int(os.getenv("FLEXIUI_BUDGET_MIN_SAMPLES", 20)),
+            max_continuations=int(os.getenv("FLEXIUI_MAX_CONTINUATIONS", 2))
+        )
+
+    # ---------- budgets ----------
+
+    def budget(self, kind, component_type, theme=None):
+        """
+        max_tokens for one request (also counted as reserved in the stats)
+
+        Args:
+            kind (str): "generate" or "chat"
+            component_type (str): Resolved component type ("chat" for chat)
+            theme (str): Detected theme (optional)
+
+        Returns:
+            int: max_tokens
+        """
+        with self._lock:
+            tokens = self._budgets.get((kind, component_type, theme))
+            if tokens is None:
+                tokens = self._budgets.get((kind, component_type), DEFAULT_BUDGETS[kind])
+            self.requests += 1
+            self.reserved_tokens += tokens
+            self.baseline_tokens += DEFAULT_BUDGETS[kind]
+        return tokens
+
+    def record(self, kind, component_type, theme, output_tokens, continuations=0, cut_off=False):
+        """
+        Remember the size of a finished answer
+
+        Args:
+            kind (str): "generate" or "chat"
+            component_type (str): Resolved component type ("chat" for chat)
+            theme (str): Detected theme (or None)
+            output_tokens (int): Completion tokens over all calls
+            continuations (int): Continuation calls made
+            cut_off (bool): The last call hit max_tokens too
+        """
+        with self._lock:
+            self.truncated += bool(continuations or cut_off)
+            self.continuations += continuations
+            self.still_truncated += bool(cut_off)
+            for key in ((kind, component_type, theme), (kind, component_type)):
+                sizes = self._sizes.get(key)
+                if sizes is None:
+                    sizes = self._sizes[key] = deque(maxlen=self.window)
+                sizes.append(output_tokens)
+                if len(sizes) >= self.min_samples:
+                    self._budgets[key] = self._budget_for(sizes)
+
+    def _budget_for(self, sizes):
+        ordered = sorted(sizes)
+        rank = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * self.percentile / 100) - 1))
+        return max(self.minimum, min(self.maximum, math.ceil(ordered[rank] * self.headroom)))
+
+    def load_history(self, rows):
+        """
+        Seed sizes from earlier runs
+
+        Args:
+            rows (iterable): (kind, component_type, theme, output_tokens)
+        """
+        for kind, component_type, theme, output_tokens in rows:
+            if output_tokens:
+                self.record(kind, component_type, theme, output_tokens)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "truncated": self.truncated,
+                "truncation_rate": round(self.truncated / self.requests, 4) if self.requests else 0.0,
+                "continuations": self.continuations,
+                "still_truncated": self.still_truncated,
+                "reserved_tokens": self.reserved_tokens,
+                "tokens_saved": self.baseline_tokens - self.reserved_tokens,
+                "budgets": {
+                    ":".join(part or "*" for part in key): tokens
+                    for key, tokens in sorted(self._budgets.items(), key=lambda item: str(item[0]))
+                }
+            }
+
+
+# Shared budgets used by ai_service
+output_budget = OutputBudget.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    import random
+
+    print("Testing Output Budgets...\n")
+
+    budgets = OutputBudget(min_samples=10)
+    rng = random.Random(3)
+
+    tokens = budgets.budget("generate", "button", "dark")
+    print(f"1. {'✅' if tokens == 2000 else '❌'} No history: fixed budget {tokens}")
+
+    for _ in range(50):
+        budgets.record("generate", "button", "dark", int(rng.gauss(300, 40)))
+        budgets.record("generate", "footer", "dark", int(rng.gauss(2600, 200)))
+    button = budgets.budget("generate", "button", "dark")
+    footer = budgets.budget("generate", "footer", "light")
+    print(f"2. {'✅' if 300 < button < 600 else '❌'} Learned button budget: {button}")
+    print(f"3. {'✅' if footer > 2600 else '❌'} Footer budget (theme fallback): {footer}")
+
+    budgets.record("generate", "footer", "dark", 3100, continuations=1)
+    stats = budgets.stats()
+    print(f"4. {'✅' if stats['truncated'] == 1 and stats['continuations'] == 1 else '❌'} "
+          f"Stats: {dict((k, v) for k, v in stats.items() if k != 'budgets')}")
+
+    messages = continuation_messages([{"role": "user", "content": "Make a footer"}], '{"html": "<foo')
+    print(f"5. {'✅' if messages[-2]['role'] == 'assistant' and len(messages) == 3 else '❌'} "
+          f"Continuation request has {len(messages)} messages")
+
+    print("\n✅ Output budgets working!")
@@ -0,0 +1,351 @@
+"""
+Generation Cache for FlexiUI AI Generator
+
+Stores generated UI components so repeated prompts are served without
+calling Groq again. The cache has two tiers:
+- Memory tier: bounded LRU with a TTL (fast, per process)
+- Disk tier: optional table in instance/flexiui.db (survives restarts),
+  bounded: every few writes expired rows are deleted, then the oldest
+  rows over the size limit
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Default location of the SQLite database (same file Flask-SQLAlchemy uses)
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "instance", "flexiui.db"
+)
+
+# Cache modes a request can ask for
+CACHE_USE = "use"          # read from and write to the cache (default)
+CACHE_BYPASS = "bypass"    # skip the cache completely
+CACHE_REFRESH = "refresh"  # skip reading, but store the fresh result
+CACHE_MODES = (CACHE_USE, CACHE_BYPASS, CACHE_REFRESH)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# ============================================
+# KEY HELPERS
+# ============================================
+
+def normalize_prompt(prompt):
+    """
+    Fold case, punctuation and whitespace so trivial variations share a key
+
+    Args:
+        prompt (str): Raw user prompt
+
+    Returns:
+        str: Normalized prompt
+    """
+    text = _PUNCTUATION_RE.sub(" ", prompt.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def make_cache_key(prompt, component_type, theme, model, temperature):
+    """
+    Build the cache key for a generation request
+
+    Args:
+        prompt (str): User's description
+        component_type (str): Resolved component type
+        theme (str): Theme picked by prompts.detect_theme
+        model (str): Model name used for generation
+        temperature (float): Sampling temperature
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    raw = json.dumps([
+        normalize_prompt(prompt),
+        component_type,
+        theme,
+        model,
+        round(float(temperature), 3)
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ============================================
+# GENERATION CACHE
+# ============================================
+
+class GenerationCache:
+    """
+    Two-tier cache (memory LRU + optional SQLite) for generated code
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, db_path=None, max_disk_entries=10000,
+                 prune_every=100):
+        """
+        Args:
+            max_entries (int): Maximum entries kept in memory
+            ttl_seconds (float): Entry lifetime in seconds (0 = never expire)
+            db_path (str): SQLite file for the disk tier (None = memory only)
+            max_disk_entries (int): Rows kept in the disk tier (0 = no limit);
+                                    it can exceed this by up to prune_every
+            prune_every (int): Disk writes between two prunes
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.prune_every = prune_every
+
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._db_ready = False
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a cache configured from environment variables
+
+        FLEXIUI_CACHE_SIZE  - memory entries (default 256)
+        FLEXIUI_CACHE_TTL   - seconds (default 3600)
+        FLEXIUI_CACHE_DISK  - "0" disables the SQLite tier
+        FLEXIUI_CACHE_DB    - SQLite file (default instance/flexiui.db)
+        FLEXIUI_CACHE_DISK_SIZE - rows kept on disk (default 10000, 0 = no limit)
+        """
+        use_disk = os.getenv("FLEXIUI_CACHE_DISK", "1") != "0"
+        return cls(
+            max_entries=int(os.getenv("FLEXIUI_CACHE_SIZE", 256)),
+            ttl_seconds=float(os.getenv("FLEXIUI_CACHE_TTL", 3600)),
+            db_path=os.getenv("FLEXIUI_CACHE_DB", DEFAULT_DB_PATH) if use_disk else None,
+            max_disk_entries=int(os.getenv("FLEXIUI_CACHE_DISK_SIZE", 10000))
+        )
+
+    # ---------- public API ----------
+
+    def get(self, key):
+        """
+        Look up a cached result
+
+        Returns:
+            dict: Cached value, or None on a miss
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return dict(value)
+                del self._entries[key]
+
+        value = self._disk_get(key, now)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value, now)
+        return dict(value)
+
+    def set(self, key, value):
+        """
+        Store a result in both tiers
+
+        Args:
+            key (str): Key from make_cache_key
+            value (dict): Generated code (html, css, js)
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, dict(value), now)
+        self._disk_set(key, value, now)
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path and self._ensure_table():
+            with self._connect() as conn:
+                conn.execute("DELETE FROM generation_cache")
+
+    def stats(self):
+        """
+        Cache counters for monitoring
+
+        Returns:
+            dict: hits, misses, hit rate and tier sizes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_disk_entries": self.max_disk_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": bool(self.db_path)
+            }
+
+    # ---------- memory tier ----------
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key, value, stored_at):
+        # Caller must hold self._lock
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ---------- disk tier ----------
+
+    @contextmanager
+    def _connect(self):
+        # One connection per thread, reopened in a forked child (the parent's
+        # isn't ours to use); commit on success, roll back on error
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=5)
+            self._local.pid = os.getpid()
+        with conn:
+            yield conn
+
+    def _ensure_table(self):
+        if self._db_ready:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS generation_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        payload TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_generation_cache_created "
+                    "ON generation_cache (created_at)"
+                )
+            self._db_ready = True
+        except sqlite3.Error as e:
+            print(f"Cache disk tier disabled: {str(e)}")
+            self.db_path = None
+        return self._db_ready
+
+    def _disk_get(self, key, now):
+        if not self.db_path or not self._ensure_table():
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload, created_at FROM generation_cache WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if self._expired(row[1], now):
+                    conn.execute("DELETE FROM generation_cache WHERE cache_key = ?", (key,))
+                    return None
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def _disk_set(self, key, value, now):
+        if not self.db_path or not self._ensure_table():
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % self.prune_every == 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO generation_cache (cache_key, payload, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now)
+                )
+                if prune:
+                    self._prune(conn, now)
+        except sqlite3.Error as e:
+            print(f"Cache write failed: {str(e)}")
+
+    def _prune(self, conn, now):
+        """Delete expired rows, then the oldest ones over max_disk_entries"""
+        if self.ttl_seconds > 0:
+            conn.execute(
+                "DELETE FROM generation_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        if self.max_disk_entries > 0:
+            conn.execute(
+                "DELETE FROM generation_cache WHERE created_at <= ("
+                "SELECT created_at FROM generation_cache ORDER BY created_at DESC "
+                "LIMIT 1 OFFSET ?)",
+                (self.max_disk_entries,)
+            )
+
+
+# Shared cache used by ai_service
+generation_cache = GenerationCache.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Generation Cache...\n")
+
+    cache = GenerationCache(max_entries=2, ttl_seconds=60)
+
+    key_a = make_cache_key("Create a DARK navbar, with logo!", "navbar", "dark", "m", 0.8)
+    key_b = make_cache_key("create a dark navbar with logo", "navbar", "dark", "m", 0.8)
+    print(f"1. Normalized keys match: {key_a == key_b}")
+
+    cache.set(key_a, {"html": "<nav></nav>", "css": "", "js": ""})
+    print(f"2. Hit after set: {cache.get(key_b) is not None}")
+
+    cache.set("k2", {"html": "2"})
+    cache.set("k3", {"html": "3"})
+    print(f"3. LRU evicted oldest: {cache.get(key_a) is None}")
+
+    print(f"4. Stats: {cache.stats()}")
+
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "cache.db")
+    disk = GenerationCache(max_entries=2, ttl_seconds=60, db_path=path, max_disk_entries=5,
+                           prune_every=10)
+    for n in range(50):
+        disk.set(f"unique-{n}", {"html": str(n)})
+    with disk._connect() as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0]
+        conn.execute("UPDATE generation_cache SET created_at = created_at - 120 WHERE cache_key = 'unique-49'")
+    disk.set("unique-50", {"html": "50"})
+    for n in range(9):
+        disk.set("unique-50", {"html": "50"})
+    with disk._connect() as conn:
+        expired = conn.execute(
+            "SELECT COUNT(*) FROM generation_cache WHERE cache_key = 'unique-49'"
+        ).fetchone()[0]
+    ok = rows <= 5 + disk.prune_every and not expired and disk.get("unique-48") is not None
+    print(f"5. {'✅' if ok else '❌'} Disk tier bounded ({rows} rows for 50 keys), expired rows pruned")
+    print("\n✅ Generation cache working!")
@@ -0,0 +1,485 @@
+"""
+Response Compression and Conditional GETs for FlexiUI
+
+Generated components are 20-50 KB of JSON, so responses are compressed
+when the client accepts it:
+
+- Accept-Encoding is negotiated between br (when the optional brotli
+  package is installed) and gzip, for bodies of at least min_bytes
+- encoded bodies are remembered by ETag in a bounded LRU, so a body that
+  goes out again (the same project, the same listing page) is compressed
+  once per process
+- a generation's code is deflated on its own, once, into a byte-aligned
+  segment that is spliced into every gzip response carrying that code
+  (see gzip_splice()). /api/generate-ui bodies differ per request
+  (project_id, prompt, routing), but on a cache hit only those few bytes
+  are compressed; the code costs a CRC. Generation responses prefer gzip
+  over br for that reason.
+
+GET responses carry a strong ETag (a content hash, see make_etag()), with
+the encoding appended for compressed variants ("<hash>-gzip"), and a
+matching If-None-Match is answered with 304 Not Modified. Routes that can
+build the ETag without the body (projects: from the code blob hashes) check
+it before loading anything.
+
+Configured with FLEXIUI_COMPRESS_* environment variables (see
+ResponseCompressor.from_env).
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only without it
+    brotli = None
+
+# Preferred first when the client weighs them equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# gzip member header: deflate, no name/mtime, unknown OS
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+# An empty final deflate block, closing a spliced stream
+_FINAL_BLOCK = zlib.compressobj(6, zlib.DEFLATED, -15).flush()
+
+_COMPACT = (",", ":")
+
+# ============================================
+# NEGOTIATION AND ETAGS
+# ============================================
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header
+
+    Args:
+        header (str): e.g. "gzip, deflate, br;q=0.9" (None = nothing accepted)
+
+    Returns:
+        dict: Lower-case coding -> q value
+    """
+    accepted = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, encodings=ENCODINGS):
+    """
+    Pick the response encoding
+
+    Args:
+        header (str): Request's Accept-Encoding
+        encodings (tuple): Codings the server can produce, preferred first
+
+    Returns:
+        str: Chosen coding, or None to send the body as is
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in encodings:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def make_etag(*parts):
+    """
+    Strong ETag from content
+
+    Args:
+        *parts (bytes | str): The body, or values that determine it
+
+    Returns:
+        str: Quoted ETag, e.g. '"3f2a..."'
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def variant_etag(etag, encoding):
+    """ETag of the `encoding` variant of a body (the identity one is `etag`)"""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def matching_etag(if_none_match, etag):
+    """
+    The If-None-Match tag naming this body (or any of its encoded variants)
+
+    Uses the weak comparison RFC 9110 asks for with If-None-Match.
+
+    Returns:
+        str: The matching tag as the client sent it (what a 304 repeats),
+             or None
+    """
+    if not if_none_match or not etag:
+        return None
+    base = etag.strip('"')
+    for sent in if_none_match.split(","):
+        sent = sent.strip()
+        if sent == "*":
+            return etag
+        tag = (sent[2:] if sent.startswith("W/") else sent).strip('"')
+        for encoding in ("br", "gzip"):
+            if tag.endswith(f"-{encoding}"):
+                tag = tag[:-len(encoding) - 1]
+        if tag == base:
+            return sent
+    return None
+
+# ============================================
+# ENCODERS
+# ============================================
+
+def gzip_bytes(body, level=6):
+    """gzip one body (deterministic: no timestamp in the header)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def deflate_segment(data, level=6):
+    """
+    Raw deflate of `data` that ends on a byte boundary and refers to
+    nothing before it (Z_FULL_FLUSH), so it can be spliced anywhere in a
+    deflate stream
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def gzip_splice(pieces, level=6):
+    """
+    One gzip member from pieces, some of them already deflated
+
+    Args:
+        pieces (list): (raw bytes, deflate_segment(raw) or None) pairs;
+                       pieces without a segment are deflated here
+        level (int): zlib level for those
+
+    Returns:
+        bytes: A gzip body equal to gzip of b"".join(raw pieces)
+    """
+    crc = 0
+    size = 0
+    out = [_GZIP_HEADER]
+    for raw, segment in pieces:
+        crc = zlib.crc32(raw, crc)
+        size += len(raw)
+        out.append(segment if segment is not None else deflate_segment(raw, level))
+    out.append(_FINAL_BLOCK)
+    out.append(struct.pack("<II", crc, size & 0xFFFFFFFF))
+    return b"".join(out)
+
+# ============================================
+# RESPONSE COMPRESSOR
+# ============================================
+
+class ResponseCompressor:
+    """
+    Negotiates, encodes and remembers compressed response bodies
+    """
+
+    def __init__(self, enabled=True, min_bytes=1024, gzip_level=6, brotli_quality=5,
+                 memo_bytes=32 * 1024 * 1024):
+        """
+        Args:
+            enabled (bool): False sends every body as is (ETags and 304s stay)
+            min_bytes (int): Smaller bodies aren't worth compressing
+            gzip_level (int): zlib level 1-9
+            brotli_quality (int): brotli quality 0-11
+            memo_bytes (int): Budget of the encoded body LRU (0 = no memo)
+        """
+        self.enabled = enabled
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.memo_bytes = memo_bytes
+
+        self._memo = OrderedDict()  # key -> encoded bytes
+        self._memo_size = 0
+        self._lock = threading.Lock()
+
+        self.responses = 0
+        self.encoded = {}
+        self.memo_hits = 0
+        self.spliced = 0
+        self.not_modified_count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.encode_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_COMPRESS               - "0" turns compression off
+        FLEXIUI_COMPRESS_MIN_BYTES     - smallest body compressed (default 1024)
+        FLEXIUI_COMPRESS_GZIP_LEVEL    - zlib level (default 6)
+        FLEXIUI_COMPRESS_BR_QUALITY    - brotli quality (default 5)
+        FLEXIUI_COMPRESS_MEMO_MB       - encoded body LRU budget (default 32)
+        """
+        return cls(
+            enabled=os.getenv("FLEXIUI_COMPRESS", "1") != "0",
+            min_bytes=int(os.getenv("FLEXIUI_COMPRESS_MIN_BYTES", 1024)),
+            gzip_level=int(os.getenv("FLEXIUI_COMPRESS_GZIP_LEVEL", 6)),
+            brotli_quality=int(os.getenv("FLEXIUI_COMPRESS_BR_QUALITY", 5)),
+            memo_bytes=int(float(os.getenv("FLEXIUI_COMPRESS_MEMO_MB", 32)) * 1024 * 1024)
+        )
+
+    # ---------- public API ----------
+
+    def not_modified(self, if_none_match, etag):
+        """
+        Check a conditional GET (counted in the stats when it matches)
+
+        Args:
+            if_none_match (str): Request's If-None-Match header
+            etag (str): Current ETag of the resource
+
+        Returns:
+            str: ETag for a 304 sent instead of the body, or None to send it
+        """
+        matched = matching_etag(if_none_match, etag)
+        if matched is not None:
+            with self._lock:
+                self.not_modified_count += 1
+        return matched
+
+    def encode(self, body, accept_encoding, etag=None):
+        """
+        Compress a body for one request
+
+        Args:
+            body (bytes): Identity body
+            accept_encoding (str): Request's Accept-Encoding
+            etag (str): Body's ETag; remembers the encoded body under it
+
+        Returns:
+            tuple: (body to send, coding or None)
+        """
+        encoding = self.choose(body, accept_encoding)
+        if encoding is None:
+            return body, None
+
+        started = time.perf_counter()
+        key = (etag, encoding) if etag else None
+        encoded = self._recall(key)
+        if encoded is None:
+            encoded = self._compress(body, encoding)
+            self._remember(key, encoded)
+        self._count(encoding, len(body), len(encoded), time.perf_counter() - started)
+        return encoded, encoding
+
+    def encode_generation(self, payload, accept_encoding):
+        """
+        JSON body of a /api/generate-ui payload, the code spliced in from its
+        remembered gzip segment when gzip is accepted
+
+        Args:
+            payload (dict): Response payload; payload["code"] is the generated code
+            accept_encoding (str): Request's Accept-Encoding
+
+        Returns:
+            tuple: (body to send, coding or None)
+        """
+        rest = dict(payload)
+        code = json.dumps(rest.pop("code"), separators=_COMPACT, sort_keys=True).encode("utf-8")
+        tail = json.dumps(rest, separators=_COMPACT, sort_keys=True).encode("utf-8")
+        pieces = [b'{"code":', code, b"," + tail[1:] if rest else b"}"]
+        size = sum(len(piece) for piece in pieces)
+
+        if (not self.enabled or size < self.min_bytes
+                or negotiate(accept_encoding, ("gzip",)) is None):
+            return self.encode(b"".join(pieces), accept_encoding)
+
+        started = time.perf_counter()
+        key = ("segment", hashlib.sha256(code).digest())
+        segment = self._recall(key)
+        if segment is None:
+            segment = deflate_segment(code, self.gzip_level)
+            self._remember(key, segment)
+        else:
+            with self._lock:
+                self.spliced += 1
+        encoded = gzip_splice([(pieces[0], None), (code, segment), (pieces[2], None)], self.gzip_level)
+        self._count("gzip", size, len(encoded), time.perf_counter() - started)
+        return encoded, "gzip"
+
+    def choose(self, body, accept_encoding):
+        """The coding encode() would use for this body (None = as is)"""
+        if not self.enabled or len(body) < self.min_bytes:
+            return None
+        return negotiate(accept_encoding)
+
+    def headers(self, encoding, etag=None):
+        """
+        Response headers for an encode() result
+
+        Returns:
+            list: (name, value) pairs - Content-Encoding, Vary and the
+                  variant's ETag, as applicable
+        """
+        headers = [("Vary", "Accept-Encoding")]
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+        if etag:
+            headers.append(("ETag", variant_etag(etag, encoding)))
+        return headers
+
+    def clear(self):
+        """Forget every remembered encoded body and segment"""
+        with self._lock:
+            self._memo.clear()
+            self._memo_size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "encodings": list(ENCODINGS),
+                "min_bytes": self.min_bytes,
+                "responses": self.responses,
+                "encoded": dict(self.encoded),
+                "memo_hits": self.memo_hits,
+                "spliced": self.spliced,
+                "not_modified": self.not_modified_count,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+                "encode_ms_per_response": round(self.encode_seconds / self.responses * 1000, 3)
+                                          if self.responses else None,
+                "memo_entries": len(self._memo),
+                "memo_bytes": self._memo_size
+            }
+
+    # ---------- internals ----------
+
+    def _compress(self, body, encoding):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality, mode=brotli.MODE_TEXT)
+        return gzip_bytes(body, self.gzip_level)
+
+    def _count(self, encoding, size_in, size_out, seconds):
+        with self._lock:
+            self.responses += 1
+            self.encoded[encoding] = self.encoded.get(encoding, 0) + 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+            self.encode_seconds += seconds
+
+    def _recall(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            encoded = self._memo.get(key)
+            if encoded is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+            return encoded
+
+    def _remember(self, key, encoded):
+        if key is None or len(encoded) > self.memo_bytes:
+            return
+        with self._lock:
+            previous = self._memo.pop(key, None)
+            if previous is not None:
+                self._memo_size -= len(previous)
+            self._memo[key] = encoded
+            self._memo_size += len(encoded)
+            while self._memo_size > self.memo_bytes:
+                _, dropped = self._memo.popitem(last=False)
+                self._memo_size -= len(dropped)
+
+
+# Shared compressor used by app.py and asgi_app.py
+response_compressor = ResponseCompressor.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    import gzip
+
+    print("Testing Response Compression...\n")
+
+    print(f"1. {'✅' if negotiate('gzip, deflate, br;q=0.5', ('br', 'gzip')) == 'gzip' else '❌'} "
+          f"q values respected; available: {ENCODINGS}")
+    print(f"2. {'✅' if negotiate('identity') is None and negotiate('*;q=0') is None else '❌'} "
+          f"Nothing acceptable -> identity")
+
+    import random
+
+    # Varied markup (repeating one snippet would make gzip look free)
+    rng = random.Random(7)
+    words = ["card", "plan", "feature", "price", "button", "grid", "title", "badge", "icon", "muted"]
+    code = {
+        "html": "".join(f'<div class="{rng.choice(words)}-{rng.randint(0, 99)}"><p>'
+                        f'{" ".join(rng.choice(words) for _ in range(6))}</p></div>\n' for _ in range(500)),
+        "css": "".join(f".{rng.choice(words)}-{i} {{ margin: {rng.randint(0, 40)}px; "
+                       f"color: #{rng.randint(0, 0xFFFFFF):06x}; }}\n" for i in range(400)),
+        "js": ""
+    }
+    compressor = ResponseCompressor(min_bytes=512)
+    bodies = []
+    for project_id in (1, 2):
+        payload = {"success": True, "code": code, "prompt": "A pricing card ✨",
+                   "project_id": project_id, "routing": {"cached": project_id > 1}}
+        body, encoding = compressor.encode_generation(payload, "gzip, br")
+        bodies.append(gzip.decompress(body))
+        ok = encoding == "gzip" and json.loads(bodies[-1]) == payload
+        print(f"{2 + project_id}. {'✅' if ok else '❌'} Spliced generation body "
+              f"{len(bodies[-1])} -> {len(body)} bytes decodes to the payload")
+    stats = compressor.stats()
+    print(f"5. {'✅' if stats['spliced'] == 1 else '❌'} Second response reused the code segment")
+
+    raw = json.dumps({"project": code}).encode()
+    etag = make_etag(raw)
+    first, encoding = compressor.encode(raw, "gzip", etag)
+    again, _ = compressor.encode(raw, "gzip", etag)
+    print(f"6. {'✅' if first is again and gzip.decompress(first) == raw else '❌'} "
+          f"Encoded body remembered by ETag ({compressor.stats()['memo_hits']} memo hits)")
+
+    tag = variant_etag(etag, "gzip")
+    checks = [matching_etag(tag, etag) == tag, matching_etag(f'W/{etag}', etag) == f'W/{etag}',
+              matching_etag('"x", *', etag) == etag, matching_etag('"other"', etag) is None]
+    print(f"7. {'✅' if all(checks) else '❌'} If-None-Match matching ({tag})")
+
+    small, encoding = compressor.encode(b'{"ok":true}', "gzip")
+    print(f"8. {'✅' if encoding is None else '❌'} Small bodies go out as is")
+
+    calls = 200
+    started = time.perf_counter()
+    for _ in range(calls):
+        gzip_bytes(json.dumps(payload, separators=_COMPACT, sort_keys=True).encode("utf-8"))
+    full = (time.perf_counter() - started) / calls * 1e6
+    started = time.perf_counter()
+    for _ in range(calls):
+        compressor.encode_generation(payload, "gzip")
+    spliced = (time.perf_counter() - started) / calls * 1e6
+    print(f"9. {'✅' if spliced < full else '❌'} Cache hit body: serialize + gzip {full:.0f} µs, "
+          f"spliced {spliced:.0f} µs")
+
+    print("\n✅ Response compression working!")
@@ -0,0 +1,387 @@
+"""
+Fallback Code Extractor for FlexiUI
+
+parse_code_from_response handles the happy path (one clean JSON object).
+Everything else ends up here:
+
+- JSON wrapped in prose or a ```json fence, or with trailing commas
+- JSON cut off at max_tokens: repaired by closing the unterminated string
+  and the open objects, so the sections already written are kept and the
+  one being written is salvaged
+- markdown answers with ```html / ```css / ```js fences (closed or not)
+- bare code with no fences at all (inline <style>/<script> are split out)
+
+The scanners jump between the characters that matter with regex searches
+on the original string; nothing is split into lines or lower-cased.
+
+Every result says what couldn't be recovered: "partial" sections were cut
+off mid-way, "missing" ones never arrived. Callers can re-request just
+those instead of the whole component.
+"""
+
+import re
+import json
+
+from stream_parser import SECTIONS, _TRAILING_ESCAPE_RE
+
+# Characters that matter outside JSON strings
+_STRUCTURE_RE = re.compile(r'["{}\[\],:]')
+
+# A complete JSON string (possessive, so a cut-off one fails fast)
+_JSON_STRING_RE = re.compile(r'"[^"\\]*+(?:\\.[^"\\]*+)*+"', re.DOTALL)
+
+# Start of a JSON object with a string key
+_JSON_START_RE = re.compile(r'\{\s*"')
+
+# Fence info strings -> section
+FENCE_LANGUAGES = {
+    "html": "html", "htm": "html", "xml": "html", "svg": "html",
+    "css": "css", "scss": "css",
+    "js": "js", "javascript": "js", "jsx": "js", "mjs": "js",
+}
+
+# Inline <style>/<script> block; an unclosed one runs to the end of the text
+_INLINE_RE = re.compile(r"<(?i:(style|script))\b[^>]*>(.*?)(</(?i:\1)\s*>|$)", re.DOTALL)
+_TAG_RE = re.compile(r"<[a-zA-Z!][^>]*>")
+_CSS_RULE_RE = re.compile(r"[^{};<>]+\{[^{}]*:[^{}]*\}")
+_JS_HINT_RE = re.compile(r"\b(?:function|const|let|var|document\.|addEventListener|=>)")
+
+_decoder = json.JSONDecoder(strict=False)
+
+# ============================================
+# JSON REPAIR
+# ============================================
+
+def repair_json(text, start=0):
+    """
+    Make a (possibly cut-off) JSON object parseable
+
+    Scans once from the opening brace, tracking strings, nesting and
+    top-level keys. Trailing commas are dropped. If the text ends early,
+    an unterminated string is closed (minus any dangling escape), a key
+    left without a value is removed, and open objects/arrays are closed.
+
+    Args:
+        text (str): Response text
+        start (int): Index of the opening brace
+
+    Returns:
+        tuple: (repaired JSON string, key of the top-level string value that
+               was cut off or None, True if the text ended early)
+    """
+    pieces = []
+    piece_start = start
+    stack = []             # open containers: [char, expecting_key]
+    pos = start
+    key = None             # last top-level key
+    comma = None           # position of a comma not yet followed by a value
+    safe = None            # (position, stack copy, key) after the last complete value
+
+    while True:
+        match = _STRUCTURE_RE.search(text, pos)
+        if match is None:
+            break
+        index = match.start()
+        char = text[index]
+
+        if char == '"':
+            string = _JSON_STRING_RE.match(text, index)
+            cursor = string.end() if string else None
+
+            top = stack[-1] if stack else None
+            is_key = top is not None and top[0] == "{" and top[1]
+            if cursor is None:
+                # Cut off inside this string
+                if is_key or not stack:
+                    break
+                tail = _TRAILING_ESCAPE_RE.sub("", text[index:])
+                pieces.append(text[piece_start:index])
+                pieces.append(tail + '"')
+                for container, _ in reversed(stack):
+                    pieces.append("}" if container == "{" else "]")
+                cut_key = key if len(stack) == 1 else None
+                return "".join(pieces), cut_key, True
+
+            if is_key:
+                if len(stack) == 1:
+                    key = _decoder.decode(text[index:cursor])
+            else:
+                safe = (cursor, [list(item) for item in stack], key)
+            comma = None
+            pos = cursor
+            continue
+
+        if char in "{[":
+            stack.append([char, char == "{"])
+            comma = None
+            safe = (index + 1, [list(item) for item in stack], key)
+
+        elif char in "}]":
+            if comma is not None and not text[comma + 1:index].strip():
+                pieces.append(text[piece_start:comma])
+                piece_start = comma + 1
+            comma = None
+            if stack:
+                stack.pop()
+            if not stack:
+                pieces.append(text[piece_start:index + 1])
+                return "".join(pieces), None, False
+            safe = (index + 1, [list(item) for item in stack], key)
+
+        elif char == ",":
+            if stack:
+                if comma is None and text[(safe[0] if safe else index):index].strip():
+                    # A literal (number, true, ...) just ended
+                    safe = (index, [list(item) for item in stack], key)
+                stack[-1][1] = stack[-1][0] == "{"
+            comma = index
+
+        elif char == ":":
+            if stack:
+                stack[-1][1] = False
+
+        pos = index + 1
+
+    # Ended outside a string, or inside a key: cut back to the last complete value
+    if safe is None:
+        return "{}", None, True
+    end, open_containers, _ = safe
+    pieces.append(text[piece_start:end])
+    for container, _ in reversed(open_containers):
+        pieces.append("}" if container == "{" else "]")
+    return "".join(pieces), None, True
+
+
+def _sections_from_json(data, cut_key, truncated):
+    code = {}
+    for name in SECTIONS:
+        value = data.get(name)
+        if isinstance(value, str):
+            code[name] = value
+    partial = [cut_key] if cut_key in code else []
+    missing = [name for name in SECTIONS if name not in code] if truncated else []
+    return code, partial, missing
+
+
+def extract_json(text, start):
+    """
+    Sections from a JSON object starting at `start`
+
+    Returns:
+        tuple: (code, partial, missing, method) or None if it isn't a JSON
+               object with any of html/css/js
+    """
+    try:
+        data, _ = _decoder.raw_decode(text, start)
+        cut_key, truncated, method = None, False, "json"
+    except ValueError:
+        repaired, cut_key, truncated = repair_json(text, start)
+        try:
+            data = _decoder.decode(repaired)
+        except ValueError:
+            return None
+        method = "json_repaired"
+    if not isinstance(data, dict) or not any(name in data for name in SECTIONS):
+        return None
+    code, partial, missing = _sections_from_json(data, cut_key, truncated)
+    return code, partial, missing, method
+
+# ============================================
+# MARKDOWN FENCES AND BARE CODE
+# ============================================
+
+def guess_section(code):
+    """Which section a piece of unlabeled code belongs to"""
+    stripped = code.lstrip()
+    if stripped.startswith("<"):
+        return "html"
+    if _CSS_RULE_RE.match(stripped) and not _JS_HINT_RE.search(stripped[:200]):
+        return "css"
+    if _JS_HINT_RE.search(stripped):
+        return "js"
+    return None
+
+
+def extract_fenced(text):
+    """
+    Sections from ``` fenced blocks (several blocks of one kind are joined)
+
+    Returns:
+        tuple: (code, partial, missing) or None if there are no fences
+    """
+    found = {}
+    partial = []
+    truncated = False
+    pos = text.find("```")
+    if pos == -1:
+        return None
+
+    while pos != -1:
+        info_end = text.find("\n", pos + 3)
+        if info_end == -1:
+            truncated = True
+            break
+        language = text[pos + 3:info_end].strip().split(" ", 1)[0].lower()
+        body_start = info_end + 1
+        close = text.find("```", body_start)
+        # A closing fence has to start a line
+        while close != -1 and close > body_start and text[close - 1] != "\n":
+            close = text.find("```", close + 3)
+
+        body = text[body_start:close if close != -1 else len(text)]
+        section = FENCE_LANGUAGES.get(language) or (guess_section(body) if language in ("", "text") else None)
+        if language == "json":
+            extracted = extract_json(body, body.find("{")) if "{" in body else None
+            if extracted:
+                code, json_partial, _, _ = extracted
+                for name, value in code.items():
+                    found.setdefault(name, []).append(value)
+                partial.extend(json_partial)
+        elif section:
+            found.setdefault(section, []).append(body.rstrip("\n"))
+            if close == -1:
+                partial.append(section)
+
+        if close == -1:
+            truncated = True
+            break
+        pos = text.find("```", close + 3)
+
+    if not found:
+        return None
+    code = {name: "\n".join(parts) for name, parts in found.items()}
+    missing = [name for name in SECTIONS if name not in code] if truncated else []
+    return code, partial, missing
+
+
+def extract_bare(text):
+    """
+    Sections from code with no fences: markup (with inline <style> and
+    <script> split out), or a bare stylesheet / script
+
+    Returns:
+        tuple: (sections found (possibly none), partial sections)
+    """
+    first_tag = _TAG_RE.search(text)
+    if first_tag is not None:
+        markup = []
+        found = {"css": [], "js": []}
+        cut_off = []
+        pos = first_tag.start()
+        for block in _INLINE_RE.finditer(text, pos):
+            section = "css" if block.group(1).lower() == "style" else "js"
+            markup.append(text[pos:block.start()])
+            found[section].append(block.group(2).strip())
+            if not block.group(3):
+                cut_off.append(section)
+            pos = block.end()
+        # Prose after the last tag is dropped
+        markup.append(text[pos:text.rfind(">", pos) + 1] if not cut_off else "")
+
+        code = {"html": "".join(markup).strip()}
+        for section, blocks in found.items():
+            if blocks:
+                code[section] = "\n".join(blocks)
+        return code, cut_off
+
+    section = guess_section(text)
+    return ({section: text.strip()} if section else {}), []
+
+# ============================================
+# ENTRY POINT
+# ============================================
+
+def extract_code(text):
+    """
+    Recover html/css/js from a response that isn't one clean JSON object
+
+    Args:
+        text (str): Raw model response
+
+    Returns:
+        tuple: (code dict with html, css and js, report dict with
+               "method" ("json", "json_repaired", "fenced", "bare" or "none"),
+               "partial" and "missing" section lists)
+    """
+    text = text or ""
+    result = None
+    method = "none"
+
+    # JSON comes first unless a code fence opens before it
+    json_start = _JSON_START_RE.search(text)
+    fence = text.find("```")
+    fence_is_json = fence != -1 and text.startswith("json", fence + 3)
+    if json_start is not None and (fence == -1 or fence_is_json or json_start.start() < fence):
+        extracted = extract_json(text, json_start.start())
+        if extracted is not None:
+            code, partial, missing, method = extracted
+            result = (code, partial, missing)
+
+    if result is None and fence != -1:
+        result = extract_fenced(text)
+        method = "fenced" if result else method
+
+    if result is None:
+        code, partial = extract_bare(text)
+        if code:
+            result = (code, partial, [])
+            method = "bare"
+
+    if result is None:
+        result = ({}, [], list(SECTIONS))
+
+    code, partial, missing = result
+    return (
+        {name: code.get(name, "") for name in SECTIONS},
+        {"method": method, "partial": partial, "missing": missing}
+    )
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Code Extractor...\n")
+
+    sample = {
+        "html": '<nav class="navbar">\n  <a href="#">Logo "Brand"</a>\n</nav>',
+        "css": ".navbar { display: flex; content: \"\\2014\"; }",
+        "js": "document.querySelector('.navbar').classList.add('ready');"
+    }
+    full = json.dumps(sample, indent=2)
+
+    cases = [
+        ("prose around JSON", f"Sure! Here it is:\n```json\n{full}\n```\nEnjoy.",
+         lambda code, report: code == sample and report["method"] == "json"),
+        ("trailing comma", full[:-1].rstrip() + ",\n}",
+         lambda code, report: code == sample and report["method"] == "json_repaired"),
+        ("cut off in css", full[:full.index("display") + 10],
+         lambda code, report: code["html"] == sample["html"] and code["css"].startswith(".navbar { disp")
+         and report["partial"] == ["css"] and report["missing"] == ["js"]),
+        ("cut off in an escape", full[:full.index("\\\\2014") + 1],
+         lambda code, report: code["css"].endswith('content: "') and report["partial"] == ["css"]),
+        ("cut off after a key", full[:full.index('"css"') + 6],
+         lambda code, report: code["html"] == sample["html"] and report["missing"] == ["css", "js"]),
+        ("markdown fences", "Here you go:\n```html\n<nav></nav>\n```\n\n```CSS\nnav { color: red; }\n```\n"
+                            "```javascript\nconst x = 1;\n```",
+         lambda code, report: code == {"html": "<nav></nav>", "css": "nav { color: red; }", "js": "const x = 1;"}
+         and report["method"] == "fenced"),
+        ("unterminated fence", "```html\n<nav></nav>\n```\n```css\nnav { color:",
+         lambda code, report: code["css"] == "nav { color:" and report["partial"] == ["css"]
+         and report["missing"] == ["js"]),
+        ("bare markup", "Here is the code:\n<div class=\"a\">Hi</div>\n<style>.a { color: red; }</style>\n"
+                        "<script>console.log(1)</script>",
+         lambda code, report: code == {"html": '<div class="a">Hi</div>', "css": ".a { color: red; }",
+                                       "js": "console.log(1)"} and report["method"] == "bare"),
+        ("nothing usable", "I can't help with that.",
+         lambda code, report: report["method"] == "none" and report["missing"] == list(SECTIONS)),
+    ]
+
+    all_ok = True
+    for n, (name, text, check) in enumerate(cases, 1):
+        code, report = extract_code(text)
+        ok = check(code, report)
+        all_ok &= ok
+        print(f"{n}. {'✅' if ok else '❌'} {name}: {report}")
+
+    print("\n✅ Code extractor working!" if all_ok else "\n❌ Code extractor checks failed")
@@ -0,0 +1,579 @@
+"""
+Local Fake Groq Upstream for FlexiUI
+
+Stands in for Groq's chat completions API (POST /openai/v1/chat/completions)
+so the app can be load-tested and developed without spending quota. Point
+the app at it with:
+
+    GROQ_BASE_URL=http://127.0.0.1:8765
+
+Answers have the same shape as Groq's (JSON, or SSE chunks when
+"stream": true) and depend on the request: UI generation prompts get a
+{"html", "css", "js"} JSON answer, patch prompts an {"edits": []} answer,
+chat a plain-text reply. What it simulates:
+
+- latency: time to first token from a fixed, uniform or lognormal
+  distribution, then tokens at a fixed rate (max_tokens cuts the answer
+  off with finish_reason "length", like the real API)
+- errors: a share of requests fails with 429 (with retry-after), 500 or 503
+- quota: requests and tokens per minute, refilled continuously; a request
+  is charged prompt + max_tokens up front and the unused part of
+  max_tokens is given back once the answer is known; requests over the
+  quota get a 429 with retry-after, like Groq's rate limits
+- malformed answers: a share of JSON answers is cut off, wrapped in prose
+  and markdown fences, or has a trailing comma
+- model speed: per-model speed factors (a factor of 4 means a quarter of
+  the time to first token and four times the token rate)
+- answer sizes: per component type (matched in the first line of the
+  prompt) with a lognormal spread; continuation requests (see budget.py)
+  get the rest of the answer that was cut off
+
+Configured with FLEXIUI_FAKE_* environment variables (see
+FakeUpstreamConfig.from_env). GET /stats returns request counters.
+
+Run with:
+    python fake_groq.py [port]      default 8765
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import zlib
+import asyncio
+import threading
+from collections import Counter
+
+from history import estimate_tokens
+from budget import CONTINUE_PROMPT
+
+DEFAULT_PORT = 8765
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+# Streamed tokens are flushed at most this often (one SSE chunk each)
+STREAM_INTERVAL = 0.02
+
+ERROR_BODIES = {
+    429: ("rate_limit_exceeded", "Rate limit reached for model. Please try again in 1s."),
+    500: ("internal_server_error", "Internal server error"),
+    503: ("service_unavailable", "Service Unavailable"),
+}
+
+MALFORMED_KINDS = ("truncated", "prose", "trailing_comma")
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+def parse_named_values(spec):
+    """
+    Parse "name=value" pairs
+
+    Args:
+        spec (str): e.g. "llama-3.1-8b-instant=4,other-model=0.5"
+
+    Returns:
+        dict: name -> float
+    """
+    values = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        values[name.strip()] = float(value)
+    return values
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution
+
+    Args:
+        spec (str): "fixed:S", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA"
+                    (seconds)
+
+    Returns:
+        function: rng -> seconds
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(":") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class FakeUpstreamConfig:
+    """How the fake upstream behaves"""
+
+    def __init__(self, latency="fixed:0.3", tokens_per_s=250.0, response_tokens=600,
+                 error_rate=0.0, error_statuses=(429, 500, 503), malformed_rate=0.0, seed=None,
+                 model_speed=None, type_tokens=None, response_spread=0.0, rpm=0, tpm=0):
+        """
+        Args:
+            latency (str): Time-to-first-token distribution (see parse_latency)
+            tokens_per_s (float): Generation speed after the first token (0 = instant)
+            response_tokens (int): Length of a full UI answer
+            error_rate (float): Share of requests answered with an error status
+            error_statuses (tuple): Statuses injected errors are picked from
+            malformed_rate (float): Share of JSON answers that are malformed
+            seed (int): Random seed (None for a random run)
+            model_speed (dict): Speed factor per model name (others: 1)
+            type_tokens (dict): UI answer length per word in the prompt's first
+                                line, e.g. {"footer": 2600} (others: response_tokens)
+            response_spread (float): Lognormal sigma of UI answer lengths (0 = exact)
+            rpm (float): Requests per minute before 429s (0 = no quota)
+            tpm (float): Tokens per minute (prompt + max_tokens) before 429s (0 = no quota)
+        """
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.tokens_per_s = tokens_per_s
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.model_speed = dict(model_speed or {})
+        self.type_tokens = dict(type_tokens or {})
+        self.response_spread = response_spread
+        self.rpm = rpm
+        self.tpm = tpm
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_FAKE_LATENCY         - e.g. "lognormal:0.4:0.5" (default "fixed:0.3")
+        FLEXIUI_FAKE_TOKENS_PER_S    - tokens per second (default 250)
+        FLEXIUI_FAKE_RESPONSE_TOKENS - UI answer length (default 600)
+        FLEXIUI_FAKE_ERROR_RATE      - 0..1 (default 0)
+        FLEXIUI_FAKE_ERROR_STATUSES  - e.g. "429,503" (default "429,500,503")
+        FLEXIUI_FAKE_MALFORMED_RATE  - 0..1 (default 0)
+        FLEXIUI_FAKE_SEED            - random seed (default random)
+        FLEXIUI_FAKE_MODEL_SPEED     - e.g. "llama-3.1-8b-instant=4" (default none)
+        FLEXIUI_FAKE_TYPE_TOKENS     - e.g. "footer=2600,button=250" (default none)
+        FLEXIUI_FAKE_RESPONSE_SPREAD - lognormal sigma of UI answer lengths (default 0)
+        FLEXIUI_FAKE_RPM             - requests per minute quota (default 0 = none)
+        FLEXIUI_FAKE_TPM             - tokens per minute quota (default 0 = none)
+        """
+        seed = os.getenv("FLEXIUI_FAKE_SEED")
+        return cls(
+            latency=os.getenv("FLEXIUI_FAKE_LATENCY", "fixed:0.3"),
+            tokens_per_s=float(os.getenv("FLEXIUI_FAKE_TOKENS_PER_S", 250)),
+            response_tokens=int(os.getenv("FLEXIUI_FAKE_RESPONSE_TOKENS", 600)),
+            error_rate=float(os.getenv("FLEXIUI_FAKE_ERROR_RATE", 0)),
+            error_statuses=[int(status) for status in
+                            os.getenv("FLEXIUI_FAKE_ERROR_STATUSES", "429,500,503").split(",")],
+            malformed_rate=float(os.getenv("FLEXIUI_FAKE_MALFORMED_RATE", 0)),
+            seed=int(seed) if seed else None,
+            model_speed=parse_named_values(os.getenv("FLEXIUI_FAKE_MODEL_SPEED", "")),
+            type_tokens={name: int(tokens) for name, tokens in
+                         parse_named_values(os.getenv("FLEXIUI_FAKE_TYPE_TOKENS", "")).items()},
+            response_spread=float(os.getenv("FLEXIUI_FAKE_RESPONSE_SPREAD", 0)),
+            rpm=float(os.getenv("FLEXIUI_FAKE_RPM", 0)),
+            tpm=float(os.getenv("FLEXIUI_FAKE_TPM", 0))
+        )
+
+    def to_dict(self):
+        return {
+            "latency": self.latency,
+            "tokens_per_s": self.tokens_per_s,
+            "response_tokens": self.response_tokens,
+            "error_rate": self.error_rate,
+            "error_statuses": list(self.error_statuses),
+            "malformed_rate": self.malformed_rate,
+            "seed": self.seed,
+            "model_speed": self.model_speed,
+            "type_tokens": self.type_tokens,
+            "response_spread": self.response_spread,
+            "rpm": self.rpm,
+            "tpm": self.tpm
+        }
+
+    def ui_tokens(self, prompt):
+        """
+        Length of the UI answer to a prompt
+
+        Seeded by the prompt, so a continuation gets the same answer.
+        """
+        first_line = set(re.findall(r"\w+", prompt.strip().split("\n", 1)[0].lower()))
+        tokens = next((tokens for name, tokens in self.type_tokens.items() if name in first_line),
+                      self.response_tokens)
+        if self.response_spread:
+            rng = random.Random(zlib.crc32(prompt.encode()))
+            tokens = int(tokens * rng.lognormvariate(0, self.response_spread))
+        return tokens
+
+# ============================================
+# ANSWERS
+# ============================================
+
+def ui_answer(prompt, tokens):
+    """A {"html", "css", "js"} JSON answer of about `tokens` tokens"""
+    title = " ".join(prompt.split()[:8]).replace("<", "").replace(">", "")
+    filler = "Generated placeholder content for load testing. "
+    body = filler * max(1, (tokens * 4 - 300) // len(filler) // 2)
+    return json.dumps({
+        "html": f'<section class="fake-component">\n  <h2>{title}</h2>\n  <p>{body.strip()}</p>\n'
+                f'  <button class="fake-component__cta">Get started</button>\n</section>',
+        "css": ".fake-component { padding: 2rem; border-radius: 12px; }\n"
+               f".fake-component p {{ line-height: 1.6; }} /* {body.strip()} */\n"
+               ".fake-component__cta { padding: 0.75rem 1.5rem; }",
+        "js": ""
+    }, indent=2)
+
+
+def chat_answer(question):
+    return ("Happy to help! To build that in FlexiUI, describe the component in the "
+            "Generate UI panel and tweak it with follow-up requests. "
+            f"(You asked: {' '.join(question.split()[:20])})")
+
+
+def malform(content, kind):
+    """Break a JSON answer the way models do"""
+    if kind == "truncated":
+        return content[:max(1, len(content) * 3 // 5)]
+    if kind == "prose":
+        return f"Sure! Here is the component:\n\n```json\n{content}\n```\n\nLet me know if you want changes."
+    return content.rstrip().rstrip("}").rstrip() + ",\n}"
+
+
+def split_tokens(content):
+    """Split an answer into ~4-character tokens"""
+    return [content[i:i + 4] for i in range(0, len(content), 4)]
+
+# ============================================
+# SERVER
+# ============================================
+
+class FakeGroqServer:
+    """Keep-alive HTTP/1.1 server speaking the chat completions API"""
+
+    def __init__(self, config=None):
+        self.config = config or FakeUpstreamConfig.from_env()
+        self.rng = random.Random(self.config.seed)
+        self.counters = Counter()
+        self.started = time.time()
+        # Quota buckets: name -> [capacity, level, last refill]
+        self.quota = {name: [float(limit), float(limit), time.monotonic()]
+                      for name, limit in (("requests", self.config.rpm), ("tokens", self.config.tpm))
+                      if limit}
+
+    # ---------- request handling ----------
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if method == "POST" and path.split("?")[0] == COMPLETIONS_PATH:
+                    await self.completions(writer, body)
+                elif method == "GET" and path.split("?")[0] == "/stats":
+                    self.write_json(writer, 200, self.stats())
+                else:
+                    self.write_json(writer, 404, {"error": {"message": f"Unknown route {path}"}})
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def completions(self, writer, body):
+        config = self.config
+        rng = self.rng
+        self.counters["requests"] += 1
+        try:
+            request = json.loads(body)
+            messages = request["messages"]
+        except (ValueError, KeyError, TypeError):
+            self.counters["bad_requests"] += 1
+            self.write_json(writer, 400, {"error": {"message": "Invalid request body",
+                                                     "type": "invalid_request_error"}})
+            return
+
+        model = request.get("model", "fake")
+        self.counters[f"model:{model}"] += 1
+        speed = config.model_speed.get(model, 1.0)
+        first_token = config.sample_latency(rng) / speed
+        rate = config.tokens_per_s * speed
+
+        prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+        retry_after = self.take_quota(prompt_tokens + (request.get("max_tokens") or 0))
+        if retry_after is not None:
+            self.counters["quota_429"] += 1
+            self.write_json(writer, 429, {"error": {"message": ERROR_BODIES[429][1],
+                                                     "type": ERROR_BODIES[429][0]}},
+                            extra_headers={"retry-after": str(max(1, math.ceil(retry_after)))})
+            return
+
+        if rng.random() < config.error_rate:
+            status = rng.choice(config.error_statuses)
+            self.counters[f"errors_{status}"] += 1
+            # Rate limits are refused right away; server errors take a while
+            if status != 429:
+                await asyncio.sleep(first_token)
+            error_type, message = ERROR_BODIES.get(status, ("api_error", "Upstream error"))
+            self.write_json(writer, status, {"error": {"message": message, "type": error_type}},
+                            extra_headers={"retry-after": "1"} if status == 429 else None)
+            return
+
+        content, is_json = self.answer(messages)
+        if is_json and rng.random() < config.malformed_rate:
+            kind = rng.choice(MALFORMED_KINDS)
+            self.counters[f"malformed_{kind}"] += 1
+            content = malform(content, kind)
+
+        tokens = split_tokens(content)
+        finish_reason = "stop"
+        max_tokens = request.get("max_tokens")
+        if max_tokens and len(tokens) > max_tokens:
+            tokens = tokens[:max_tokens]
+            finish_reason = "length"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        self.counters["completion_tokens"] += len(tokens)
+        if max_tokens and "tokens" in self.quota:
+            bucket = self.quota["tokens"]
+            bucket[1] = min(bucket[0], bucket[1] + max_tokens - len(tokens))
+
+        await asyncio.sleep(first_token)
+        if request.get("stream"):
+            self.counters["streamed"] += 1
+            await self.stream(writer, request, tokens, finish_reason, rate)
+        else:
+            if rate:
+                await asyncio.sleep(len(tokens) / rate)
+            self.write_json(writer, 200, {
+                "id": f"fake-{self.counters['requests']}", "object": "chat.completion",
+                "created": int(time.time()), "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": usage
+            })
+
+    async def stream(self, writer, request, tokens, finish_reason, rate):
+        """Send tokens as SSE chunks at the configured rate"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+            b"transfer-encoding: chunked\r\n\r\n"
+        )
+        base = {"id": f"fake-{self.counters['requests']}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "fake"),
+                "system_fingerprint": "fake"}
+
+        def chunk(content, reason):
+            event = dict(base, choices=[{"index": 0, "finish_reason": reason, "logprobs": None,
+                                         "delta": {"role": "assistant", "content": content}}])
+            return f"data: {json.dumps(event)}\n\n"
+
+        per_chunk = max(1, int(rate * STREAM_INTERVAL)) if rate else len(tokens) or 1
+        for i in range(0, len(tokens), per_chunk):
+            self.write_chunk(writer, chunk("".join(tokens[i:i + per_chunk]), None))
+            await writer.drain()
+            if rate:
+                await asyncio.sleep(per_chunk / rate)
+        self.write_chunk(writer, chunk("", finish_reason) + "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+
+    def answer(self, messages):
+        """
+        Returns:
+            tuple: (content, is_json)
+        """
+        # A continuation gets whatever of the full answer it hasn't seen
+        if (len(messages) > 2 and messages[-1].get("content") == CONTINUE_PROMPT
+                and messages[-2].get("role") == "assistant"):
+            partial = messages[-2].get("content") or ""
+            full, _ = self.answer(messages[:-2])
+            return (full[len(partial):] if full.startswith(partial) else full), False
+
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        question = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        if '"edits"' in system:
+            return json.dumps({"edits": []}), True
+        if '"html"' in system:
+            return ui_answer(question, self.config.ui_tokens(question)), True
+        return chat_answer(question), False
+
+    # ---------- responses ----------
+
+    @staticmethod
+    def write_json(writer, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                "content-type: application/json", f"content-length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (extra_headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+
+    @staticmethod
+    def write_chunk(writer, text):
+        data = text.encode()
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def take_quota(self, tokens):
+        """
+        Charge one request against the quota
+
+        Returns:
+            float: Seconds until it would fit (request refused), or None if charged
+        """
+        now = time.monotonic()
+        needed = {"requests": 1.0, "tokens": min(tokens, self.config.tpm)}
+        wait = 0.0
+        for name, bucket in self.quota.items():
+            capacity, level, updated = bucket
+            bucket[1] = min(capacity, level + (now - updated) * capacity / 60)
+            bucket[2] = now
+            wait = max(wait, (needed[name] - bucket[1]) * 60 / capacity)
+        if wait > 0:
+            return wait
+        for name, bucket in self.quota.items():
+            bucket[1] -= needed[name]
+        return None
+
+    def stats(self):
+        """Counters since start, with the active configuration"""
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "config": self.config.to_dict(),
+            **self.counters
+        }
+
+    # ---------- running ----------
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle, host, port, backlog=2048)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
+def serve_in_thread(config=None, port=0):
+    """
+    Run a fake upstream on a background thread (for benchmarks and tests)
+
+    Returns:
+        tuple: (port, FakeGroqServer)
+    """
+    server = FakeGroqServer(config)
+    bound = []
+    started = threading.Event()
+
+    def ready(actual_port):
+        bound.append(actual_port)
+        started.set()
+
+    threading.Thread(
+        target=lambda: asyncio.run(server.serve(port=port, ready=ready)), daemon=True
+    ).start()
+    started.wait(10)
+    return bound[0], server
+
+# ============================================
+# RUN / TEST THE MODULE
+# ============================================
+
+def self_test():
+    from groq import Groq, APIStatusError
+    from ai_service import UI_SYSTEM_PROMPT
+
+    print("Testing Fake Groq Upstream...\n")
+
+    port, _ = serve_in_thread(FakeUpstreamConfig(latency="fixed:0.05", tokens_per_s=5000, seed=1))
+    client = Groq(api_key="fake", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+    ui_messages = [{"role": "system", "content": UI_SYSTEM_PROMPT},
+                   {"role": "user", "content": "Create a dark navbar"}]
+
+    started = time.perf_counter()
+    response = client.chat.completions.create(model="fake", messages=ui_messages)
+    code = json.loads(response.choices[0].message.content)
+    ok = "dark navbar" in code["html"] and response.usage.completion_tokens > 0
+    print(f"1. {'✅' if ok else '❌'} UI answer in {time.perf_counter() - started:.2f}s "
+          f"({response.usage.completion_tokens} tokens)")
+
+    chunks = list(client.chat.completions.create(
+        model="fake", messages=[{"role": "user", "content": "hi"}], stream=True
+    ))
+    text = "".join(chunk.choices[0].delta.content for chunk in chunks)
+    print(f"2. {'✅' if text.startswith('Happy to help') else '❌'} Streamed chat in {len(chunks)} chunks")
+
+    response = client.chat.completions.create(model="fake", messages=ui_messages, max_tokens=50)
+    ok = response.choices[0].finish_reason == "length" and response.usage.completion_tokens == 50
+    print(f"3. {'✅' if ok else '❌'} max_tokens cuts the answer off (finish_reason={response.choices[0].finish_reason})")
+
+    port, _ = serve_in_thread(FakeUpstreamConfig(latency="fixed:0", error_rate=1.0, error_statuses=(503,)))
+    failing = Groq(api_key="fake", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+    try:
+        failing.chat.completions.create(model="fake", messages=ui_messages)
+        print("4. ❌ Injected error not raised")
+    except APIStatusError as e:
+        print(f"4. {'✅' if e.status_code == 503 else '❌'} Injected error: {e.status_code}")
+
+    port, server = serve_in_thread(FakeUpstreamConfig(latency="fixed:0", tokens_per_s=0, malformed_rate=1.0))
+    broken = Groq(api_key="fake", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+    invalid = 0
+    for _ in range(6):
+        content = broken.chat.completions.create(model="fake", messages=ui_messages).choices[0].message.content
+        try:
+            json.loads(content)
+        except ValueError:
+            invalid += 1
+    print(f"5. {'✅' if invalid == 6 else '❌'} Malformed answers: {dict(server.counters)}")
+
+    port, _ = serve_in_thread(FakeUpstreamConfig(latency="fixed:0.2", tokens_per_s=0,
+                                                 model_speed={"fast-model": 4}))
+    timed = Groq(api_key="fake", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+    seconds = {}
+    for model in ("fake", "fast-model"):
+        started = time.perf_counter()
+        timed.chat.completions.create(model=model, messages=ui_messages)
+        seconds[model] = time.perf_counter() - started
+    ok = seconds["fast-model"] < seconds["fake"] / 2
+    print(f"6. {'✅' if ok else '❌'} Model speed: fake {seconds['fake']:.2f}s, fast-model {seconds['fast-model']:.2f}s")
+
+    from budget import continuation_messages
+    first = client.chat.completions.create(model="fake", messages=ui_messages, max_tokens=200)
+    rest = client.chat.completions.create(
+        model="fake", messages=continuation_messages(ui_messages, first.choices[0].message.content)
+    )
+    whole = first.choices[0].message.content + rest.choices[0].message.content
+    ok = first.choices[0].finish_reason == "length" and json.loads(whole) == code
+    print(f"7. {'✅' if ok else '❌'} Continuation completes a cut-off answer "
+          f"({first.usage.completion_tokens} + {rest.usage.completion_tokens} tokens)")
+
+    port, server = serve_in_thread(FakeUpstreamConfig(latency="fixed:0", tokens_per_s=0, rpm=3))
+    limited = Groq(api_key="fake", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+    statuses = []
+    for _ in range(4):
+        try:
+            limited.chat.completions.create(model="fake", messages=[{"role": "user", "content": "hi"}])
+            statuses.append(200)
+        except APIStatusError as e:
+            statuses.append((e.status_code, e.response.headers.get("retry-after")))
+    ok = statuses[:3] == [200] * 3 and statuses[3][0] == 429
+    print(f"8. {'✅' if ok else '❌'} Quota of 3 requests/minute: {statuses}")
+
+    print("\n✅ Fake upstream working!")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--test"]:
+        self_test()
+    else:
+        port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+        config = FakeUpstreamConfig.from_env()
+        print(f"Fake Groq upstream on http://127.0.0.1:{port} {json.dumps(config.to_dict())}")
+        asyncio.run(FakeGroqServer(config).serve(port=port))
@@ -0,0 +1,48 @@
+"""
+Gunicorn Configuration for FlexiUI
+
+Pre-fork serving with the warm-up split the way app.py splits it:
+
+- the master imports the app once (preload_app) and runs prepare_app()
+  (database setup, routing/budget history, groq SDK import) before forking
+- every worker runs init_worker() right after the fork (fresh database
+  pool, upstream clients, similarity index), so its first request doesn't
+  pay for any of it
+
+Run with:
+    gunicorn -c gunicorn.conf.py
+
+FLEXIUI_SERVER=asgi serves asgi_app:application with uvicorn workers
+instead of the threaded Flask app. Other settings:
+
+    FLEXIUI_BIND      - address (default 0.0.0.0:$PORT, PORT default 5000)
+    FLEXIUI_WORKERS   - worker processes (default 2)
+    FLEXIUI_THREADS   - threads per Flask worker (default 8)
+"""
+
+import os
+
+asgi = os.getenv("FLEXIUI_SERVER", "wsgi") == "asgi"
+
+wsgi_app = "asgi_app:application" if asgi else "app:app"
+worker_class = "uvicorn.workers.UvicornWorker" if asgi else "gthread"
+
+bind = os.getenv("FLEXIUI_BIND", f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv("FLEXIUI_WORKERS", 2))
+threads = int(os.getenv("FLEXIUI_THREADS", 8))
+
+# Generations can take a while; streams keep the connection open longer still
+timeout = 120
+preload_app = True
+
+
+def when_ready(server):
+    """Master process, after the preload: the fork-safe warm-up"""
+    from app import app, prepare_app
+    prepare_app(app)
+
+
+def post_fork(server, worker):
+    """Each worker, right after the fork: clients and pools of its own"""
+    from app import app, init_worker
+    init_worker(app)
@@ -0,0 +1,305 @@
+"""
+Conversation History Manager for FlexiUI chat
+
+Keeps chat prompts inside a token budget. The system prompt and the most
+recent turns are sent verbatim; older turns are folded into a rolling
+summary. Summaries are cached by the exact run of turns they cover, so a
+summary is only recomputed when the window moves, and a moved window
+extends the previous summary instead of starting over.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Prefix of the system message that carries the rolling summary
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+# ============================================
+# TOKEN ESTIMATION
+# ============================================
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of a piece of text
+
+    Uses the common ~4 characters per token rule, which is close enough
+    for budgeting and costs nothing compared to a real tokenizer.
+
+    Args:
+        text (str): Any text
+
+    Returns:
+        int: Estimated tokens
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def message_tokens(message):
+    """Estimated tokens of one chat message"""
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+# ============================================
+# DEFAULT SUMMARIZER
+# ============================================
+
+def _first_sentence(text, limit=160):
+    text = " ".join((text or "").split())
+    sentence = _SENTENCE_END_RE.split(text, 1)[0]
+    if len(sentence) > limit:
+        sentence = sentence[:limit - 1].rstrip() + "…"
+    return sentence
+
+
+def extractive_summarizer(previous_summary, messages):
+    """
+    Cheap local summary: one line per folded turn
+
+    Args:
+        previous_summary (str): Summary of even older turns ("" if none)
+        messages (list): Turns to fold into the summary
+
+    Returns:
+        str: Updated summary
+    """
+    lines = previous_summary.splitlines() if previous_summary else []
+    for message in messages:
+        speaker = "User" if message.get("role") == "user" else "Assistant"
+        lines.append(f"- {speaker}: {_first_sentence(message.get('content'))}")
+    return "\n".join(lines)
+
+# ============================================
+# HISTORY MANAGER
+# ============================================
+
+class HistoryManager:
+    """
+    Trims conversation history to a token budget
+    """
+
+    def __init__(self, budget_tokens=3000, min_recent=2, summary_tokens=400,
+                 summarizer=extractive_summarizer, cache_size=512):
+        """
+        Args:
+            budget_tokens (int): Max estimated prompt tokens (system + history + message)
+            min_recent (int): Messages always kept verbatim, even over budget
+            summary_tokens (int): Max tokens of the rolling summary
+            summarizer (callable): (previous_summary, messages) -> summary
+            cache_size (int): Summaries kept in memory
+        """
+        self.budget_tokens = budget_tokens
+        self.min_recent = min_recent
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.cache_size = cache_size
+
+        self._summaries = OrderedDict()  # prefix fingerprint -> summary
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_HISTORY_TOKEN_BUDGET  - prompt budget in tokens (default 3000)
+        FLEXIUI_HISTORY_MIN_RECENT    - messages always kept verbatim (default 2)
+        FLEXIUI_HISTORY_SUMMARY_TOKENS - summary size cap (default 400)
+        """
+        return cls(
+            budget_tokens=int(os.getenv("FLEXIUI_HISTORY_TOKEN_BUDGET", 3000)),
+            min_recent=int(os.getenv("FLEXIUI_HISTORY_MIN_RECENT", 2)),
+            summary_tokens=int(os.getenv("FLEXIUI_HISTORY_SUMMARY_TOKENS", 400))
+        )
+
+    def fit(self, system_message, history, user_message):
+        """
+        Build a messages list that fits the budget
+
+        Args:
+            system_message (dict): The system prompt message
+            history (list): Previous messages, oldest first
+            user_message (dict): The new user message
+
+        Returns:
+            tuple: (messages, metrics dict)
+        """
+        history = self._clean(history)
+        keep_from, tokens_before = self._split(system_message, history, user_message)
+
+        summary, cached = self._summary_for(history[:keep_from])
+        messages = self._assemble(system_message, summary, history[keep_from:], user_message)
+
+        metrics = self._metrics(history, keep_from, tokens_before, messages)
+        metrics["summary_cached"] = cached
+        return messages, metrics
+
+    def fit_session(self, system_message, summary, history, user_message):
+        """
+        Like fit(), but the caller stores the rolling summary (server-side sessions)
+
+        Args:
+            system_message (dict): The system prompt message
+            summary (str): Summary of turns folded earlier ("" if none)
+            history (list): Messages not yet covered by the summary, oldest first
+            user_message (dict): The new user message
+
+        Returns:
+            tuple: (messages, metrics dict, new summary, number of history
+                    messages folded into it)
+        """
+        history = self._clean(history)
+        summary_cost = (
+            estimate_tokens(SUMMARY_HEADER + summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0
+        )
+        keep_from, tokens_before = self._split(system_message, history, user_message, summary_cost)
+
+        if keep_from:
+            summary = self._clip(self.summarizer(summary, history[:keep_from]))
+        messages = self._assemble(system_message, summary, history[keep_from:], user_message)
+
+        metrics = self._metrics(history, keep_from, tokens_before, messages)
+        return messages, metrics, summary, keep_from
+
+    # ---------- planning ----------
+
+    def _clean(self, history):
+        return [
+            {"role": m.get("role"), "content": m.get("content") or ""}
+            for m in history or []
+            if isinstance(m, dict) and m.get("role") in ("user", "assistant")
+        ]
+
+    def _split(self, system_message, history, user_message, summary_cost=0):
+        """
+        Decide how many of the oldest messages to fold into the summary
+
+        Returns:
+            tuple: (number of messages to fold, estimated tokens before trimming)
+        """
+        costs = [message_tokens(m) for m in history]
+        fixed = message_tokens(system_message) + message_tokens(user_message)
+        tokens_before = fixed + summary_cost + sum(costs)
+
+        if tokens_before <= self.budget_tokens:
+            return 0, tokens_before
+
+        # Keep the newest turns that fit next to a full-size summary
+        available = (
+            self.budget_tokens - fixed - self.summary_tokens
+            - estimate_tokens(SUMMARY_HEADER) - MESSAGE_OVERHEAD_TOKENS
+        )
+        keep_from = len(history)
+        used = 0
+        while keep_from > 0:
+            cost = costs[keep_from - 1]
+            if used + cost > available and len(history) - keep_from >= self.min_recent:
+                break
+            used += cost
+            keep_from -= 1
+        return keep_from, tokens_before
+
+    def _assemble(self, system_message, summary, recent, user_message):
+        messages = [system_message]
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": SUMMARY_HEADER + summary
+            })
+        return messages + recent + [user_message]
+
+    def _metrics(self, history, folded, tokens_before, messages):
+        tokens_after = sum(message_tokens(m) for m in messages)
+        return {
+            "history_messages": len(history),
+            "summarized_messages": folded,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_trimmed": tokens_before - tokens_after,
+            "summary_cached": False
+        }
+
+    # ---------- rolling summary ----------
+
+    def _summary_for(self, folded):
+        """
+        Summary of the folded prefix, reusing the longest cached shorter prefix
+
+        Returns:
+            tuple: (summary, whether it came straight from the cache)
+        """
+        if not folded:
+            return "", False
+
+        # Fingerprint of every prefix length: f[i] covers folded[:i]
+        fingerprints = [""]
+        for message in folded:
+            digest = hashlib.sha1(fingerprints[-1].encode("utf-8"))
+            digest.update(json.dumps([message["role"], message["content"]]).encode("utf-8"))
+            fingerprints.append(digest.hexdigest())
+
+        with self._lock:
+            summary = self._summaries.get(fingerprints[-1])
+            if summary is not None:
+                self._summaries.move_to_end(fingerprints[-1])
+                return summary, True
+
+            start, previous = 0, ""
+            for length in range(len(folded) - 1, 0, -1):
+                cached = self._summaries.get(fingerprints[length])
+                if cached is not None:
+                    start, previous = length, cached
+                    break
+
+        summary = self._clip(self.summarizer(previous, folded[start:]))
+
+        with self._lock:
+            self._summaries[fingerprints[-1]] = summary
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+        return summary, False
+
+    def _clip(self, summary):
+        """Drop the oldest summary lines until it fits summary_tokens"""
+        lines = summary.splitlines()
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        text = "\n".join(lines)
+        max_chars = self.summary_tokens * 4
+        return text[-max_chars:] if len(text) > max_chars else text
+
+
+# Shared manager used by ai_service
+history_manager = HistoryManager.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing History Manager...\n")
+
+    manager = HistoryManager(budget_tokens=300, summary_tokens=80)
+    system = {"role": "system", "content": "You are FlexiUI Assistant."}
+    history = []
+    for i in range(12):
+        history.append({"role": "user", "content": f"Question {i}: how do I style a navbar? " * 3})
+        history.append({"role": "assistant", "content": f"Answer {i}. Use flexbox for the layout. " * 4})
+
+    messages, metrics = manager.fit(system, history, {"role": "user", "content": "And the footer?"})
+    print(f"1. {len(history)} history messages → {len(messages)} sent")
+    print(f"   {metrics}")
+
+    _, metrics = manager.fit(system, history, {"role": "user", "content": "Thanks!"})
+    print(f"2. Same window again, summary cached: {metrics['summary_cached']}")
+
+    history += [{"role": "user", "content": "One more?"}, {"role": "assistant", "content": "Sure."}]
+    _, metrics = manager.fit(system, history, {"role": "user", "content": "Ok"})
+    print(f"3. Window moved: {metrics}")
+
+    print("\n✅ History manager working!")
@@ -0,0 +1,215 @@
+"""
+Write-Behind Request Logging for FlexiUI
+
+Requests hand their GenerationLog record to a bounded in-memory queue and
+return immediately. A background thread drains the queue and writes the
+records in batched transactions, flushing when a batch is full or when the
+flush interval has passed, so no request ever waits on the SQLite writer.
+
+When the queue is full the overflow policy decides:
+- "drop":  the new record is discarded (counted in stats)
+- "block": the caller waits up to block_timeout for room, then drops
+
+The writer doesn't know about Flask: app.py sets `sink` to a function that
+inserts a list of records.
+"""
+
+import os
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_BLOCK = "block"
+
+
+class LogWriter:
+    """
+    Bounded queue + background batch writer
+    """
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=1.0,
+                 overflow=OVERFLOW_DROP, block_timeout=0.05):
+        """
+        Args:
+            max_queue (int): Records held in memory before the overflow policy applies
+            batch_size (int): Records written per transaction (at most)
+            flush_interval (float): Max seconds a record waits before being written
+            overflow (str): "drop" or "block"
+            block_timeout (float): Max seconds a caller waits when overflow is "block"
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        # Called with a list of record dicts; must write them in one transaction
+        self.sink = None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_LOG_QUEUE_SIZE     - max queued records (default 10000)
+        FLEXIUI_LOG_BATCH_SIZE     - records per transaction (default 200)
+        FLEXIUI_LOG_FLUSH_INTERVAL - max seconds before a flush (default 1.0)
+        FLEXIUI_LOG_OVERFLOW       - "drop" (default) or "block"
+        """
+        return cls(
+            max_queue=int(os.getenv("FLEXIUI_LOG_QUEUE_SIZE", 10000)),
+            batch_size=int(os.getenv("FLEXIUI_LOG_BATCH_SIZE", 200)),
+            flush_interval=float(os.getenv("FLEXIUI_LOG_FLUSH_INTERVAL", 1.0)),
+            overflow=os.getenv("FLEXIUI_LOG_OVERFLOW", OVERFLOW_DROP)
+        )
+
+    # ---------- producer side ----------
+
+    def record(self, prompt, component_type, generation_time, error=None, model=None,
+               output_tokens=None):
+        """
+        Queue one GenerationLog record (never touches the database)
+
+        Args:
+            prompt (str): Prompt or chat message
+            component_type (str): Component type ("chat" for chat messages)
+            generation_time (float): Seconds the request took
+            error (str): Error message if the request failed
+            model (str): Model that answered, if the upstream was called
+            output_tokens (int): Completion tokens of the answer, if the upstream was called
+
+        Returns:
+            bool: False if the record was dropped
+        """
+        if self.sink is None:
+            return False
+        self._ensure_started()
+
+        entry = {
+            "prompt": prompt or "",
+            "component_type": component_type,
+            "success": error is None,
+            "error_message": error,
+            "created_at": datetime.utcnow(),
+            "generation_time": generation_time,
+            "model": model,
+            "output_tokens": output_tokens
+        }
+        try:
+            if self.overflow == OVERFLOW_BLOCK:
+                self._queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=5.0):
+        """
+        Wait until every queued record has been written (or failed)
+
+        Returns:
+            bool: True if the queue drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        """Writer counters"""
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failed": self.failed
+        }
+
+    # ---------- writer thread ----------
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Fill the batch until it is full or the oldest record is due
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self.sink(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"⚠️  Request log write failed ({len(batch)} records lost): {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+
+# Shared writer used by ai_service (app.py connects it to the database)
+generation_logs = LogWriter.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Log Writer...\n")
+
+    written = []
+
+    def slow_sink(batch):
+        time.sleep(0.05)  # a slow disk
+        written.append(len(batch))
+
+    writer = LogWriter(max_queue=500, batch_size=100, flush_interval=0.2)
+    writer.sink = slow_sink
+
+    start = time.perf_counter()
+    for i in range(400):
+        writer.record(f"prompt {i}", "button", 0.1)
+    elapsed = time.perf_counter() - start
+    print(f"1. 400 records queued in {elapsed * 1000:.1f}ms")
+
+    writer.flush()
+    print(f"2. Written in {len(written)} batches: {written}")
+
+    for i in range(2000):
+        writer.record(f"burst {i}", "card", 0.1)
+    writer.flush()
+    print(f"3. Burst over the queue limit: {writer.stats()}")
+
+    print("\n✅ Log writer working!")
@@ -0,0 +1,358 @@
+"""
+Request Metrics for FlexiUI
+
+Small in-process histograms and counters, exported in the Prometheus text
+format at /api/metrics. Hot-path code records stages with
+
+    with metrics.stage("parse"):
+        ...
+
+and the labels (route, component_type, model) come from the surrounding
+label_scope(), so deep helpers don't need them passed in.
+
+FLEXIUI_METRICS=0 turns everything into no-ops: stage() and label_scope()
+return a shared do-nothing context manager and the counters return at once.
+"""
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+ENABLED = os.getenv("FLEXIUI_METRICS", "1") != "0"
+
+# Labels every stage/counter series carries, set with label_scope()
+CONTEXT_LABELS = ("route", "component_type", "model")
+
+# Seconds; covers sub-millisecond parsing up to slow upstream generations
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+_context = ContextVar("flexiui_metric_labels", default=("", "", ""))
+
+# ============================================
+# METRIC TYPES
+# ============================================
+
+class Counter:
+    """Monotonic counter, one value per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name, self._labels(label_values), value
+
+    def _labels(self, label_values, extra=None):
+        pairs = list(zip(self.label_names, label_values))
+        if extra:
+            pairs.append(extra)
+        return pairs
+
+
+class Histogram(Counter):
+    """Bucketed distribution (cumulative buckets on export, like Prometheus)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # [count per bucket..., +Inf count, sum]
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._values.items()]
+        for label_values, series in items:
+            running = 0
+            for bound, count in zip(self.buckets, series):
+                running += count
+                yield f"{self.name}_bucket", self._labels(label_values, ("le", repr(bound))), running
+            running += series[len(self.buckets)]
+            yield f"{self.name}_bucket", self._labels(label_values, ("le", "+Inf")), running
+            yield f"{self.name}_sum", self._labels(label_values), series[-1]
+            yield f"{self.name}_count", self._labels(label_values), running
+
+# ============================================
+# REGISTRY
+# ============================================
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+REQUEST_SECONDS = _register(Histogram(
+    "flexiui_request_seconds", "HTTP request duration by route and status",
+    ("route", "method", "status")
+))
+STAGE_SECONDS = _register(Histogram(
+    "flexiui_stage_seconds", "Time spent in each stage of a request",
+    ("stage",) + CONTEXT_LABELS
+))
+UPSTREAM_TOKENS = _register(Counter(
+    "flexiui_upstream_tokens_total", "Tokens reported by the upstream API",
+    ("kind",) + CONTEXT_LABELS
+))
+PARSE_FALLBACKS = _register(Counter(
+    "flexiui_parse_fallbacks_total", "Responses that needed the manual code extraction fallback",
+    CONTEXT_LABELS
+))
+FAILURES = _register(Counter(
+    "flexiui_failures_total", "Chat/generation calls that ended in an error",
+    CONTEXT_LABELS
+))
+UPSTREAM_EVENTS = _register(Counter(
+    "flexiui_upstream_events_total",
+    "Upstream client events (retry, hedge, hedge_win, deadline, circuit_open, short_circuit)",
+    ("event",) + CONTEXT_LABELS
+))
+TRUNCATIONS = _register(Counter(
+    "flexiui_truncations_total",
+    "Answers that hit max_tokens, by outcome (continued, cut_off); see budget.py",
+    ("outcome",) + CONTEXT_LABELS
+))
+ADMISSIONS = _register(Counter(
+    "flexiui_admission_total",
+    "Admission control outcomes (admitted, shed_429, shed_503) by priority class; see admission.py",
+    ("outcome", "priority") + CONTEXT_LABELS
+))
+ROUTE_DECISIONS = _register(Counter(
+    "flexiui_route_decisions_total", "Model routing decisions (see router.py)",
+    ("component_type", "model", "reason")
+))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format
+
+    Returns:
+        str: Exposition text
+    """
+    lines = []
+    if not ENABLED:
+        lines.append("# metrics disabled (FLEXIUI_METRICS=0)")
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {value}")
+    return "\n".join(lines) + "\n"
+
+# ============================================
+# HOT-PATH HELPERS
+# ============================================
+
+class _NullContext:
+    """Shared no-op context manager used when metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullContext()
+
+
+class _StageTimer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe((self.name,) + _context.get(), time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """
+    Time a block as one request stage
+
+    Args:
+        name (str): Stage name (e.g. "prompt_build", "upstream_total", "parse")
+    """
+    if not ENABLED:
+        return _NULL
+    return _StageTimer(name)
+
+
+def record_stage(name, seconds):
+    """Record a stage duration measured by the caller (e.g. time to first token)"""
+    if ENABLED:
+        STAGE_SECONDS.observe((name,) + _context.get(), seconds)
+
+
+@contextmanager
+def _scope(values):
+    token = _context.set(values)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def label_scope(route=None, component_type=None, model=None):
+    """
+    Set labels for every stage/counter recorded inside the block
+
+    Labels left as None keep the value of the enclosing scope.
+    """
+    if not ENABLED:
+        return _NULL
+    current = _context.get()
+    return _scope((
+        current[0] if route is None else route,
+        current[1] if component_type is None else component_type,
+        current[2] if model is None else model,
+    ))
+
+
+def enter_request(route):
+    """
+    Start the label context of an HTTP request (see app.py hooks)
+
+    Returns:
+        Token for exit_request(), or None when metrics are disabled
+    """
+    if not ENABLED:
+        return None
+    return _context.set((route, "", ""))
+
+
+def exit_request(token):
+    """End the label context started by enter_request()"""
+    if token is not None:
+        _context.reset(token)
+
+
+def count_tokens(prompt_tokens, completion_tokens):
+    """Add upstream token usage (None counts are ignored)"""
+    if not ENABLED:
+        return
+    labels = _context.get()
+    if prompt_tokens:
+        UPSTREAM_TOKENS.inc(("prompt",) + labels, prompt_tokens)
+    if completion_tokens:
+        UPSTREAM_TOKENS.inc(("completion",) + labels, completion_tokens)
+
+
+def count_parse_fallback():
+    """Count a response that needed extract_code_manually"""
+    if ENABLED:
+        PARSE_FALLBACKS.inc(_context.get())
+
+
+def count_failure():
+    """Count a chat/generation call that ended in an error"""
+    if ENABLED:
+        FAILURES.inc(_context.get())
+
+
+def count_upstream_event(event):
+    """Count a retry, hedge, breaker trip etc. of the upstream client (see upstream.py)"""
+    if ENABLED:
+        UPSTREAM_EVENTS.inc((event,) + _context.get())
+
+
+def count_truncation(outcome):
+    """Count an answer that hit max_tokens ("continued" or still "cut_off")"""
+    if ENABLED:
+        TRUNCATIONS.inc((outcome,) + _context.get())
+
+
+def count_admission(outcome, priority):
+    """Count an admission control decision"""
+    if ENABLED:
+        ADMISSIONS.inc((outcome, priority) + _context.get())
+
+
+def count_route(component_type, model, reason):
+    """Count a model routing decision"""
+    if ENABLED:
+        ROUTE_DECISIONS.inc((component_type, model, reason))
+
+
+def observe_request(route, method, status, seconds):
+    """Record one finished HTTP request"""
+    if ENABLED:
+        REQUEST_SECONDS.observe((route, method, str(status)), seconds)
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Metrics...\n")
+
+    with label_scope(route="/api/generate-ui", component_type="navbar", model="test-model"):
+        with stage("parse"):
+            time.sleep(0.002)
+        record_stage("upstream_ttft", 0.3)
+        count_tokens(120, 480)
+        count_parse_fallback()
+    observe_request("/api/generate-ui", "POST", 200, 0.35)
+
+    text = render()
+    print("1. Exposition sample:")
+    for line in text.splitlines():
+        if 'stage="parse"' in line and ("_count" in line or "_sum" in line) or "tokens_total{" in line:
+            print(f"   {line}")
+
+    calls = 100000
+    start = time.perf_counter()
+    for _ in range(calls):
+        with stage("noop"):
+            pass
+    enabled_cost = (time.perf_counter() - start) / calls * 1e6
+
+    ENABLED = False
+    start = time.perf_counter()
+    for _ in range(calls):
+        with stage("noop"):
+            pass
+    disabled_cost = (time.perf_counter() - start) / calls * 1e6
+    print(f"2. stage() overhead: {enabled_cost:.2f} µs enabled, {disabled_cost:.2f} µs disabled")
+
+    print("\n✅ Metrics working!")
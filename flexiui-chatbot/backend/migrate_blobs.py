@@ -0,0 +1,63 @@
+"""
+Migrate a FlexiUI database to the content-addressed blob store
+
+Moves the inline html_code/css_code/js_code columns of the projects table
+into code_blobs (deduplicated, zlib-compressed; see blobs.py), VACUUMs the
+file so the freed pages are returned, and reports the space saved.
+
+The app runs the same migration on startup (without the VACUUM); running
+this on an already migrated database just reports and compacts it.
+
+Usage:
+    python migrate_blobs.py [path]      default: instance/flexiui.db
+"""
+
+import os
+import sys
+
+from sqlalchemy import create_engine, text
+
+from blobs import migrate_inline_code, blob_report
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "flexiui.db")
+
+
+def human_size(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    if not os.path.exists(path):
+        print(f"❌ No database at {path}")
+        sys.exit(1)
+
+    engine = create_engine(f"sqlite:///{path}")
+    size_before = os.path.getsize(path)
+
+    with engine.begin() as conn:
+        report = migrate_inline_code(conn)
+        if report is None:
+            print("Projects already use the blob store")
+            report = blob_report(conn)
+        else:
+            print("✅ Moved project code to the blob store")
+
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    size_after = os.path.getsize(path)
+
+    print(f"\n   Code references:     {report['references']}")
+    print(f"   Distinct blobs:      {report['blobs']}")
+    print(f"   Code stored inline:  {human_size(report['logical_bytes'])}")
+    print(f"   After deduplication: {human_size(report['raw_bytes'])}")
+    print(f"   After compression:   {human_size(report['stored_bytes'])} "
+          f"({report['saved_ratio']:.1%} saved)")
+    print(f"\n   File: {human_size(size_before)} -> {human_size(size_after)}")
+
+
+if __name__ == "__main__":
+    main()
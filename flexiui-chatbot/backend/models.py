@@ -3,10 +3,59 @@ Database Models for FlexiUI AI Generator
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
 from datetime import datetime
 
 db = SQLAlchemy()
 
+def enable_sqlite_wal(engine):
+    """
+    Open every SQLite connection in WAL mode
+    
+    With WAL, readers don't block the writer (and the other way round), and
+    synchronous=NORMAL makes a commit cost one fsync per checkpoint instead
+    of one per transaction.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
+
+def ensure_indexes(conn):
+    """
+    Create indexes added to the models after their tables were created
+    (db.create_all() skips tables that already exist)
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def ensure_columns(conn):
+    """
+    Add nullable columns added to the models after their tables were created
+    
+    Returns:
+        list: "table.column" of each column added
+    """
+    added = []
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            added.append(f'{table.name}.{column.name}')
+    return added
+
 # ============================================
 # Project Model - Stores Generated UIs
 # ============================================
@@ -16,42 +65,143 @@ class Project(db.Model):
     Stores each generated UI project
     """
     __tablename__ = 'projects'
+    __table_args__ = (
+        # Keyset pagination of /api/projects (newest first)
+        db.Index('ix_projects_created_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     prompt = db.Column(db.Text, nullable=False)
     
-    # Generated code
-    html_code = db.Column(db.Text, nullable=True)
-    css_code = db.Column(db.Text, nullable=True)
-    js_code = db.Column(db.Text, nullable=True)
+    # Generated code, as content hashes into code_blobs (see blobs.py)
+    html_hash = db.Column(db.String(64), nullable=True)
+    css_hash = db.Column(db.String(64), nullable=True)
+    js_hash = db.Column(db.String(64), nullable=True)
     
     # Metadata
     component_type = db.Column(db.String(50), default='general')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Last change through /api/modify-ui (None: still the generated code,
+    # the only projects the similarity index serves)
+    modified_at = db.Column(db.DateTime, nullable=True)
+    
     # Statistics
     views = db.Column(db.Integer, default=0)
     
-    def to_dict(self):
-        """Convert project to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'prompt': self.prompt,
-            'html_code': self.html_code,
-            'css_code': self.css_code,
-            'js_code': self.js_code,
-            'component_type': self.component_type,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'views': self.views
-        }
+    # Every serializable field, and the ones listings send by default
+    # (the code columns can be megabytes, so listings leave them out)
+    FIELDS = (
+        'id', 'name', 'prompt', 'html_code', 'css_code', 'js_code',
+        'component_type', 'created_at', 'updated_at', 'views'
+    )
+    LIST_FIELDS = (
+        'id', 'name', 'prompt', 'component_type', 'created_at', 'updated_at', 'views'
+    )
+    
+    # Code field -> (code dict key, hash column)
+    CODE_FIELDS = {
+        'html_code': ('html', 'html_hash'),
+        'css_code': ('css', 'css_hash'),
+        'js_code': ('js', 'js_hash'),
+    }
+    
+    @classmethod
+    def column_name(cls, field):
+        """Column that stores a serializable field"""
+        return cls.CODE_FIELDS[field][1] if field in cls.CODE_FIELDS else field
+    
+    def read_code(self, sections=('html', 'css', 'js')):
+        """
+        Load the project's code from the blob store
+        
+        Returns:
+            dict: {"html": ..., "css": ..., "js": ...} (only `sections`)
+        """
+        from blobs import code_blobs  # blobs.py imports this module
+        
+        hashes = {section: getattr(self, f'{section}_hash') for section in sections}
+        texts = code_blobs.get_many(object_session(self).connection(), hashes.values())
+        return {section: texts.get(digest, '') for section, digest in hashes.items()}
+    
+    def write_code(self, code):
+        """
+        Point the project at new code (stored/deduplicated in the blob store)
+        
+        Runs in the session's transaction; the project must already be added
+        to the session.
+        
+        Args:
+            code (dict): html/css/js
+        """
+        from blobs import code_blobs
+        
+        conn = object_session(self).connection()
+        old = [self.html_hash, self.css_hash, self.js_hash]
+        self.html_hash, self.css_hash, self.js_hash = code_blobs.acquire(
+            conn, [code.get('html') or '', code.get('css') or '', code.get('js') or '']
+        )
+        code_blobs.release(conn, old)
+    
+    @property
+    def html_code(self):
+        return self.read_code(('html',))['html']
+    
+    @property
+    def css_code(self):
+        return self.read_code(('css',))['css']
+    
+    @property
+    def js_code(self):
+        return self.read_code(('js',))['js']
+    
+    def to_dict(self, fields=None):
+        """
+        Convert project to dictionary
+        
+        Args:
+            fields (iterable): Only these fields (default: all of FIELDS).
+                               Columns deferred by the query are only
+                               loaded if asked for here.
+        """
+        fields = fields or self.FIELDS
+        sections = [self.CODE_FIELDS[f][0] for f in fields if f in self.CODE_FIELDS]
+        code = self.read_code(sections) if sections else {}
+        
+        result = {}
+        for field in fields:
+            if field in self.CODE_FIELDS:
+                result[field] = code[self.CODE_FIELDS[field][0]]
+                continue
+            value = getattr(self, field)
+            result[field] = value.isoformat() if isinstance(value, datetime) else value
+        return result
     
     def __repr__(self):
         return f'<Project {self.id}: {self.name}>'
 
+# ============================================
+# Code Blob Model - Deduplicated Generated Code
+# ============================================
+
+class CodeBlob(db.Model):
+    """
+    One distinct piece of generated code, stored once however many projects
+    use it (see blobs.py)
+    """
+    __tablename__ = 'code_blobs'
+    
+    # sha256 of the uncompressed UTF-8 text
+    hash = db.Column(db.String(64), primary_key=True)
+    compression = db.Column(db.String(10), nullable=False, default='zlib')
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    size = db.Column(db.Integer, nullable=False)         # uncompressed bytes
+    stored_size = db.Column(db.Integer, nullable=False)  # bytes in `data`
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+
 # ============================================
 # Generation Log Model - Track API Usage
 # ============================================
@@ -61,6 +211,10 @@ class GenerationLog(db.Model):
     Tracks all generation attempts for analytics
     """
     __tablename__ = 'generation_logs'
+    __table_args__ = (
+        # Time-range analytics filtered by type/outcome
+        db.Index('ix_generation_logs_created_type_success', 'created_at', 'component_type', 'success'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     prompt = db.Column(db.Text, nullable=False)
@@ -74,6 +228,11 @@ class GenerationLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     generation_time = db.Column(db.Float)  # seconds
     
+    # Model that answered and the answer's size (only set when the upstream
+    # was called, see router.py and budget.py)
+    model = db.Column(db.String(100), nullable=True)
+    output_tokens = db.Column(db.Integer, nullable=True)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -82,8 +241,97 @@ class GenerationLog(db.Model):
             'success': self.success,
             'error_message': self.error_message,
             'created_at': self.created_at.isoformat(),
-            'generation_time': self.generation_time
+            'generation_time': self.generation_time,
+            'model': self.model,
+            'output_tokens': self.output_tokens
+        }
+    
+    def __repr__(self):
+        return f'<GenerationLog {self.id}: {"Success" if self.success else "Failed"}>'
+
+# ============================================
+# Generation Rollups - Pre-Aggregated Analytics
+# ============================================
+
+class GenerationRollupMixin:
+    """
+    Per-bucket totals of GenerationLog, maintained as logs are written
+    
+    `histogram` holds the generation times as fixed-bucket counts (a JSON
+    list, see analytics.py), so percentiles of any range of buckets can be
+    merged without touching the raw logs.
+    """
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    component_type = db.Column(db.String(50), primary_key=True)
+    
+    count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    latency_sum = db.Column(db.Float, nullable=False, default=0.0)
+    histogram = db.Column(db.Text, nullable=False, default='[]')
+
+class GenerationRollupMinute(GenerationRollupMixin, db.Model):
+    """Per-minute rollup (kept for a limited time)"""
+    __tablename__ = 'generation_rollups_minute'
+
+class GenerationRollupHour(GenerationRollupMixin, db.Model):
+    """Per-hour rollup"""
+    __tablename__ = 'generation_rollups_hour'
+
+# ============================================
+# Chat Session Models - Server-Side Chat History
+# ============================================
+
+class ChatSession(db.Model):
+    """
+    A server-held chat conversation
+    
+    Messages live in ChatMessage (append-only). Turns that no longer fit the
+    history budget are folded into `summary`; `summarized_upto` is the id of
+    the last message covered by it.
+    """
+    __tablename__ = 'chat_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    summary = db.Column(db.Text, default='')
+    summarized_upto = db.Column(db.Integer, default=0)
+    message_count = db.Column(db.Integer, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_active_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'message_count': self.message_count,
+            'created_at': self.created_at.isoformat(),
+            'last_active_at': self.last_active_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<ChatSession {self.id}: {self.message_count} messages>'
+
+class ChatMessage(db.Model):
+    """
+    One message of a chat session (append-only log)
+    """
+    __tablename__ = 'chat_messages'
+    __table_args__ = (
+        db.Index('ix_chat_messages_session_id_id', 'session_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(
+        db.String(32), db.ForeignKey('chat_sessions.id', ondelete='CASCADE'), nullable=False
+    )
+    role = db.Column(db.String(20), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'role': self.role,
+            'content': self.content
         }
     
     def __repr__(self):
-        return f'<GenerationLog {self.id}: {"Success" if self.success else "Failed"}>'
\ No newline at end of file
+        return f'<ChatMessage {self.id}: {self.role}>'
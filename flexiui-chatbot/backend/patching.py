@@ -0,0 +1,324 @@
+"""
+Patch-Based UI Modification for FlexiUI
+
+Small edits ("make the button red") should not need the whole component
+rewritten by the model. Instead the model answers with a compact list of
+search/replace edits against the sections it was shown; the edits are
+applied here and the result is checked before it replaces the old code.
+
+Patch format (JSON):
+    {"edits": [
+        {"section": "css", "find": "background: blue;", "replace": "background: red;"},
+        {"section": "html", "find": "", "replace": "<p>Appended</p>"}
+    ]}
+
+An empty "find" appends to the section.
+"""
+
+import re
+import json
+from html.parser import HTMLParser
+
+SECTIONS = ("html", "css", "js")
+
+
+class PatchError(Exception):
+    """The model's patch could not be parsed or applied"""
+
+# ============================================
+# CHOOSING WHAT TO SEND
+# ============================================
+
+SECTION_KEYWORDS = {
+    "css": [
+        "color", "colour", "background", "font", "size", "bigger", "smaller", "larger",
+        "padding", "margin", "border", "radius", "rounded", "shadow", "spacing", "align",
+        "center", "centre", "style", "hover", "width", "height", "gradient", "dark",
+        "light", "theme", "bold", "italic", "responsive", "mobile", "layout", "animation",
+        "animate", "transition", "opacity", "red", "blue", "green", "yellow", "purple",
+        "orange", "pink", "black", "white", "gray", "grey", "css"
+    ],
+    "html": [
+        "text", "title", "heading", "label", "add", "remove", "delete", "link", "image",
+        "icon", "logo", "rename", "replace", "item", "section", "menu", "content", "word",
+        "placeholder", "input", "field", "column", "html", "alt", "aria"
+    ],
+    "js": [
+        "click", "toggle", "behavior", "behaviour", "script", "function", "event", "open",
+        "close", "submit", "validate", "validation", "scroll", "interactive", "javascript",
+        "js", "dropdown", "modal", "collapse", "expand"
+    ],
+}
+
+_KEYWORD_RES = {
+    section: re.compile(r"\b(?:" + "|".join(words) + r")\b", re.IGNORECASE)
+    for section, words in SECTION_KEYWORDS.items()
+}
+
+
+def select_sections(code, modification_request):
+    """
+    Pick the code sections a modification is likely to touch
+
+    Args:
+        code (dict): Current html/css/js
+        modification_request (str): What the user wants to change
+
+    Returns:
+        list: Section names to send to the model (every non-empty section
+              when the request gives no hint)
+    """
+    wanted = [
+        section for section in SECTIONS
+        if _KEYWORD_RES[section].search(modification_request or "")
+    ]
+    # Empty sections are only worth sending when the request asks for them
+    wanted = [s for s in wanted if code.get(s) or s == "js"]
+    if wanted:
+        return wanted
+    return [s for s in SECTIONS if code.get(s)] or ["html"]
+
+# ============================================
+# PARSING AND APPLYING
+# ============================================
+
+def parse_patch(text, sections=SECTIONS):
+    """
+    Parse the model's answer into a list of edits
+
+    Args:
+        text (str): Raw model response
+        sections (list): Sections the model was shown; edits to any other
+                         section are rejected
+
+    Returns:
+        list: [{"section", "find", "replace"}, ...]
+
+    Raises:
+        PatchError: The answer is not a valid patch
+    """
+    cleaned = (text or "").strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else ""
+        if cleaned.rstrip().endswith("```"):
+            cleaned = cleaned.rstrip()[:-3]
+
+    try:
+        data = json.loads(cleaned)
+    except ValueError as e:
+        raise PatchError(f"Patch is not valid JSON: {e}")
+
+    edits = data.get("edits") if isinstance(data, dict) else data
+    if not isinstance(edits, list):
+        raise PatchError("Patch has no edits list")
+    if not edits:
+        raise PatchError("Patch has no edits")
+
+    for edit in edits:
+        if not isinstance(edit, dict) or edit.get("section") not in SECTIONS:
+            raise PatchError(f"Invalid edit: {edit!r}")
+        if edit["section"] not in sections:
+            raise PatchError(f"Edit to a section that was not shown: {edit['section']}")
+        if not isinstance(edit.get("find", ""), str) or not isinstance(edit.get("replace", ""), str):
+            raise PatchError(f"Edit find/replace must be strings: {edit!r}")
+    return edits
+
+
+def _locate(text, find):
+    """
+    Find the single place an edit applies to
+
+    Exact match first; if that fails, a match that ignores differences in
+    whitespace (models often re-indent the text they quote).
+
+    Returns:
+        tuple: (start, end)
+    """
+    count = text.count(find)
+    if count == 1:
+        start = text.index(find)
+        return start, start + len(find)
+    if count > 1:
+        raise PatchError(f"Edit matches {count} places: {find[:60]!r}")
+
+    tokens = find.split()
+    if tokens:
+        pattern = re.compile(r"\s*".join(re.escape(token) for token in tokens))
+        matches = list(pattern.finditer(text))
+        if len(matches) == 1:
+            return matches[0].span()
+        if matches:
+            raise PatchError(f"Edit matches {len(matches)} places: {find[:60]!r}")
+    raise PatchError(f"Edit does not match the code: {find[:60]!r}")
+
+
+def apply_patch(code, edits):
+    """
+    Apply edits to a copy of the code
+
+    Args:
+        code (dict): Current html/css/js
+        edits (list): Output of parse_patch
+
+    Returns:
+        dict: Updated html/css/js
+
+    Raises:
+        PatchError: An edit could not be applied
+    """
+    result = {section: code.get(section) or "" for section in SECTIONS}
+
+    for edit in edits:
+        section = edit["section"]
+        find = edit.get("find", "")
+        replace = edit.get("replace", "")
+        text = result[section]
+
+        if not find:
+            result[section] = f"{text}\n{replace}" if text else replace
+            continue
+
+        start, end = _locate(text, find)
+        result[section] = text[:start] + replace + text[end:]
+
+    return result
+
+# ============================================
+# VALIDATION
+# ============================================
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr"
+}
+
+
+class _TagBalance(HTMLParser):
+    """Counts unclosed/unexpected tags"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.errors = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        if tag in self.stack:
+            # Implicitly closed elements (<li>, <p>) are tolerated
+            while self.stack.pop() != tag:
+                pass
+        else:
+            self.errors += 1
+
+
+def _html_problems(html):
+    parser = _TagBalance()
+    parser.feed(html)
+    parser.close()
+    return parser.errors + len(parser.stack)
+
+
+_CSS_NOISE_RE = re.compile(r"/\*.*?\*/|\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'", re.DOTALL)
+_JS_NOISE_RE = re.compile(
+    r"/\*.*?\*/|//[^\n]*|`(?:\\.|[^`\\])*`|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'",
+    re.DOTALL
+)
+_PAIRS = {"}": "{", ")": "(", "]": "["}
+
+
+def _bracket_problems(text, noise_re):
+    """Unbalanced brackets after removing comments and strings"""
+    stack = []
+    errors = 0
+    for char in noise_re.sub("", text):
+        if char in "{([":
+            stack.append(char)
+        elif char in _PAIRS:
+            if stack and stack[-1] == _PAIRS[char]:
+                stack.pop()
+            else:
+                errors += 1
+    return errors + len(stack)
+
+
+def code_problems(code):
+    """
+    Rough structural problem count per section
+
+    Returns:
+        dict: section -> number of unbalanced tags/brackets
+    """
+    return {
+        "html": _html_problems(code.get("html") or ""),
+        "css": _bracket_problems(code.get("css") or "", _CSS_NOISE_RE),
+        "js": _bracket_problems(code.get("js") or "", _JS_NOISE_RE),
+    }
+
+
+def validate_patch_result(before, after):
+    """
+    Check that a patch did not break the code's structure
+
+    Sections that were already unbalanced before the patch are only
+    required not to get worse.
+
+    Returns:
+        list: Problem descriptions (empty when the result is fine)
+    """
+    old, new = code_problems(before), code_problems(after)
+    return [
+        f"{section}: {new[section]} unbalanced tag(s)/bracket(s) after the patch"
+        for section in SECTIONS
+        if new[section] > old[section]
+    ]
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Patching...\n")
+
+    code = {
+        "html": '<nav class="nav">\n  <a class="nav__link" href="#">Home</a>\n</nav>',
+        "css": ".nav {\n  background: blue;\n  padding: 1rem;\n}\n.nav__link { color: white; }",
+        "js": ""
+    }
+
+    sections = select_sections(code, "Make the navbar background red")
+    print(f"1. Sections for a colour change: {sections}")
+
+    patch = json.dumps({"edits": [
+        {"section": "css", "find": "background:   blue;", "replace": "background: red;"}
+    ]})
+    updated = apply_patch(code, parse_patch(patch))
+    ok = "background: red;" in updated["css"] and updated["html"] == code["html"]
+    print(f"2. {'✅' if ok else '❌'} Whitespace-tolerant edit applied")
+
+    try:
+        apply_patch(code, [{"section": "css", "find": "margin: 0;", "replace": ""}])
+        print("3. ❌ Missing anchor was accepted")
+    except PatchError as e:
+        print(f"3. ✅ Missing anchor rejected: {e}")
+
+    broken = apply_patch(code, [{"section": "css", "find": "padding: 1rem;\n}", "replace": "padding: 1rem;"}])
+    problems = validate_patch_result(code, broken)
+    print(f"4. {'✅' if problems else '❌'} Broken CSS detected: {problems}")
+
+    for number, (text, shown, label) in enumerate([
+        ('{"edits": []}', sections, "Empty patch"),
+        ('{"edits": [{"section": "html", "find": "Home", "replace": "Start"}]}', ["css"],
+         "Edit to a section that was not shown"),
+    ], start=5):
+        try:
+            parse_patch(text, shown)
+            print(f"{number}. ❌ {label} was accepted")
+        except PatchError as e:
+            print(f"{number}. ✅ {label} rejected: {e}")
+
+    print("\n✅ Patching working!")
@@ -3,8 +3,14 @@ Prompt Templates for AI Code Generation
 
 This file contains all the prompt templates used to generate UI components.
 Each template is carefully crafted to get the best results from AI.
+Generation prompts are pre-rendered per (component type, theme) at import,
+so a request only splices in the user's text.
 """
 
+import re
+
+import metrics
+
 # ============================================
 # COMPONENT TYPE TEMPLATES
 # ============================================
@@ -128,39 +134,10 @@ Use a MINIMAL theme with:
 }
 
 # ============================================
-# MAIN PROMPT GENERATION FUNCTION
+# PRECOMPILED GENERATION PROMPTS
 # ============================================
 
-def get_ui_generation_prompt(user_prompt, component_type="general"):
-    """
-    Generate a complete prompt for UI generation
-    
-    Args:
-        user_prompt (str): User's description
-        component_type (str): Type of component to generate
-    
-    Returns:
-        str: Complete, optimized prompt for AI
-    """
-    
-    # Get component template
-    component_template = COMPONENT_TEMPLATES.get(
-        component_type.lower(), 
-        COMPONENT_TEMPLATES["general"]
-    )
-    
-    # Detect theme from user prompt
-    theme = detect_theme(user_prompt)
-    theme_description = STYLE_THEMES.get(theme, "")
-    
-    # Build the complete prompt
-    prompt = f"""
-{component_template}
-
-USER REQUEST: {user_prompt}
-
-{theme_description}
-
+GENERATION_REQUIREMENTS = """
 REQUIREMENTS:
 1. Generate clean, semantic HTML5 code
 2. Use modern CSS with flexbox/grid for layout
@@ -173,54 +150,204 @@ REQUIREMENTS:
 
 IMPORTANT OUTPUT FORMAT:
 Return ONLY valid JSON in this exact format (no markdown, no explanations):
-{{
+{
   "html": "<!-- Your HTML code here -->",
   "css": "/* Your CSS code here */",
   "js": "// Your JavaScript code here (or empty string if not needed)"
-}}
+}
 
 Generate professional, production-ready code that can be used immediately.
 """
+
+
+def _render_generation_parts(component_template, theme_description):
+    """
+    Split one generation prompt around the user's request
     
-    return prompt.strip()
+    Returns:
+        tuple: (head, tail) - the full prompt is head + user_prompt + tail
+    """
+    head = f"{component_template}\n\nUSER REQUEST: ".lstrip()
+    tail = f"\n\n{theme_description}\n{GENERATION_REQUIREMENTS}".rstrip()
+    return head, tail
+
+
+# Every (component_type, theme) prompt, rendered once at import
+# (theme None = no theme section)
+_GENERATION_PARTS = {
+    (component_type, theme): _render_generation_parts(template, STYLE_THEMES.get(theme, ""))
+    for component_type, template in COMPONENT_TEMPLATES.items()
+    for theme in list(STYLE_THEMES) + [None]
+}
 
 # ============================================
-# THEME DETECTION
+# MAIN PROMPT GENERATION FUNCTION
 # ============================================
 
-def detect_theme(user_prompt):
+def get_ui_generation_prompt(user_prompt, component_type="general", theme=None):
     """
-    Detect the theme/style from user's prompt
+    Generate a complete prompt for UI generation
     
     Args:
         user_prompt (str): User's description
+        component_type (str): Type of component to generate
+        theme (str): Theme if already known (detected from the prompt otherwise)
     
     Returns:
-        str: Detected theme name
+        str: Complete, optimized prompt for AI
     """
-    prompt_lower = user_prompt.lower()
+    with metrics.stage("prompt_build"):
+        component_type = resolve_component_type(component_type)
+        if theme is None:
+            theme = detect_theme(user_prompt)
+        
+        parts = _GENERATION_PARTS.get((component_type, theme))
+        if parts is None:
+            parts = _GENERATION_PARTS[(component_type, None)]
+        
+        head, tail = parts
+        return head + user_prompt + tail
+
+# ============================================
+# COMPONENT TYPE RESOLUTION
+# ============================================
+
+def resolve_component_type(component_type):
+    """
+    Map a requested component type to a known template name
     
-    # Check for specific keywords
-    if any(word in prompt_lower for word in ["dark", "black", "night", "noir"]):
-        return "dark"
+    Args:
+        component_type (str): Type sent by the client
     
-    if any(word in prompt_lower for word in ["gaming", "neon", "futuristic", "cyber"]):
-        return "gaming"
+    Returns:
+        str: Template key (unknown types fall back to "general")
+    """
+    component_type = (component_type or "general").lower()
+    if component_type in COMPONENT_TEMPLATES:
+        return component_type
+    return "general"
+
+# ============================================
+# THEME DETECTION
+# ============================================
+
+# Keywords per theme, highest priority first: a prompt that mentions
+# several themes gets the earliest one in this list
+THEME_KEYWORDS = [
+    ("dark", ["dark", "darker", "black", "night", "noir"]),
+    ("gaming", ["gaming", "gamer", "neon", "futuristic", "cyber", "cyberpunk"]),
+    ("light", ["bright background"]),
+    ("colorful", ["colorful", "colourful", "vibrant", "rainbow", "bright"]),
+    ("minimal", ["minimal", "simple", "clean", "minimalist"]),
+    ("corporate", ["corporate", "professional", "business"]),
+    ("light", ["light", "lighter", "white"]),
+]
+
+DEFAULT_THEME = "dark"
+
+# keyword -> (priority, theme)
+_THEME_BY_KEYWORD = {}
+for _priority, (_theme, _words) in enumerate(THEME_KEYWORDS):
+    for _word in _words:
+        _THEME_BY_KEYWORD.setdefault(_word, (_priority, _theme))
+
+
+def _keyword_pattern(words):
+    """
+    Regex alternation of words, factored into a prefix tree
     
-    if any(word in prompt_lower for word in ["colorful", "vibrant", "rainbow", "bright"]):
-        return "colorful"
+    "dark|darker" becomes "dark(?:er)?", so the regex engine branches once
+    per character instead of trying every keyword at every position.
+    """
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def render(node):
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + render(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+    
+    return render(tree)
+
+
+# One word-boundary pattern for every keyword, matched against lowercased
+# text. The longest match wins, so "bright background" is read as a phrase
+# rather than as "bright".
+_THEME_RE = re.compile(r"\b(?:" + _keyword_pattern(_THEME_BY_KEYWORD) + r")\b")
+
+
+def _keyword_rank(keyword):
+    """(priority, theme) of one matched keyword"""
+    rank = _THEME_BY_KEYWORD.get(keyword)
+    if rank is None:  # a phrase with unusual whitespace
+        rank = _THEME_BY_KEYWORD[" ".join(keyword.split())]
+    return rank
+
+
+def detect_theme(user_prompt):
+    """
+    Detect the theme/style from user's prompt
     
-    if any(word in prompt_lower for word in ["minimal", "simple", "clean", "minimalist"]):
-        return "minimal"
+    Keywords only match whole words, so "blackboard" is not dark and
+    "brightness" is not colorful.
     
-    if any(word in prompt_lower for word in ["corporate", "professional", "business"]):
-        return "corporate"
+    Args:
+        user_prompt (str): User's description
     
-    if any(word in prompt_lower for word in ["light", "white", "bright background"]):
-        return "light"
+    Returns:
+        str: Detected theme name
+    """
+    best = None
+    for keyword in _THEME_RE.findall((user_prompt or "").lower()):
+        rank = _keyword_rank(keyword)
+        if best is None or rank < best:
+            best = rank
+            if rank[0] == 0:
+                break
     
     # Default theme
-    return "dark"
+    return best[1] if best else DEFAULT_THEME
+
+
+def detect_themes(user_prompts):
+    """
+    Detect the theme of many prompts at once
+    
+    Same rules as detect_theme, with the lookups bound once for the whole
+    batch and repeated prompts classified only once. Used when warming
+    indexes and classifying batches.
+    
+    Args:
+        user_prompts (list): User descriptions
+    
+    Returns:
+        list: Theme name per prompt, in input order
+    """
+    findall = _THEME_RE.findall
+    themes = []
+    seen = {}
+    
+    for prompt in user_prompts:
+        theme = seen.get(prompt)
+        if theme is None:
+            best = None
+            for keyword in findall((prompt or "").lower()):
+                rank = _keyword_rank(keyword)
+                if best is None or rank < best:
+                    best = rank
+            theme = seen[prompt] = best[1] if best else DEFAULT_THEME
+        themes.append(theme)
+    
+    return themes
 
 # ============================================
 # MODIFICATION PROMPT
@@ -272,6 +399,57 @@ Generate the complete updated code.
     
     return prompt.strip()
 
+# ============================================
+# PATCH PROMPT (small modifications)
+# ============================================
+
+SECTION_TITLES = {"html": "HTML", "css": "CSS", "js": "JS"}
+
+def get_patch_prompt(current_code, modification_request, sections):
+    """
+    Generate prompt asking for a compact patch instead of a full rewrite
+    
+    Args:
+        current_code (dict): Current HTML/CSS/JS code
+        modification_request (str): What user wants to change
+        sections (list): Sections to show the model (see patching.select_sections)
+    
+    Returns:
+        str: Complete prompt for a patch
+    """
+    shown = "\n\n".join(
+        f"{SECTION_TITLES[section]}:\n{current_code.get(section) or '(empty)'}"
+        for section in sections
+    )
+    section_names = ", ".join(f'"{section}"' for section in sections)
+    
+    prompt = f"""
+You are making a small change to existing code based on user request.
+
+CURRENT CODE (only the relevant sections):
+{shown}
+
+USER MODIFICATION REQUEST: {modification_request}
+
+INSTRUCTIONS:
+1. Change only what the request needs
+2. Describe the change as search/replace edits on the code above
+3. "find" must be copied exactly from the current code and match only once
+4. Keep each "find" short: just enough lines to be unique
+5. Use an empty "find" to append new code to a section
+6. Only edit these sections: {section_names}
+
+IMPORTANT OUTPUT FORMAT:
+Return ONLY valid JSON in this exact format (no markdown, no explanations):
+{{
+  "edits": [
+    {{"section": "css", "find": "exact existing text", "replace": "new text"}}
+  ]
+}}
+"""
+    
+    return prompt.strip()
+
 # ============================================
 # HELP/QUESTION ANSWERING PROMPT
 # ============================================
@@ -335,8 +513,25 @@ if __name__ == "__main__":
         print(f"   '{test}' → Theme: {theme}")
     print()
     
-    # Test 3: Modification Prompt
-    print("3. Testing Modification Prompt:")
+    # Test 3: Word boundaries and batch detection
+    print("3. Testing Word Boundaries and Batch Detection:")
+    print("-" * 50)
+    tricky = {
+        "A simple blackboard style card": "minimal",
+        "Corporate slider to adjust brightness": "corporate",
+        "Hero on a bright background": "light",
+        "Cyberpunk gaming navbar, dark": "dark",
+        "Clean business footer": "minimal",
+    }
+    for test, expected in tricky.items():
+        theme = detect_theme(test)
+        print(f"   {'✅' if theme == expected else '❌'} '{test}' → Theme: {theme}")
+    batch_ok = detect_themes(list(tricky)) == [detect_theme(t) for t in tricky]
+    print(f"   {'✅' if batch_ok else '❌'} detect_themes matches detect_theme")
+    print()
+    
+    # Test 4: Modification Prompt
+    print("4. Testing Modification Prompt:")
     print("-" * 50)
     current_code = {
         "html": "<button>Click me</button>",
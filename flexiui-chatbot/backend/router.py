@@ -0,0 +1,308 @@
+"""
+Model Router for FlexiUI
+
+Picks the model for each upstream call instead of sending everything to
+the largest one. The decision goes:
+
+1. Route table: component_type -> tier ("small" or "large"), tier -> model
+2. The prompt adjusts it: long or feature-heavy prompts for a small-tier
+   type are escalated, tiny plain ones for a large-tier type are demoted
+3. What the router has seen adjusts it again:
+   - a small model that keeps producing unusable output for a type
+     (missing/partial sections) is skipped for that type
+   - a model whose recent p95 latency for a type breaks its SLO is
+     replaced by its fallback model
+   A small share of requests still go to the skipped model, so its numbers
+   keep up to date and the router switches back once it recovers. Outcomes
+   also age out (max_sample_age_s), so a type with little traffic goes back
+   to its table model once a breach is old, without waiting for enough
+   probes to outvote it.
+
+Outcomes come from the app (record()) and, at startup, from GenerationLog
+rows of earlier runs (load_history()).
+
+The table can be overridden with FLEXIUI_MODEL_ROUTES (JSON, or a path to
+a JSON file); top-level keys replace the defaults.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import deque
+
+from history import estimate_tokens
+
+SMALL_MODEL = "llama-3.1-8b-instant"
+LARGE_MODEL = "llama-3.3-70b-versatile"
+
+DEFAULT_ROUTES = {
+    "models": {"small": SMALL_MODEL, "large": LARGE_MODEL},
+    "types": {
+        "button": "small", "card": "small", "probe": "small",
+        "hero": "large", "navbar": "large", "footer": "large", "form": "large",
+        "general": "large", "chat": "large", "modify": "large",
+    },
+    # Small-tier requests above either limit go to the large tier
+    "escalate": {"prompt_tokens": 80, "features": 3},
+    # Large-tier generations at or below both limits go to the small tier
+    "demote": {"prompt_tokens": 12, "features": 0, "types": ["general"]},
+    # p95 seconds per (model, type) before falling back, and to what
+    "slo_seconds": {LARGE_MODEL: 10.0},
+    "fallback": {LARGE_MODEL: SMALL_MODEL},
+    "max_parse_failure_rate": 0.2,
+    "min_samples": 20,
+    # Outcomes older than this are forgotten (seconds, 0 = keep the window)
+    "max_sample_age_s": 900,
+    # Share of requests still sent to a model the rules above avoid
+    "probe_share": 0.05,
+}
+
+# Features that make a component harder to get right
+_FEATURE_RE = re.compile(
+    r"\b(animat\w*|carousel|slider|modal|dropdown|tabs?|accordion|validat\w*|charts?|graphs?|"
+    r"dashboard|tables?|pagination|multi-?step|wizard|drag|parallax|countdown|timer|search|"
+    r"filter\w*|sort\w*|checkout|cart|dark mode|toggle|login|sign ?up|upload|calendar|map)\b",
+    re.IGNORECASE
+)
+
+
+def count_features(prompt):
+    """Distinct complexity features mentioned in a prompt"""
+    return len({match.lower() for match in _FEATURE_RE.findall(prompt or "")})
+
+
+def load_routes():
+    """Default table with FLEXIUI_MODEL_ROUTES applied on top"""
+    routes = dict(DEFAULT_ROUTES)
+    override = os.getenv("FLEXIUI_MODEL_ROUTES", "").strip()
+    if override:
+        if not override.startswith("{"):
+            with open(override) as f:
+                override = f.read()
+        routes.update(json.loads(override))
+    return routes
+
+
+class _Outcomes:
+    """Recent (time, latency, parse_failed) outcomes of one (model, component_type), oldest first"""
+
+    __slots__ = ("samples",)
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+
+
+class ModelRouter:
+    """
+    Chooses a model per request and learns from how its choices went
+    """
+
+    def __init__(self, routes=None, window=100, rng=None):
+        """
+        Args:
+            routes (dict): Route table (see DEFAULT_ROUTES)
+            window (int): Outcomes remembered per (model, type)
+            rng (random.Random): For probe sampling (tests)
+        """
+        self.routes = routes or dict(DEFAULT_ROUTES)
+        self.window = window
+        self._rng = rng or random.Random()
+        self._outcomes = {}
+        self._decisions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(routes=load_routes())
+
+    @property
+    def default_model(self):
+        return self.routes["models"]["large"]
+
+    # ---------- decisions ----------
+
+    def route(self, component_type, prompt=""):
+        """
+        Pick the model for one request
+
+        Args:
+            component_type (str): Resolved component type, or "chat",
+                                  "modify", "probe"
+            prompt (str): The user's prompt or message
+
+        Returns:
+            dict: model, tier, reason ("table", "long_prompt",
+                  "complex_prompt", "short_prompt", "parse_failures",
+                  "slo_fallback" or "probe"), and the table's model as
+                  "primary" (stable across fallbacks, used in cache keys)
+        """
+        routes = self.routes
+        tier = routes["types"].get(component_type, "large")
+        reason = "table"
+
+        tokens = estimate_tokens(prompt)
+        features = count_features(prompt)
+        escalate, demote = routes["escalate"], routes["demote"]
+        if tier == "small":
+            if tokens > escalate["prompt_tokens"]:
+                tier, reason = "large", "long_prompt"
+            elif features >= escalate["features"]:
+                tier, reason = "large", "complex_prompt"
+        elif (component_type in demote.get("types", ()) and tokens <= demote["prompt_tokens"]
+              and features <= demote["features"]):
+            tier, reason = "small", "short_prompt"
+
+        primary = routes["models"][tier]
+        model = primary
+
+        if tier == "small" and self._parse_failure_rate(model, component_type) > routes["max_parse_failure_rate"]:
+            if self._rng.random() >= routes["probe_share"]:
+                tier, reason = "large", "parse_failures"
+                model = routes["models"]["large"]
+            else:
+                reason = "probe"
+
+        slo = routes["slo_seconds"].get(model)
+        fallback = routes["fallback"].get(model)
+        if slo and fallback and (self._p95(model, component_type) or 0) > slo:
+            if self._rng.random() >= routes["probe_share"]:
+                model, reason = fallback, "slo_fallback"
+            else:
+                reason = "probe"
+
+        with self._lock:
+            key = (model, reason)
+            self._decisions[key] = self._decisions.get(key, 0) + 1
+        return {"model": model, "tier": tier, "reason": reason, "primary": primary}
+
+    # ---------- learning ----------
+
+    def record(self, model, component_type, latency, parse_failed=False, at=None):
+        """
+        Remember how an upstream call went
+
+        Args:
+            model (str): Model that answered
+            component_type (str): Type the request was routed for
+            latency (float): Seconds the upstream call took
+            parse_failed (bool): The answer had missing/partial sections or no code
+            at (float): When the call was made (Unix time, default now)
+        """
+        with self._lock:
+            outcomes = self._outcomes.get((model, component_type))
+            if outcomes is None:
+                outcomes = self._outcomes[(model, component_type)] = _Outcomes(self.window)
+            outcomes.samples.append((time.time() if at is None else at, latency, bool(parse_failed)))
+
+    def load_history(self, rows):
+        """
+        Seed latencies from earlier runs (oldest first)
+
+        Args:
+            rows (iterable): (model, component_type, seconds, Unix time) of
+                             GenerationLog rows served by the upstream
+        """
+        for model, component_type, seconds, at in rows:
+            if model and seconds is not None:
+                self.record(model, component_type, seconds, at=at)
+
+    def _recent(self, model, component_type):
+        """Outcomes young enough to count (caller holds the lock)"""
+        outcomes = self._outcomes.get((model, component_type))
+        if outcomes is None:
+            return ()
+        max_age = self.routes.get("max_sample_age_s", 0)
+        if max_age:
+            oldest = time.time() - max_age
+            while outcomes.samples and outcomes.samples[0][0] < oldest:
+                outcomes.samples.popleft()
+        return outcomes.samples
+
+    def _p95(self, model, component_type):
+        with self._lock:
+            samples = self._recent(model, component_type)
+            if len(samples) < self.routes["min_samples"]:
+                return None
+            ordered = sorted(latency for _, latency, _ in samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def _parse_failure_rate(self, model, component_type):
+        with self._lock:
+            samples = self._recent(model, component_type)
+            if len(samples) < self.routes["min_samples"]:
+                return 0.0
+            return sum(failed for _, _, failed in samples) / len(samples)
+
+    def stats(self):
+        """Decision counts and what the router has learned per (model, type)"""
+        with self._lock:
+            decisions = dict(self._decisions)
+            keys = list(self._outcomes)
+        return {
+            "decisions": [
+                {"model": model, "reason": reason, "count": count}
+                for (model, reason), count in sorted(decisions.items())
+            ],
+            "models": [
+                {
+                    "model": model,
+                    "component_type": component_type,
+                    "samples": len(self._outcomes[(model, component_type)].samples),
+                    "p95_s": self._p95(model, component_type),
+                    "parse_failure_rate": round(self._parse_failure_rate(model, component_type), 3)
+                }
+                for model, component_type in sorted(keys)
+            ]
+        }
+
+
+# Shared router used by ai_service
+model_router = ModelRouter.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Model Router...\n")
+
+    router = ModelRouter(rng=random.Random(1))
+
+    cases = [
+        ("button", "A red button", SMALL_MODEL, "table"),
+        ("button", "A button that opens a modal with tabs and form validation", LARGE_MODEL, "complex_prompt"),
+        ("navbar", "Dark navbar with logo", LARGE_MODEL, "table"),
+        ("general", "A badge", SMALL_MODEL, "short_prompt"),
+        ("probe", "Say 'hello' if you're working!", SMALL_MODEL, "table"),
+    ]
+    for n, (component_type, prompt, model, reason) in enumerate(cases, 1):
+        decision = router.route(component_type, prompt)
+        ok = decision["model"] == model and decision["reason"] == reason
+        print(f"{n}. {'✅' if ok else '❌'} {component_type}: {prompt!r} -> {decision['model']} ({decision['reason']})")
+
+    for _ in range(30):
+        router.record(LARGE_MODEL, "navbar", 14.0)
+    decisions = [router.route("navbar", "Dark navbar")["reason"] for _ in range(200)]
+    ok = decisions.count("slo_fallback") > 170 and "probe" in decisions
+    print(f"6. {'✅' if ok else '❌'} SLO breach: {decisions.count('slo_fallback')}/200 fell back to "
+          f"{SMALL_MODEL}, {decisions.count('probe')} probes")
+
+    for _ in range(30):
+        router.record(SMALL_MODEL, "card", 1.0, parse_failed=True)
+    decision = router.route("card", "A product card")
+    print(f"7. {'✅' if decision['reason'] in ('parse_failures', 'probe') else '❌'} Unreliable small model "
+          f"for cards -> {decision['model']} ({decision['reason']})")
+
+    router = ModelRouter(rng=random.Random(1))
+    long_ago = time.time() - 2 * DEFAULT_ROUTES["max_sample_age_s"]
+    for _ in range(30):
+        router.record(LARGE_MODEL, "hero", 14.0, at=long_ago)
+    decision = router.route("hero", "A hero section")
+    print(f"8. {'✅' if decision['reason'] == 'table' else '❌'} An old SLO breach is forgotten "
+          f"-> {decision['model']} ({decision['reason']})")
+
+    print(f"\n   {router.stats()['models']}")
+    print("\n✅ Model router working!")
@@ -0,0 +1,325 @@
+"""
+Full-Text Search over Saved Projects for FlexiUI
+
+An SQLite FTS5 table (project_search) indexes each project's name, prompt
+and the visible text of its generated HTML, with the project id as rowid.
+The app's write path (save/modify) calls index_project(); a trigger removes
+the entry when a project row is deleted.
+
+Results are ranked with bm25 (name > prompt > page text) and come with a
+snippet around the best match, highlighted with <mark> (everything else in
+the snippet is HTML-escaped). bm25 has to score every match, so only the
+newest RANK_WINDOW matches are ranked: very common words stay fast, at the
+cost of older matches not competing for the first pages.
+
+Databases without FTS5 (other engines, or SQLite built without it) fall
+back to a LIKE scan over name and prompt.
+"""
+
+import os
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from sqlalchemy import text
+
+from blobs import code_blobs
+from models import Project
+
+FTS_TABLE = "project_search"
+
+# Only the start of a large page's text is indexed
+MAX_CONTENT_CHARS = 20000
+
+# bm25 weights for (name, prompt, content)
+RANK_WEIGHTS = (5.0, 3.0, 1.0)
+
+# Only the newest this-many matches are ranked, so a query matching most
+# of the table costs the same as one matching a few thousand projects
+RANK_WINDOW = int(os.getenv("FLEXIUI_SEARCH_RANK_WINDOW", 2000))
+
+# Snippet markers (control characters, removed from the indexed text)
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_TERM_RE = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+# ============================================
+# INDEXED TEXT
+# ============================================
+
+class _TextExtractor(HTMLParser):
+    """Collects the visible text of an HTML fragment"""
+
+    SKIP = {"script", "style", "template"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+        for name, value in attrs:
+            if name in ("alt", "title", "placeholder", "aria-label") and value:
+                self.parts.append(value)
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_text(html):
+    """
+    Visible text of generated HTML (tags, scripts and styles removed)
+
+    Returns:
+        str: Whitespace-collapsed text, at most MAX_CONTENT_CHARS long
+    """
+    if not html:
+        return ""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return " ".join(" ".join(extractor.parts).split())[:MAX_CONTENT_CHARS]
+
+
+def _indexable(value):
+    # The snippet markers must not appear in indexed text
+    return (value or "").replace(_MARK_START, "").replace(_MARK_END, "")
+
+
+_fts_support = {}  # engine url -> bool
+
+
+def fts_available(conn):
+    """True when the database can hold the FTS5 index"""
+    url = str(conn.engine.url)
+    if url not in _fts_support:
+        _fts_support[url] = conn.dialect.name == "sqlite" and "ENABLE_FTS5" in (
+            conn.exec_driver_sql("PRAGMA compile_options").scalars().all()
+        )
+    return _fts_support[url]
+
+
+def ensure_search_index(conn):
+    """
+    Create the FTS5 table and its delete trigger, and index existing
+    projects the first time (one-time migration)
+
+    Returns:
+        int: Projects indexed now (0 when the index already existed or
+             FTS5 is unavailable)
+    """
+    if not fts_available(conn):
+        return 0
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {"name": FTS_TABLE}).first()
+    if exists:
+        return 0
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"name, prompt, content, tokenize = 'porter unicode61 remove_diacritics 2')"
+    ))
+    # Make ORDER BY rank use the weighted bm25
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+        f"VALUES ('rank', 'bm25({', '.join(map(str, RANK_WEIGHTS))})')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS projects_search_delete AFTER DELETE ON projects "
+        f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ))
+
+    table = Project.__table__
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            table.select().with_only_columns(table.c.id, table.c.name, table.c.prompt, table.c.html_hash)
+            .where(table.c.id > last_id).order_by(table.c.id).limit(1000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        html = code_blobs.get_many(conn, [row.html_hash for row in rows])
+        index_projects(conn, [
+            (row.id, row.name, row.prompt, html.get(row.html_hash, "")) for row in rows
+        ])
+        indexed += len(rows)
+    return indexed
+
+
+def index_projects(conn, projects):
+    """
+    Add or replace index entries
+
+    Args:
+        conn: SQLAlchemy connection (the caller's transaction)
+        projects (list): (project_id, name, prompt, html) tuples
+    """
+    if not projects or not fts_available(conn):
+        return
+    conn.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"),
+                 [{"id": project_id} for project_id, *_ in projects])
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, prompt, content) "
+        f"VALUES (:id, :name, :prompt, :content)"
+    ), [
+        {
+            "id": project_id, "name": _indexable(name), "prompt": _indexable(prompt),
+            "content": _indexable(html_text(html))
+        }
+        for project_id, name, prompt, html in projects
+    ])
+
+
+def index_project(conn, project_id, name, prompt, html):
+    """Add or replace one project's index entry"""
+    index_projects(conn, [(project_id, name, prompt, html)])
+
+# ============================================
+# QUERIES
+# ============================================
+
+def fts_query(query):
+    """
+    Turn user input into an FTS5 query
+
+    Every word must match; a word ending in * matches as a prefix
+    ("glass*"). Words are quoted, so any other FTS5 syntax in the input is
+    just text.
+
+    Returns:
+        str: MATCH expression, or "" if the input has no words
+    """
+    return " ".join(
+        f'"{term}"*' if star else f'"{term}"'
+        for term, star in _TERM_RE.findall(query or "")
+    )
+
+
+def _highlight(snippet):
+    return escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search_projects(conn, query, limit=20, offset=0):
+    """
+    Ranked project search
+
+    Results are ordered by bm25 among the newest RANK_WINDOW matches (all
+    matches when there are fewer).
+
+    Args:
+        conn: SQLAlchemy connection
+        query (str): User's search text
+        limit (int): Results per page
+        offset (int): Results to skip
+
+    Returns:
+        tuple: (results, has_more). Each result has id, name,
+               component_type, created_at, snippet and score
+               (lower is better; None for the LIKE fallback)
+    """
+    match = fts_query(query)
+    if not match:
+        return [], False
+
+    if fts_available(conn):
+        rows = conn.execute(text(
+            f"SELECT p.id, p.name, p.component_type, p.created_at, "
+            f"snippet({FTS_TABLE}, -1, :start, :end, '…', 16) AS snippet, rank AS score "
+            f"FROM {FTS_TABLE} JOIN projects p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match AND {FTS_TABLE}.rowid >= ("
+            f"  SELECT min(rowid) FROM ("
+            f"    SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+            f"    ORDER BY rowid DESC LIMIT :window)"
+            f") ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {
+            "start": _MARK_START, "end": _MARK_END, "match": match, "window": RANK_WINDOW,
+            "limit": limit + 1, "offset": offset
+        }).all()
+    else:
+        table = Project.__table__
+        query_filter = [
+            (table.c.name.ilike(f"%{term}%") | table.c.prompt.ilike(f"%{term}%"))
+            for term, _ in _TERM_RE.findall(query)
+        ]
+        rows = conn.execute(
+            table.select().with_only_columns(
+                table.c.id, table.c.name, table.c.component_type, table.c.created_at,
+                table.c.prompt.label("snippet"), text("NULL AS score")
+            ).where(*query_filter).order_by(table.c.created_at.desc())
+            .limit(limit + 1).offset(offset)
+        ).all()
+
+    results = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "component_type": row.component_type,
+            "created_at": _isoformat(row.created_at),
+            "snippet": (
+                _highlight(row.snippet or "") if row.score is not None
+                else escape((row.snippet or "")[:200])
+            ),
+            "score": round(row.score, 4) if row.score is not None else None
+        }
+        for row in rows[:limit]
+    ]
+    return results, len(rows) > limit
+
+
+def _isoformat(value):
+    # Raw SQL returns SQLite DATETIME columns as strings
+    if value is None or isinstance(value, str):
+        return value.replace(" ", "T") if value else value
+    return value.isoformat()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+    from models import CodeBlob
+
+    print("Testing Search...\n")
+
+    engine = create_engine("sqlite://")
+    Project.__table__.create(engine)
+    CodeBlob.__table__.create(engine)
+
+    with engine.begin() as conn:
+        conn.execute(Project.__table__.insert(), [
+            {"id": 1, "name": "Pricing table", "prompt": "Create a pricing table with three plans"},
+            {"id": 2, "name": "Login form", "prompt": "A login form with email and password"},
+            {"id": 3, "name": "Navbar", "prompt": "Responsive navbar for a bakery"},
+        ])
+        ensure_search_index(conn)
+        index_project(conn, 2, "Login form", "A login form with email and password",
+                      '<form><label>Email</label><input placeholder="you@example.com">'
+                      '<button>Sign in</button><script>var pricing = 1;</script></form>')
+
+        results, _ = search_projects(conn, "pricing plans")
+        print(f"1. {'✅' if [r['id'] for r in results] == [1] else '❌'} 'pricing plans' -> {results}")
+
+        results, _ = search_projects(conn, "sign")
+        print(f"2. {'✅' if [r['id'] for r in results] == [2] else '❌'} Page text indexed "
+              f"(script skipped): {results[0]['snippet'] if results else None}")
+
+        results, _ = search_projects(conn, '("bak*')
+        print(f"3. {'✅' if [r['id'] for r in results] == [3] else '❌'} Prefix match, "
+              f"other query syntax ignored: {[r['id'] for r in results]}")
+
+        conn.execute(text("DELETE FROM projects WHERE id = 3"))
+        results, _ = search_projects(conn, "navbar")
+        print(f"4. {'✅' if not results else '❌'} Deleted project left the index")
+
+    print("\n✅ Search working!")
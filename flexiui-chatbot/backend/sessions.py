@@ -0,0 +1,158 @@
+"""
+Server-Side Chat Sessions for FlexiUI
+
+Keeps chat history on the server so clients only send a session id and the
+new message. Messages are stored in an append-only log (ChatMessage); the
+session row carries the rolling summary of turns that no longer fit the
+history budget, so each request reads only the live window instead of the
+whole conversation.
+
+All functions need a Flask app context (they use models.db).
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from models import db, ChatSession, ChatMessage
+
+# Sessions idle longer than this are expired
+SESSION_IDLE_SECONDS = int(os.getenv("FLEXIUI_SESSION_IDLE_SECONDS", 24 * 3600))
+
+# How often idle sessions are purged (seconds)
+PURGE_INTERVAL_SECONDS = 300
+
+_last_purge = datetime.min
+
+# ============================================
+# SESSION LIFECYCLE
+# ============================================
+
+def create_session():
+    """
+    Start a new chat session
+
+    Returns:
+        ChatSession: The new session
+    """
+    purge_idle_sessions()
+
+    session = ChatSession(id=uuid.uuid4().hex)
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def get_session(session_id):
+    """
+    Load an active session
+
+    Returns:
+        ChatSession: The session, or None if unknown or expired
+    """
+    session = db.session.get(ChatSession, session_id)
+    if session is None:
+        return None
+
+    if _is_idle(session, datetime.utcnow()):
+        delete_session(session)
+        return None
+    return session
+
+
+def delete_session(session):
+    """Remove a session and its messages"""
+    ChatMessage.query.filter_by(session_id=session.id).delete()
+    db.session.delete(session)
+    db.session.commit()
+
+
+def purge_idle_sessions(force=False):
+    """
+    Delete sessions idle longer than SESSION_IDLE_SECONDS
+
+    Runs at most every PURGE_INTERVAL_SECONDS unless forced.
+
+    Returns:
+        int: Number of sessions removed
+    """
+    global _last_purge
+    now = datetime.utcnow()
+    if not force and (now - _last_purge).total_seconds() < PURGE_INTERVAL_SECONDS:
+        return 0
+    _last_purge = now
+
+    cutoff = now - timedelta(seconds=SESSION_IDLE_SECONDS)
+    idle_ids = [
+        row.id for row in
+        db.session.query(ChatSession.id).filter(ChatSession.last_active_at < cutoff)
+    ]
+    if not idle_ids:
+        return 0
+
+    ChatMessage.query.filter(ChatMessage.session_id.in_(idle_ids)).delete(synchronize_session=False)
+    ChatSession.query.filter(ChatSession.id.in_(idle_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(idle_ids)
+
+
+def _is_idle(session, now):
+    return (now - session.last_active_at).total_seconds() > SESSION_IDLE_SECONDS
+
+# ============================================
+# HISTORY
+# ============================================
+
+def live_history(session):
+    """
+    Messages not yet folded into the session summary, oldest first
+
+    Returns:
+        list: [{"role": ..., "content": ...}, ...]
+    """
+    rows = db.session.query(ChatMessage.role, ChatMessage.content).filter(
+        ChatMessage.session_id == session.id,
+        ChatMessage.id > (session.summarized_upto or 0)
+    ).order_by(ChatMessage.id).all()
+    return [{"role": role, "content": content} for role, content in rows]
+
+
+def record_turn(session, user_message, bot_response, summary, folded):
+    """
+    Append a user/assistant turn and store the updated rolling summary
+
+    Args:
+        session (ChatSession): The session
+        user_message (str): What the user sent
+        bot_response (str): What the bot answered
+        summary (str): Rolling summary after this turn
+        folded (int): How many of the live messages the summary now covers
+    """
+    if folded:
+        # The summary now also covers the oldest `folded` live messages
+        covered = db.session.query(ChatMessage.id).filter(
+            ChatMessage.session_id == session.id,
+            ChatMessage.id > (session.summarized_upto or 0)
+        ).order_by(ChatMessage.id).offset(folded - 1).limit(1).scalar()
+        if covered is not None:
+            session.summarized_upto = covered
+    session.summary = summary
+
+    db.session.add_all([
+        ChatMessage(session_id=session.id, role="user", content=user_message),
+        ChatMessage(session_id=session.id, role="assistant", content=bot_response)
+    ])
+    session.message_count = (session.message_count or 0) + 2
+    session.last_active_at = datetime.utcnow()
+    db.session.commit()
+
+
+def full_history(session):
+    """
+    Every message of the session (for clients that want to redraw the chat)
+
+    Returns:
+        list: [{"role": ..., "content": ...}, ...]
+    """
+    rows = ChatMessage.query.filter_by(session_id=session.id).order_by(ChatMessage.id).all()
+    return [row.to_dict() for row in rows]
@@ -0,0 +1,278 @@
+"""
+Near-Duplicate Prompt Index for FlexiUI AI Generator
+
+Finds previously generated projects whose prompt is almost the same as a new
+one ("create a dark navbar with a logo" vs "dark nav bar w/ logo please"), so
+the stored code can be served without calling Groq.
+
+How it works:
+- Prompts are normalized (filler words and spaces removed) and cut into
+  character 3-gram shingles
+- Each shingle set gets a MinHash signature, split into LSH bands
+- Only entries sharing a band bucket (and the same component type + theme)
+  are compared with exact Jaccard similarity
+"""
+
+import os
+import re
+import zlib
+import random
+import threading
+
+from cache import normalize_prompt
+
+# Words that don't change what gets generated
+FILLER_WORDS = {
+    "a", "an", "the", "and", "with", "w", "please", "pls", "create", "make",
+    "build", "design", "generate", "give", "me", "i", "want", "need", "some",
+    "for", "of", "to", "can", "you", "could", "would", "like", "us", "that",
+    "has", "have", "it", "which", "component"
+}
+
+SHINGLE_SIZE = 3
+
+_MAX_HASH = (1 << 32) - 1
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# ============================================
+# SHINGLING
+# ============================================
+
+def prompt_shingles(prompt):
+    """
+    Turn a prompt into a set of hashed character shingles
+
+    Args:
+        prompt (str): User's description
+
+    Returns:
+        frozenset: 32-bit shingle hashes
+    """
+    words = [w for w in _WORD_RE.findall(normalize_prompt(prompt)) if w not in FILLER_WORDS]
+    text = "".join(words)
+
+    if len(text) <= SHINGLE_SIZE:
+        return frozenset([zlib.crc32(text.encode("utf-8"))]) if text else frozenset()
+
+    return frozenset(
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    )
+
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets"""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+# ============================================
+# SIMILARITY INDEX
+# ============================================
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index over project prompts
+    """
+
+    def __init__(self, threshold=0.85, num_perm=32, bands=8, seed=42):
+        """
+        Args:
+            threshold (float): Minimum Jaccard score to count as a match
+            num_perm (int): MinHash signature length
+            bands (int): LSH bands (num_perm must divide evenly)
+            seed (int): Seed for the hash permutations
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        # Each "permutation" XORs the shingle hashes with a random mask,
+        # which is much cheaper in Python than (a * x + b) % p
+        rng = random.Random(seed)
+        self._masks = [rng.randrange(0, _MAX_HASH) for _ in range(num_perm)]
+
+        self._entries = {}    # entry id -> (group, shingles)
+        self._by_shingles = {}  # (group, shingles) -> entry id
+        self._buckets = {}    # (group, band no, band values) -> set of entry ids
+        self._lock = threading.Lock()
+
+        # Callable(entry_id) -> dict with html/css/js, set by the app
+        self.loader = None
+
+        self.lookups = 0
+        self.matches = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_SIMILARITY_THRESHOLD - minimum score to serve a neighbour (default 0.85)
+        """
+        return cls(threshold=float(os.getenv("FLEXIUI_SIMILARITY_THRESHOLD", 0.85)))
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------- building ----------
+
+    def signature(self, shingles):
+        """MinHash signature of a shingle set"""
+        return [min(map(mask.__xor__, shingles)) for mask in self._masks]
+
+    def _band_keys(self, group, signature):
+        rows = self.rows
+        return [
+            (group, band, tuple(signature[band * rows:(band + 1) * rows]))
+            for band in range(self.bands)
+        ]
+
+    def add(self, entry_id, prompt, component_type, theme):
+        """
+        Add a generated project to the index
+
+        Args:
+            entry_id (int): Project id (passed back to the loader on a match)
+            prompt (str): Prompt that produced the project
+            component_type (str): Resolved component type
+            theme (str): Detected theme
+        """
+        shingles = prompt_shingles(prompt)
+        if not shingles:
+            return
+
+        group = (component_type, theme)
+
+        with self._lock:
+            # Identical prompts keep a single entry pointing at the newest project
+            previous = self._by_shingles.get((group, shingles))
+            if previous is not None:
+                self._entries.pop(previous, None)
+                self._entries[entry_id] = (group, shingles)
+                self._by_shingles[(group, shingles)] = entry_id
+                for key in self._band_keys(group, self.signature(shingles)):
+                    bucket = self._buckets[key]
+                    bucket.discard(previous)
+                    bucket.add(entry_id)
+                return
+
+            self._entries[entry_id] = (group, shingles)
+            self._by_shingles[(group, shingles)] = entry_id
+            for key in self._band_keys(group, self.signature(shingles)):
+                self._buckets.setdefault(key, set()).add(entry_id)
+
+    def remove(self, entry_id):
+        """Drop a project from the index (nothing happens if it isn't in it)"""
+        with self._lock:
+            entry = self._entries.pop(entry_id, None)
+            if entry is None:
+                return
+            if self._by_shingles.get(entry) == entry_id:
+                del self._by_shingles[entry]
+            group, shingles = entry
+            for key in self._band_keys(group, self.signature(shingles)):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    # ---------- querying ----------
+
+    def lookup(self, prompt, component_type, theme):
+        """
+        Find the most similar stored prompt
+
+        Args:
+            prompt (str): New prompt
+            component_type (str): Resolved component type
+            theme (str): Detected theme
+
+        Returns:
+            tuple: (entry_id, score), or None if nothing is above the threshold
+        """
+        shingles = prompt_shingles(prompt)
+        if not shingles or not self._entries:
+            return None
+
+        group = (component_type, theme)
+        keys = self._band_keys(group, self.signature(shingles))
+
+        with self._lock:
+            self.lookups += 1
+
+            exact = self._by_shingles.get((group, shingles))
+            if exact is not None:
+                self.matches += 1
+                return exact, 1.0
+
+            candidates = set()
+            for key in keys:
+                bucket = self._buckets.get(key)
+                if bucket:
+                    candidates |= bucket
+
+            best_id, best_score = None, 0.0
+            for candidate in candidates:
+                score = jaccard(shingles, self._entries[candidate][1])
+                if score > best_score:
+                    best_id, best_score = candidate, score
+
+            if best_score >= self.threshold:
+                self.matches += 1
+                return best_id, best_score
+        return None
+
+    def find(self, prompt, component_type, theme):
+        """
+        Look up a neighbour and load its code
+
+        Returns:
+            dict: Stored html/css/js of the closest project, or None
+        """
+        match = self.lookup(prompt, component_type, theme)
+        if match is None or self.loader is None:
+            return None
+        return self.loader(match[0])
+
+    def stats(self):
+        """Index size and match counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "buckets": len(self._buckets),
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "threshold": self.threshold
+            }
+
+
+# Shared index used by ai_service (filled by app.py as projects are saved)
+similarity_index = SimilarityIndex.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Similarity Index...\n")
+
+    index = SimilarityIndex()
+    index.add(1, "create a dark navbar with a logo", "navbar", "dark")
+    index.add(2, "pricing card with three tiers", "card", "dark")
+
+    tests = [
+        ("dark nav bar w/ logo please", "navbar", "dark"),
+        ("Create a dark navbar with logo!", "navbar", "dark"),
+        ("dark navbar with a logo", "footer", "dark"),
+        ("hero section with video background", "hero", "dark")
+    ]
+    for prompt, component_type, theme in tests:
+        print(f"   '{prompt}' ({component_type}) → {index.lookup(prompt, component_type, theme)}")
+
+    print(f"\n{index.stats()}")
+    print("\n✅ Similarity index working!")
@@ -0,0 +1,454 @@
+"""
+Single-Flight Request Coalescing for FlexiUI
+
+When many users send the same request at the same moment, only one upstream
+call runs per key; everyone else waits for it and gets the same result (or
+the same error).
+
+- In one process: threads coordinate through an in-memory table
+- Across worker processes (optional): a lock file per key decides who calls
+  upstream, and the result (or the error, with its type) is handed over
+  through a SQLite row
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - cross-process mode is unavailable
+    fcntl = None
+
+from cache import DEFAULT_DB_PATH
+
+
+class SharedCallError(Exception):
+    """Error raised by a call that ran in another worker process, when its
+    type can't be rebuilt here"""
+
+
+def make_key(*parts):
+    """
+    Build a single-flight key from JSON-serializable parts
+
+    Returns:
+        str: Hex digest
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ============================================
+# IN-FLIGHT CALL
+# ============================================
+
+class _Call:
+    """One running call that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+# ============================================
+# SINGLE FLIGHT
+# ============================================
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time
+    """
+
+    def __init__(self, shared=False, lock_dir=None, db_path=None, result_ttl=30):
+        """
+        Args:
+            shared (bool): Also coalesce across worker processes
+            lock_dir (str): Directory for per-key lock files
+            db_path (str): SQLite file used to hand results to other processes
+            result_ttl (float): Seconds a shared result stays valid for waiters
+        """
+        self.shared = shared and fcntl is not None
+        self.lock_dir = lock_dir or os.path.join(os.path.dirname(DEFAULT_DB_PATH), "locks")
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.result_ttl = result_ttl
+
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self._db_ready = False
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        FLEXIUI_SINGLEFLIGHT_SHARED - "1" coalesces across worker processes
+        """
+        return cls(shared=os.getenv("FLEXIUI_SINGLEFLIGHT_SHARED", "0") == "1")
+
+    # ---------- threads ----------
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) unless the same key is already running
+
+        Args:
+            key (str): Canonical request key
+            func (callable): The upstream call
+
+        Returns:
+            Whatever func returned (shared by every waiter)
+
+        Raises:
+            Whatever func raised (re-raised in every waiter)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.shared:
+                call.result = self._run_shared(key, func, args, kwargs)
+            else:
+                call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    # ---------- asyncio ----------
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """
+        Async version of do() for coroutine functions (one event loop)
+        """
+        future = self._async_calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The leader was cancelled, not this waiter: run the call again
+                return await self.do_async(key, func, *args, **kwargs)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        self.leaders += 1
+        try:
+            result = await func(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+            # Leader cancelled (or interrupted): waiters must not hang
+            if not future.done():
+                future.cancel()
+
+    def stats(self):
+        """Coalescing counters"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "shared_hits": self.shared_hits,
+                "shared": self.shared
+            }
+
+    # ---------- across processes ----------
+
+    def _run_shared(self, key, func, args, kwargs):
+        """
+        Hold the key's lock file while calling upstream; if another process
+        holds it, wait and reuse the result it stores
+
+        The holder removes the lock file when it is done, so lock files
+        don't pile up (one per distinct request ever made).
+        """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+
+        lock_file, waited = self._lock_key(path)
+        try:
+            if waited:
+                found, result, error = self._load_result(key)
+                if found:
+                    self.shared_hits += 1
+                    if error is not None:
+                        raise _decode_error(error)
+                    return result
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._store_result(key, None, _encode_error(e))
+                raise
+            self._store_result(key, result, None)
+            return result
+        finally:
+            os.unlink(path)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _lock_key(path):
+        """
+        Lock a key's lock file
+
+        Returns:
+            tuple: (open lock file, whether another process held it first)
+        """
+        waited = False
+        while True:
+            lock_file = open(path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                waited = True
+            # The previous holder may have removed the file while we waited;
+            # a lock on a removed file excludes nobody, so lock the new one
+            try:
+                current = os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return lock_file, waited
+            lock_file.close()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                if not self._db_ready:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS singleflight_results (
+                            call_key TEXT PRIMARY KEY,
+                            result TEXT,
+                            error TEXT,
+                            created_at REAL NOT NULL
+                        )
+                    """)
+                    self._db_ready = True
+                yield conn
+        finally:
+            conn.close()
+
+    def _store_result(self, key, result, error):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO singleflight_results (call_key, result, error, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), error, now)
+            )
+            conn.execute(
+                "DELETE FROM singleflight_results WHERE created_at < ?",
+                (now - self.result_ttl,)
+            )
+
+    def _load_result(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, error, created_at FROM singleflight_results WHERE call_key = ?",
+                (key,)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.result_ttl:
+            return False, None, None
+        return True, json.loads(row[0]), row[1]
+
+
+# ============================================
+# ERRORS ACROSS PROCESSES
+# ============================================
+
+def _encode_error(error):
+    """Store an exception's type, message and simple attributes as JSON"""
+    attrs = {
+        name: value for name, value in vars(error).items()
+        if isinstance(value, (str, int, float, bool, type(None)))
+    }
+    return json.dumps({
+        "module": type(error).__module__,
+        "type": type(error).__qualname__,
+        "message": str(error),
+        "attrs": attrs
+    })
+
+
+def _decode_error(stored):
+    """
+    Rebuild an exception stored by _encode_error, so followers raise the
+    same type as the leader (e.g. AdmissionRejected with its status and
+    Retry-After)
+
+    Only classes from modules this process has already imported are
+    rebuilt; anything else becomes a SharedCallError.
+    """
+    try:
+        data = json.loads(stored)
+        cls = sys.modules[data["module"]]
+        for name in data["type"].split("."):
+            cls = getattr(cls, name)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return SharedCallError(stored)
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        return SharedCallError(data["message"])
+
+    # Skip the class's __init__ (its signature is unknown) and restore
+    # what it would have set
+    error = cls.__new__(cls)
+    Exception.__init__(error, data["message"])
+    error.__dict__.update(data["attrs"])
+    return error
+
+
+# Shared coalescer used by ai_service
+inflight = SingleFlight.from_env()
+
+# ============================================
+# TEST THE MODULE
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Single-Flight...\n")
+
+    flight = SingleFlight()
+    calls = []
+
+    def slow_call(prompt):
+        calls.append(prompt)
+        time.sleep(0.2)
+        return {"html": f"<p>{prompt}</p>"}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", slow_call, "hi")))
+        for _ in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"1. 20 concurrent requests → {len(calls)} upstream call(s), {len(results)} results")
+
+    def failing_call():
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    errors = []
+
+    def run_failing():
+        try:
+            flight.do("bad", failing_call)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=run_failing) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"2. Errors shared with every waiter: {errors}")
+
+    print(f"3. Stats: {flight.stats()}")
+
+    # A cancelled leader must not leave its waiters hanging
+    async def cancel_leader():
+        started = asyncio.Event()
+
+        async def slow(prompt):
+            started.set()
+            await asyncio.sleep(0.2)
+            return prompt
+
+        leader = asyncio.create_task(flight.do_async("async", slow, "hi"))
+        await started.wait()
+        waiters = [asyncio.create_task(flight.do_async("async", slow, "hi")) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await asyncio.wait_for(asyncio.gather(*waiters), 2)
+
+    try:
+        answers = asyncio.run(cancel_leader())
+        print(f"4. ✅ Waiters of a cancelled leader re-ran the call: {answers}")
+    except asyncio.TimeoutError:
+        print("4. ❌ Waiters hang after the leader was cancelled")
+
+    # Across processes: followers re-raise the leader's error type, and no
+    # lock file is left behind (two instances stand in for two workers)
+    import tempfile
+
+    class Busy(Exception):
+        def __init__(self, message, status):
+            super().__init__(message)
+            self.status = status
+
+    workdir = tempfile.mkdtemp()
+    workers = [
+        SingleFlight(shared=True, lock_dir=os.path.join(workdir, "locks"),
+                     db_path=os.path.join(workdir, "results.db"))
+        for _ in range(2)
+    ]
+
+    def busy_call():
+        time.sleep(0.2)
+        raise Busy("upstream busy", 503)
+
+    raised = []
+
+    def run_busy(worker):
+        try:
+            worker.do("busy", busy_call)
+        except Exception as e:
+            raised.append((type(e).__name__, getattr(e, "status", None)))
+
+    threads = [threading.Thread(target=run_busy, args=(worker,)) for worker in workers]
+    for t in threads:
+        t.start()
+        time.sleep(0.05)
+    for t in threads:
+        t.join()
+    if workers[0].shared:
+        ok = raised == [("Busy", 503)] * 2 and not os.listdir(os.path.join(workdir, "locks"))
+        print(f"5. {'✅' if ok else '❌'} Shared error type kept, lock files removed: {raised}")
+
+    print("\n✅ Single-flight working!")
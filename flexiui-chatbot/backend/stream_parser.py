@@ -0,0 +1,355 @@
+"""
+Incremental Code Parser for streamed AI responses
+
+parse_code_from_response needs the whole response before it can do anything.
+StreamingCodeParser accepts the response chunk by chunk and reports each of
+the "html", "css" and "js" sections the moment its JSON string closes, so the
+preview can render the markup while CSS and JS are still arriving.
+
+It also tolerates a leading ```json fence, and when the JSON is cut off
+(e.g. at max_tokens) it keeps every finished section and salvages the one
+that was being written.
+"""
+
+import re
+import json
+
+SECTIONS = ("html", "css", "js")
+
+# Next character that matters inside a JSON string
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+
+# Incomplete escape at the end of a cut-off string (odd backslashes or a short \u)
+_TRAILING_ESCAPE_RE = re.compile(r'(?<!\\)(?:\\\\)*\\(?:u[0-9a-fA-F]{0,3})?$')
+
+# Parser states
+_START = "start"      # before the opening brace (whitespace, ``` fence)
+_OBJECT = "object"    # inside the top-level object, expecting a key
+_KEY = "key"          # reading a key string
+_COLON = "colon"      # expecting ':'
+_VALUE = "value"      # expecting a value
+_STRING = "string"    # reading a top-level string value
+_SKIP = "skip"        # skipping a nested / non-string value
+_DONE = "done"        # top-level object closed
+_RAW = "raw"          # not JSON - leave it to the fallback parser
+
+
+def _decode_string(raw):
+    # strict=False accepts raw newlines, which models often put in strings
+    return json.loads('"' + raw + '"', strict=False)
+
+# ============================================
+# STREAMING PARSER
+# ============================================
+
+class StreamingCodeParser:
+    """
+    Incremental parser for {"html": ..., "css": ..., "js": ...} responses
+    """
+
+    def __init__(self):
+        self.sections = {}           # finished sections
+        self.partial_sections = []   # sections salvaged from a cut-off string
+        self.complete = False        # True once the top-level object closed
+
+        self._chunks = []
+        self._state = _START
+        self._head = ""              # text seen before the opening brace
+        self._key = None
+        self._parts = []             # raw pieces of the current string
+        self._escape = False         # current string chunk ended inside an escape
+        self._depth = 0              # nesting depth while skipping a value
+        self._skip_in_string = False
+
+    # ---------- public API ----------
+
+    def feed(self, chunk):
+        """
+        Consume the next piece of the response
+
+        Args:
+            chunk (str): New text from the model
+
+        Returns:
+            list: Events like {"section": "html", "value": "..."} for every
+                  section that finished inside this chunk
+        """
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+
+        events = []
+        if self._state in (_DONE, _RAW):
+            return events
+
+        text = chunk
+        pos = 0
+        if self._state == _START:
+            text = self._consume_preamble(chunk)
+            if text is None:
+                return events
+
+        length = len(text)
+        while pos < length:
+            state = self._state
+
+            if state == _STRING or state == _KEY:
+                pos = self._read_string(text, pos, events)
+
+            elif state == _SKIP:
+                pos = self._skip_value(text, pos)
+
+            else:
+                char = text[pos]
+                pos += 1
+                if char.isspace():
+                    continue
+
+                if state == _OBJECT:
+                    if char == '"':
+                        self._state = _KEY
+                    elif char == "}":
+                        self._state = _DONE
+                        self.complete = True
+                        return events
+                    elif char != ",":
+                        self._state = _RAW
+                        return events
+
+                elif state == _COLON:
+                    if char != ":":
+                        self._state = _RAW
+                        return events
+                    self._state = _VALUE
+
+                elif state == _VALUE:
+                    if char == '"':
+                        self._state = _STRING
+                    else:
+                        # Nested object/array or a literal - skip it
+                        self._state = _SKIP
+                        self._depth = 1 if char in "{[" else 0
+                        if self._depth == 0:
+                            pos -= 1
+
+        return events
+
+    def close(self):
+        """
+        Finish parsing
+
+        Returns:
+            dict: html, css and js (missing sections are empty strings), or
+                  None if the response wasn't JSON and nothing was recovered
+        """
+        if self._state == _STRING and self._key in SECTIONS and self._key not in self.sections:
+            raw = _TRAILING_ESCAPE_RE.sub("", "".join(self._parts))
+            try:
+                self.sections[self._key] = _decode_string(raw)
+                self.partial_sections.append(self._key)
+            except ValueError:
+                pass
+            self._parts = []
+
+        if not self.sections and not self.complete:
+            return None
+
+        return {name: self.sections.get(name, "") for name in SECTIONS}
+
+    def text(self):
+        """Everything fed so far"""
+        return "".join(self._chunks)
+
+    # ---------- internals ----------
+
+    def _consume_preamble(self, chunk):
+        """
+        Skip whitespace and an optional ```json fence before the opening brace
+
+        Returns:
+            str: Text after the brace, or None if more input is needed
+        """
+        head = (self._head + chunk).lstrip()
+
+        if head.startswith("```"):
+            newline = head.find("\n")
+            if newline == -1:
+                if len(head) > 20:
+                    self._state = _RAW
+                    return None
+                self._head = head
+                return None
+            head = head[newline + 1:].lstrip()
+
+        if not head:
+            self._head = ""
+            return None
+        if "```".startswith(head):
+            self._head = head
+            return None
+        if head[0] != "{":
+            self._state = _RAW
+            return None
+
+        self._head = ""
+        self._state = _OBJECT
+        return head[1:]
+
+    def _read_string(self, text, pos, events):
+        """Read string content up to the closing quote (or the chunk end)"""
+        start = pos
+        length = len(text)
+
+        if self._escape:
+            # Previous chunk ended with a backslash; this char is escaped
+            self._escape = False
+            pos += 1
+
+        while True:
+            match = _STRING_SPECIAL_RE.search(text, pos)
+            if match is None:
+                self._parts.append(text[start:])
+                return length
+
+            index = match.start()
+            if text[index] == "\\":
+                if index + 1 >= length:
+                    self._parts.append(text[start:])
+                    self._escape = True
+                    return length
+                pos = index + 2
+                continue
+
+            # Closing quote
+            self._parts.append(text[start:index])
+            raw = "".join(self._parts)
+            self._parts = []
+
+            if self._state == _KEY:
+                self._key = _decode_string(raw)
+                self._state = _COLON
+            else:
+                if self._key in SECTIONS:
+                    value = _decode_string(raw)
+                    self.sections[self._key] = value
+                    events.append({"section": self._key, "value": value})
+                self._state = _OBJECT
+            return index + 1
+
+    def _skip_value(self, text, pos):
+        """Skip a nested or literal value without decoding it"""
+        length = len(text)
+        while pos < length:
+            char = text[pos]
+
+            if self._skip_in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._skip_in_string = False
+            elif char == '"':
+                self._skip_in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of a literal: let the object state see the brace
+                    self._state = _OBJECT
+                    return pos
+                self._depth -= 1
+                if self._depth == 0:
+                    self._state = _OBJECT
+                    return pos + 1
+            elif char == "," and self._depth == 0:
+                self._state = _OBJECT
+                return pos
+            pos += 1
+        return pos
+
+
+def parse_stream(chunks):
+    """
+    Parse a whole sequence of chunks
+
+    Args:
+        chunks (iterable): Response pieces
+
+    Returns:
+        tuple: (list of section events, StreamingCodeParser)
+    """
+    parser = StreamingCodeParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events, parser
+
+# ============================================
+# TEST THE MODULE (chunked replays)
+# ============================================
+
+if __name__ == "__main__":
+    print("Testing Streaming Code Parser...\n")
+
+    sample = {
+        "html": '<nav class="navbar">\n  <a href="#">Logo "Brand"</a>\n</nav>',
+        "css": ".navbar { display: flex; content: \"\\2014\"; }",
+        "js": "document.querySelector('.navbar').classList.add('ready');",
+        "notes": {"depth": [1, 2, {"x": "}"}]}
+    }
+    response = "```json\n" + json.dumps(sample, indent=2) + "\n```"
+
+    def replay(text, size):
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    all_ok = True
+
+    # 1. Every chunk size gives the same sections, in order
+    for size in (1, 2, 3, 7, 64, len(response)):
+        events, parser = parse_stream(replay(response, size))
+        result = parser.close()
+        ok = (
+            parser.complete
+            and [e["section"] for e in events] == ["html", "css", "js"]
+            and all(result[name] == sample[name] for name in SECTIONS)
+        )
+        all_ok &= ok
+        print(f"   {'✅' if ok else '❌'} chunk size {size}")
+
+    # 2. html is reported before the css has arrived
+    parser = StreamingCodeParser()
+    cut = response.index('"css"')
+    early = parser.feed(response[:cut])
+    ok = [e["section"] for e in early] == ["html"]
+    all_ok &= ok
+    print(f"   {'✅' if ok else '❌'} html emitted before css arrives")
+
+    # 3. Cut off mid-css: html kept, css salvaged
+    truncated = response[:response.index("display") + 10]
+    _, parser = parse_stream(replay(truncated, 5))
+    result = parser.close()
+    ok = (
+        not parser.complete
+        and result["html"] == sample["html"]
+        and result["css"].startswith(".navbar { disp")
+        and parser.partial_sections == ["css"]
+    )
+    all_ok &= ok
+    print(f"   {'✅' if ok else '❌'} truncated response recovered")
+
+    # 4. Cut off in the middle of an escape sequence
+    truncated = response[:response.index("\\\\2014") + 1]
+    _, parser = parse_stream(replay(truncated, 4))
+    result = parser.close()
+    ok = result["css"].endswith('content: "')
+    all_ok &= ok
+    print(f"   {'✅' if ok else '❌'} dangling escape dropped")
+
+    # 5. Markdown answers are left to the fallback parser
+    _, parser = parse_stream(replay("```html\n<nav></nav>\n```\n```css\nnav { }\n```", 6))
+    ok = parser.close() is None
+    all_ok &= ok
+    print(f"   {'✅' if ok else '❌'} non-JSON response handed to fallback")
+
+    print("\n✅ Streaming parser working!" if all_ok else "\n❌ Streaming parser checks failed")
@@ -0,0 +1,235 @@
+"""
+Checks of the generation path against the fake upstream (fake_groq.py)
+
+Runs the app in-process on a throwaway database.
+
+Usage:
+    python -m pytest test_generation.py
+or, printing ✅/❌ per check:
+    python test_generation.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# app.py reads its configuration at import time
+_workdir = tempfile.mkdtemp(prefix="flexiui-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["FLEXIUI_CACHE_DB"] = os.path.join(_workdir, "cache.db")
+os.environ["FLEXIUI_SIMILARITY_WARM_LIMIT"] = "0"
+os.environ["GROQ_API_KEY"] = "test"
+
+from fake_groq import serve_in_thread, FakeUpstreamConfig
+
+port, _ = serve_in_thread(FakeUpstreamConfig(latency="fixed:0", tokens_per_s=0))
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}"
+
+from app import app, warm_up, save_project
+from models import db, Project
+from sqlalchemy.exc import OperationalError
+from cache import generation_cache
+from similarity import similarity_index
+from prompts import detect_theme
+import ai_service
+
+warm_up(app)
+client = app.test_client()
+
+
+def project_count():
+    with app.app_context():
+        return db.session.query(Project).count()
+
+
+@contextmanager
+def answering(text):
+    """Make upstream calls in the block answer `text` (yields a list counting the calls)"""
+    calls = []
+
+    def complete(messages, model, temperature, budget_key):
+        calls.append(model)
+        return text, 50
+
+    real_complete = ai_service._complete
+    ai_service._complete = complete
+    try:
+        yield calls
+    finally:
+        ai_service._complete = real_complete
+
+
+@contextmanager
+def answering_chat(*answers):
+    """
+    Make client.chat.completions.create calls in the block give `answers` in
+    turn: text, or (text, finish_reason) for an answer cut off at max_tokens
+    """
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["model"])
+        answer = answers[len(calls) - 1]
+        text, finish_reason = answer if isinstance(answer, tuple) else (answer, "stop")
+        choice = SimpleNamespace(message=SimpleNamespace(content=text), finish_reason=finish_reason)
+        return SimpleNamespace(choices=[choice], usage=None)
+
+    real_client = ai_service.client
+    ai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    try:
+        yield calls
+    finally:
+        ai_service.client = real_client
+
+
+def test_identical_requests_save_one_project():
+    """Repeated requests are served from the cache without new projects"""
+    before = project_count()
+    body = {"prompt": "A dark navbar with a logo", "component_type": "navbar"}
+    first = client.post("/api/generate-ui", json=body).get_json()
+    second = client.post("/api/generate-ui", json=body).get_json()
+    assert first["project_id"] is not None and second["project_id"] is None, \
+        f"project_id {first['project_id']}, then {second['project_id']}"
+    assert project_count() == before + 1, f"{project_count() - before} rows for 2 requests"
+
+
+def test_degraded_answer_not_cached():
+    """A degraded answer (cut-off css, no js) is returned but never cached"""
+    entries = generation_cache.stats()["memory_entries"]
+    with answering('{"html": "<footer>Links</footer>", "css": ".footer { colo') as calls:
+        for _ in range(2):
+            code = ai_service.generate_ui_component("A footer with links", "footer")
+    assert code.get("missing_sections") == ["js"], \
+        f"partial {code.get('partial_sections')}, missing {code.get('missing_sections')}"
+    assert len(calls) == 2, f"{len(calls)} upstream calls for 2 requests"
+    assert generation_cache.stats()["memory_entries"] == entries
+
+
+def test_answer_without_code_is_an_error():
+    """An answer without any code is an error: not cached, not saved"""
+    with answering("Sorry, I can't help with that request.") as calls:
+        codes = [ai_service.generate_ui_component("A login form", "form") for _ in range(2)]
+        response = client.post("/api/generate-ui",
+                               json={"prompt": "A login form", "component_type": "form"}).get_json()
+    assert all("error" in code for code in codes) and "error" in response["code"], codes[0]
+    assert len(calls) == 3, f"{len(calls)} upstream calls for 3 requests"
+    assert response["project_id"] is None
+
+
+def test_rejected_patch_falls_back_to_rewrite():
+    """A patch that is empty or edits a section the model wasn't shown falls back to a full rewrite"""
+    current = {"html": "<button>Go</button>", "css": "button { color: blue; }", "js": ""}
+    rewrite = '{"html": "<button>Go</button>", "css": "button { color: red; }", "js": ""}'
+    for patch in ('{"edits": []}',
+                  '{"edits": [{"section": "html", "find": "Go", "replace": "Stop"}]}'):
+        modify_metrics = {}
+        with answering_chat(patch, rewrite) as calls:
+            updated = ai_service.modify_ui_component(current, "Make the button red", modify_metrics)
+        assert modify_metrics.get("mode") == "rewrite", modify_metrics.get("patch_error")
+        assert len(calls) == 2, f"{len(calls)} upstream calls"
+        assert "red" in updated["css"] and updated["html"] == current["html"], updated
+
+
+def test_incomplete_rewrite_not_saved():
+    """A cut-off rewrite is continued, and one that stays incomplete doesn't replace the project"""
+    code = {"html": "<button>Go</button>", "css": "button { color: blue; }", "js": ""}
+    with app.app_context():
+        project_id = save_project("A blue button", "button", code).id
+    body = {"project_id": project_id, "modification": "Make the button red"}
+
+    with answering_chat('{"edits": []}', '{"html": "<button>Go</button>", "css": "button { color: re'):
+        response = client.post("/api/modify-ui", json=body)
+    saved = client.get(f"/api/projects/{project_id}").get_json()["project"]
+    assert response.status_code == 502, response.get_json()
+    assert saved["css_code"] == code["css"], saved["css_code"]
+
+    with answering_chat('{"edits": []}',
+                        ('{"html": "<button>Go</button>", "css": "button { co', "length"),
+                        'lor: red; }", "js": ""}') as calls:
+        response = client.post("/api/modify-ui", json=body)
+    saved = client.get(f"/api/projects/{project_id}").get_json()["project"]
+    assert response.status_code == 200 and len(calls) == 3, response.get_json()
+    assert saved["css_code"] == "button { color: red; }", saved["css_code"]
+
+
+def test_modify_rejects_invalid_project_id():
+    """/api/modify-ui only accepts an integer project_id"""
+    for project_id in ([1], "1", 1.0, True, None):
+        response = client.post("/api/modify-ui", json={"project_id": project_id,
+                                                       "modification": "Make the button red"})
+        assert response.status_code == 400, f"{project_id!r}: {response.status_code}"
+
+
+def test_modified_project_not_served_to_similar_prompts():
+    """Near-duplicates of a modified project's prompt don't get the edited code"""
+    prompt = "A blue button please with rounded corners"
+    code = {"html": "<button>Go</button>", "css": "button { color: blue; }", "js": ""}
+    with app.app_context():
+        project_id = save_project(prompt, "button", code).id
+    similar = "A blue button with rounded corners please"
+    assert similarity_index.find(similar, "button", detect_theme(similar)) == code
+
+    patch = '{"edits": [{"section": "css", "find": "blue", "replace": "red"}]}'
+    with answering_chat(patch):
+        response = client.post("/api/modify-ui", json={"project_id": project_id,
+                                                       "modification": "Make the button red"})
+    assert response.status_code == 200, response.get_json()
+    assert ai_service.lookup_generation(similar, "button")[1] is None
+
+    # Another worker's index still points at the project
+    similarity_index.add(project_id, prompt, "button", detect_theme(prompt))
+    assert ai_service.lookup_generation(similar, "button")[1] is None
+
+
+def test_failed_save_fails_only_its_batch_item():
+    """A database error saving one streamed batch item doesn't end the stream"""
+    prompts = ["A green badge for batch 1", "A broken badge for batch 2", "A grey badge for batch 3"]
+    app_module = sys.modules["app"]
+    real_save = app_module.save_project
+
+    def save(prompt, component_type, code):
+        if "broken" in prompt:
+            raise OperationalError("INSERT INTO projects", {}, Exception("database is locked"))
+        return real_save(prompt, component_type, code)
+
+    app_module.save_project = save
+    try:
+        body = client.post("/api/generate-ui/batch", json={
+            "items": [{"prompt": prompt, "component_type": "badge"} for prompt in prompts],
+            "stream": True
+        }).get_data(as_text=True)
+    finally:
+        app_module.save_project = real_save
+
+    events = {}
+    for message in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        if lines:
+            data = json.loads(lines["data"])
+            events.setdefault(lines["event"], []).append(data)
+    assert "done" in events, f"stream ended after {sorted(events)}"
+    assert [item["index"] for item in events.get("error", [])] == [1], events.get("error")
+    assert "database is locked" in events["error"][0]["error"]
+    saved = sorted(item["index"] for item in events.get("result", []) if item["project_id"])
+    assert saved == [0, 2], events.get("result")
+
+
+if __name__ == "__main__":
+    print("Testing generation...\n")
+
+    failures = 0
+    for name, test in list(globals().items()):
+        if not name.startswith("test_"):
+            continue
+        try:
+            test()
+            print(f"✅ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__doc__}: {e}")
+
+    print(f"\n{'✅ All checks passed' if not failures else f'❌ {failures} check(s) failed'}")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,166 @@
+"""
+Checks of StreamingCodeParser against recorded model responses
+
+Every response is replayed split at random chunk boundaries; the sections,
+the order they're reported in and the salvaged parts must not depend on
+where the stream was cut.
+
+Usage:
+    python -m pytest test_stream_parser.py
+or, printing ✅/❌ per check:
+    python test_stream_parser.py
+"""
+
+import json
+import random
+
+from stream_parser import StreamingCodeParser, SECTIONS, parse_stream
+
+REPLAYS = 200
+
+# Answers as the model sent them
+RECORDED = {
+    "fenced": (
+        '```json\n{\n  "html": "<nav class=\\"navbar\\">\\n  <a href=\\"#\\" class=\\"navbar__logo\\">'
+        'Brand</a>\\n  <ul class=\\"navbar__links\\">\\n    <li><a href=\\"#home\\">Home</a></li>\\n'
+        '    <li><a href=\\"#about\\">About</a></li>\\n  </ul>\\n</nav>",\n'
+        '  "css": ".navbar { display: flex; justify-content: space-between; background: #1f2937; }\\n'
+        '.navbar__links a::after { content: \\"\\\\2014\\"; }",\n'
+        '  "js": "document.querySelectorAll(\'.navbar__links a\').forEach(link => {\\n'
+        '  link.addEventListener(\'click\', () => link.classList.add(\'active\'));\\n});"\n}\n```'
+    ),
+    "compact": (
+        '{"html":"<button class=\\"cta\\">Envoyer \\u2192 \\ud83d\\ude80</button>",'
+        '"css":".cta{padding:12px 24px;border-radius:8px}\\n.cta:hover{transform:scale(1.05)}",'
+        '"js":""}'
+    ),
+    "extra keys": (
+        '{\n  "notes": {"layout": ["grid", {"cols": 3, "gap": "1rem }"}], "dark": true},\n'
+        '  "html": "<div class=\\"grid\\">\\n  <div class=\\"card\\">1</div>\\n</div>",\n'
+        '  "version": 2,\n'
+        '  "css": ".grid { display: grid; grid-template-columns: repeat(3, 1fr); }",\n'
+        '  "js": "console.log(\\"grid ready\\");"\n}'
+    ),
+    "raw newlines": (
+        '{"html": "<footer>\n  <p>&copy; 2024</p>\n</footer>", "css": "footer {\n  color: gray;\n}", '
+        '"js": ""}'
+    ),
+}
+
+# Cut off at max_tokens: (response, finished sections, salvaged section, its start)
+TRUNCATED = {
+    "mid css": (
+        RECORDED["fenced"][:RECORDED["fenced"].index("space-between")],
+        ["html"], "css", ".navbar { display: flex; justify-content: "
+    ),
+    "mid escape": (
+        RECORDED["fenced"][:RECORDED["fenced"].index("\\\\2014") + 1],
+        ["html"], "css", ".navbar { display: flex;"
+    ),
+    "mid unicode escape": (
+        RECORDED["compact"][:RECORDED["compact"].index("\\u2192") + 4],
+        [], "html", '<button class="cta">Envoyer '
+    ),
+}
+
+# Not JSON at all - left to the fallback parser
+MARKDOWN = "Here you go!\n\n```html\n<nav></nav>\n```\n```css\nnav { display: flex; }\n```"
+
+
+def random_chunks(text, rng):
+    """Split text at random boundaries (1 to 40 characters per chunk)"""
+    chunks = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 40)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def replays(text, seed):
+    """Yield (chunks, events, parser) for REPLAYS random splits of text"""
+    rng = random.Random(seed)
+    for _ in range(REPLAYS):
+        chunks = random_chunks(text, rng)
+        events, parser = parse_stream(chunks)
+        yield chunks, events, parser
+
+
+def without_fence(response):
+    return response.strip().removeprefix("```json").removesuffix("```")
+
+
+def test_recorded_responses_parse_at_any_split():
+    """Recorded responses give the same sections whatever the chunk boundaries"""
+    for name, response in RECORDED.items():
+        expected = json.loads(without_fence(response), strict=False)
+        for chunks, events, parser in replays(response, name):
+            result = parser.close()
+            assert parser.complete, f"{name}: not complete after {len(chunks)} chunks"
+            assert [e["section"] for e in events] == [s for s in expected if s in SECTIONS], \
+                f"{name}: events {[e['section'] for e in events]}"
+            assert all(result[s] == expected[s] for s in SECTIONS), f"{name}: {result}"
+            assert parser.text() == response
+
+
+def closing_offsets(text):
+    """Offset of the character that closes each section, from a one-character replay"""
+    parser = StreamingCodeParser()
+    offsets = {}
+    for pos, char in enumerate(text):
+        for event in parser.feed(char):
+            offsets[event["section"]] = pos
+    return offsets
+
+
+def test_sections_reported_as_soon_as_they_close():
+    """Each section is reported by the chunk holding its closing quote"""
+    for name, response in RECORDED.items():
+        closing = closing_offsets(response)
+        for chunks, _, _ in replays(response, name):
+            parser = StreamingCodeParser()
+            start = 0
+            for chunk in chunks:
+                for event in parser.feed(chunk):
+                    section = event["section"]
+                    assert start <= closing[section] < start + len(chunk), \
+                        f"{name}: {section} closes at {closing[section]}, " \
+                        f"reported by chunk {start}-{start + len(chunk)}"
+                start += len(chunk)
+
+
+def test_truncated_responses_salvage_the_open_section():
+    """Cut-off responses keep finished sections and salvage the open one at any split"""
+    for name, (response, finished, salvaged, start) in TRUNCATED.items():
+        for chunks, events, parser in replays(response, name):
+            result = parser.close()
+            assert not parser.complete
+            assert [e["section"] for e in events] == finished, f"{name}: events {events}"
+            assert parser.partial_sections == [salvaged], f"{name}: {parser.partial_sections}"
+            assert result[salvaged].startswith(start) and "\\" not in result[salvaged][-2:], \
+                f"{name}: {result[salvaged]!r}"
+
+
+def test_markdown_left_to_fallback():
+    """A markdown answer is handed to the fallback parser at any split"""
+    for chunks, events, parser in replays(MARKDOWN, "markdown"):
+        assert events == [] and parser.close() is None, f"{len(chunks)} chunks: {events}"
+
+
+if __name__ == "__main__":
+    print("Testing streaming parser replays...\n")
+
+    failures = 0
+    for name, test in list(globals().items()):
+        if not name.startswith("test_"):
+            continue
+        try:
+            test()
+            print(f"✅ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__doc__}: {e}")
+
+    print(f"\n{'✅ All checks passed' if not failures else f'❌ {failures} check(s) failed'}")
+    raise SystemExit(1 if failures else 0)
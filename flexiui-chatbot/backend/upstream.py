@@ -0,0 +1,741 @@
+"""
+Resilient Upstream Client for FlexiUI
+
+Wraps the Groq SDK clients with the policies a single SDK client lacks:
+
+- a tuned keep-alive connection pool per API key (sync), and several small
+  async pools per key (httpcore rescans every connection of a pool each
+  time a request finishes, which gets expensive in one big pool)
+- a deadline per call: every attempt gets the time that is left as its
+  timeout, and nothing is retried past it
+- retries with full-jitter exponential backoff on retryable errors
+  (429, 5xx, connection errors, timeouts), honouring retry-after
+- round-robin over several API keys (GROQ_API_KEYS); a key that got a 429
+  sits out until its retry-after has passed
+- optional hedging of non-streaming calls: if the first attempt hasn't
+  answered after the recent p95 latency, a second one goes to another key
+  and the first answer wins (capped to a share of calls)
+- a circuit breaker: after several upstream failures in a row calls fail
+  fast with UpstreamUnavailable; after a cooldown one probe call decides
+  whether to close it again
+
+The call shape is the SDK's (client.chat.completions.create(...)), plus
+create_async() for the asyncio serving path.
+
+Nothing is built at import or construction: the groq SDK (and httpx) is
+imported and the per-key clients are created on the first call, or by
+connect() from a warm-up hook. A missing API key therefore fails that
+call, not the import of the app. reset() drops the clients after a fork.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+import itertools
+import contextvars
+from collections import deque
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from metrics import count_upstream_event
+
+# Statuses worth another attempt (on the same or another key)
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Connections per async pool (see module docstring)
+ASYNC_POOL_SIZE = 16
+
+
+class UpstreamError(Exception):
+    """The upstream call gave up"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UpstreamUnavailable(UpstreamError):
+    """Circuit breaker is open: the upstream is failing, calls fail fast"""
+
+
+class UpstreamTimeout(UpstreamError):
+    """The call's deadline passed"""
+
+
+def import_sdk():
+    """
+    Import the groq SDK and httpx (the slowest imports of the app)
+
+    Returns:
+        module: groq
+    """
+    import groq
+    return groq
+
+
+def _status(error):
+    # Only SDK errors reach here, so the SDK is already imported
+    return getattr(error, "status_code", None) if isinstance(error, import_sdk().APIStatusError) else None
+
+
+def _retry_after(error):
+    """retry-after of an error response, in seconds (None if absent)"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error):
+    return isinstance(error, import_sdk().APIConnectionError) or _status(error) in RETRYABLE_STATUSES
+
+
+def is_upstream_failure(error):
+    """Errors that say the upstream is unhealthy (429 only says we're too fast)"""
+    status = _status(error)
+    return isinstance(error, import_sdk().APIConnectionError) or (status is not None and status >= 500)
+
+# ============================================
+# CIRCUIT BREAKER AND LATENCY TRACKING
+# ============================================
+
+class CircuitBreaker:
+    """
+    closed -> (failure_threshold failures in a row) -> open
+    open -> (cooldown passed) -> half-open: one probe call is let through
+    half-open -> probe succeeds -> closed / probe fails -> open
+    half-open -> probe ends without a verdict (cancelled) -> open, and the
+    next call probes; a probe that never reports back frees its slot after
+    another cooldown
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, cooldown=10.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go out now"""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.cooldown
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def release(self):
+        """
+        A call ended without a verdict (cancelled, interrupted): if it was
+        the probe, go back to open so the next call probes again
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._probe_started = None
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through"""
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._probe_started = None
+
+    def record_failure(self):
+        """
+        Returns:
+            bool: True if this failure opened the breaker
+        """
+        with self._lock:
+            self.failures += 1
+            self._probe_started = None
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold > 0
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedging delay"""
+
+    def __init__(self, size=200, refresh_every=20):
+        self._samples = deque(maxlen=size)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._cached = {}
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_refresh += 1
+            if self._since_refresh >= self._refresh_every:
+                self._cached = {}
+                self._since_refresh = 0
+
+    def percentile(self, pct, min_samples=20):
+        """
+        Returns:
+            float: pct-th percentile of recent latencies, or None with too
+                   few samples
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            if pct not in self._cached:
+                ordered = sorted(self._samples)
+                self._cached[pct] = ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+            return self._cached[pct]
+
+# ============================================
+# UPSTREAM CLIENT
+# ============================================
+
+class _KeySlot:
+    """One API key with its clients"""
+
+    def __init__(self, index, client, async_clients):
+        self.index = index
+        self.client = client
+        self.async_clients = itertools.cycle(async_clients)
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+
+class UpstreamClient:
+    """
+    Groq chat completions with deadlines, retries, key rotation, hedging
+    and a circuit breaker
+    """
+
+    def __init__(self, api_keys, base_url=None, deadline=60.0, connect_timeout=5.0, retries=2,
+                 backoff=0.25, max_backoff=4.0, pool_size=32, keepalive_expiry=30.0,
+                 async_connections=64, hedge=False, hedge_percentile=95, max_hedge_ratio=0.1,
+                 breaker_failures=5, breaker_cooldown=10.0):
+        """
+        Args:
+            api_keys (list): Groq API keys (used round-robin)
+            base_url (str): API endpoint (None for api.groq.com)
+            deadline (float): Default seconds per call, retries included
+            connect_timeout (float): Seconds to open a connection
+            retries (int): Extra attempts after a retryable error
+            backoff (float): Base of the exponential backoff (seconds)
+            max_backoff (float): Longest single backoff
+            pool_size (int): Keep-alive connections per key (sync path)
+            keepalive_expiry (float): Seconds an idle connection is kept
+            async_connections (int): Connections per key on the async path
+            hedge (bool): Hedge slow non-streaming calls
+            hedge_percentile (int): Recent latency percentile that triggers a hedge
+            max_hedge_ratio (float): Hedges allowed per call (load cap)
+            breaker_failures (int): Failures in a row that open the breaker (0 disables)
+            breaker_cooldown (float): Seconds the breaker stays open
+        """
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.pool_size = pool_size
+
+        # Client settings; the clients themselves are built by connect()
+        self.api_keys = list(api_keys or [None])
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.keepalive_expiry = keepalive_expiry
+        self.async_pools = max(1, -(-async_connections // ASYNC_POOL_SIZE))
+        self._slots = None
+        self._next_slot = None
+        self._slot_lock = threading.Lock()
+
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self.latency = LatencyTracker()
+        self._executor = None
+        self._counts = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                        "deadlines": 0, "short_circuits": 0}
+        self._lock = threading.Lock()
+
+        # Same call shape as the SDK: client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @classmethod
+    def from_env(cls, async_connections=64):
+        """
+        GROQ_API_KEYS                     - comma-separated keys (default GROQ_API_KEY)
+        GROQ_BASE_URL                     - endpoint, e.g. a local fake_groq.py
+        FLEXIUI_UPSTREAM_DEADLINE_S       - seconds per call (default 60)
+        FLEXIUI_UPSTREAM_CONNECT_S        - connect timeout (default 5)
+        FLEXIUI_UPSTREAM_RETRIES          - extra attempts (default 2)
+        FLEXIUI_UPSTREAM_POOL             - keep-alive connections per key (default 32)
+        FLEXIUI_UPSTREAM_KEEPALIVE_S      - idle connection lifetime (default 30)
+        FLEXIUI_UPSTREAM_HEDGE            - 1 to hedge slow calls (default 0)
+        FLEXIUI_UPSTREAM_HEDGE_PERCENTILE - hedge after this latency percentile (default 95)
+        FLEXIUI_UPSTREAM_MAX_HEDGE_RATIO  - hedges per call at most (default 0.1)
+        FLEXIUI_BREAKER_FAILURES          - failures that open the breaker (default 5, 0 = off)
+        FLEXIUI_BREAKER_COOLDOWN_S        - seconds the breaker stays open (default 10)
+        """
+        keys = [key.strip() for key in os.getenv("GROQ_API_KEYS", "").split(",") if key.strip()]
+        return cls(
+            api_keys=keys or [os.getenv("GROQ_API_KEY")],
+            base_url=os.getenv("GROQ_BASE_URL") or None,
+            deadline=float(os.getenv("FLEXIUI_UPSTREAM_DEADLINE_S", 60)),
+            connect_timeout=float(os.getenv("FLEXIUI_UPSTREAM_CONNECT_S", 5)),
+            retries=int(os.getenv("FLEXIUI_UPSTREAM_RETRIES", 2)),
+            pool_size=int(os.getenv("FLEXIUI_UPSTREAM_POOL", 32)),
+            keepalive_expiry=float(os.getenv("FLEXIUI_UPSTREAM_KEEPALIVE_S", 30)),
+            async_connections=async_connections,
+            hedge=os.getenv("FLEXIUI_UPSTREAM_HEDGE", "0") == "1",
+            hedge_percentile=int(os.getenv("FLEXIUI_UPSTREAM_HEDGE_PERCENTILE", 95)),
+            max_hedge_ratio=float(os.getenv("FLEXIUI_UPSTREAM_MAX_HEDGE_RATIO", 0.1)),
+            breaker_failures=int(os.getenv("FLEXIUI_BREAKER_FAILURES", 5)),
+            breaker_cooldown=float(os.getenv("FLEXIUI_BREAKER_COOLDOWN_S", 10)),
+        )
+
+    # ---------- clients ----------
+
+    def connect(self):
+        """Import the SDK and build the per-key clients (once; called by the first call)"""
+        with self._slot_lock:
+            if self._slots is None:
+                self._build_slots()
+
+    def reset(self):
+        """
+        Forget the clients (after a fork: pools and their sockets belong to
+        the parent process); the next call builds new ones
+        """
+        with self._slot_lock:
+            self._slots = None
+            self._next_slot = None
+        self._executor = None
+
+    @property
+    def connected(self):
+        return self._slots is not None
+
+    def _build_slots(self):
+        groq = import_sdk()
+        import httpx
+
+        base_url, pool_size, keepalive_expiry = self.base_url, self.pool_size, self.keepalive_expiry
+        timeout = httpx.Timeout(self.deadline, connect=self.connect_timeout)
+        self._slots = [
+            _KeySlot(
+                index,
+                groq.Groq(api_key=key, base_url=base_url, max_retries=0, http_client=httpx.Client(
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                        keepalive_expiry=keepalive_expiry),
+                    timeout=timeout
+                )),
+                [
+                    groq.AsyncGroq(api_key=key, base_url=base_url, max_retries=0, http_client=httpx.AsyncClient(
+                        limits=httpx.Limits(max_connections=ASYNC_POOL_SIZE,
+                                            max_keepalive_connections=ASYNC_POOL_SIZE,
+                                            keepalive_expiry=keepalive_expiry),
+                        timeout=timeout
+                    ))
+                    for _ in range(self.async_pools)
+                ]
+            )
+            for index, key in enumerate(self.api_keys)
+        ]
+        self._next_slot = itertools.cycle(self._slots)
+
+    # ---------- policy (shared by the sync and async paths) ----------
+
+    def _count(self, name, event=None):
+        with self._lock:
+            self._counts[name] += 1
+        if event:
+            count_upstream_event(event)
+
+    def _slot(self):
+        """Next key in turn, skipping keys cooling down after a 429 if possible"""
+        now = time.monotonic()
+        with self._slot_lock:
+            if self._slots is None:
+                self._build_slots()
+            for _ in range(len(self._slots)):
+                slot = next(self._next_slot)
+                if slot.cooldown_until <= now:
+                    break
+            slot.calls += 1
+        return slot
+
+    def _before_attempt(self, deadline_at):
+        """
+        Returns:
+            float: Seconds left for this attempt
+
+        Raises:
+            UpstreamUnavailable: The breaker is open
+            UpstreamTimeout: The deadline has passed
+        """
+        if not self.breaker.allow():
+            self._count("short_circuits", "short_circuit")
+            raise UpstreamUnavailable(
+                "Upstream temporarily unavailable (circuit open)", self.breaker.retry_after()
+            )
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            self._count("deadlines", "deadline")
+            raise UpstreamTimeout("Upstream deadline exceeded")
+        return remaining
+
+    def _after_failure(self, error, slot, attempt, deadline_at):
+        """
+        Record a failed attempt and decide whether to try again
+
+        Returns:
+            float: Seconds to wait before the next attempt
+
+        Raises:
+            The error itself when it isn't retryable or retries are used up,
+            UpstreamTimeout when the next attempt wouldn't fit the deadline
+        """
+        slot.errors += 1
+        retry_after = _retry_after(error)
+        if _status(error) == 429:
+            slot.cooldown_until = time.monotonic() + (retry_after or 1.0)
+            # Another key may have quota left right now
+            if len(self.api_keys) > 1:
+                retry_after = None
+        if is_upstream_failure(error):
+            if self.breaker.record_failure():
+                count_upstream_event("circuit_open")
+        elif self.breaker.state == CircuitBreaker.HALF_OPEN:
+            # A probe that got an answer (even a 4xx) shows the upstream is up
+            self.breaker.record_success()
+
+        if not is_retryable(error) or attempt >= self.retries:
+            raise error
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        delay = max(delay, retry_after or 0.0)
+        if time.monotonic() + delay >= deadline_at:
+            self._count("deadlines", "deadline")
+            raise UpstreamTimeout("Upstream deadline exceeded", retry_after) from error
+        self._count("retries", "retry")
+        return delay
+
+    def _after_success(self, started, stream):
+        self.breaker.record_success()
+        if not stream:
+            self.latency.add(time.monotonic() - started)
+
+    def _hedge_delay(self, kwargs, remaining):
+        """Seconds after which to hedge this call, or None"""
+        if not self.hedge or kwargs.get("stream"):
+            return None
+        delay = self.latency.percentile(self.hedge_percentile)
+        if delay is None or delay >= remaining:
+            return None
+        with self._lock:
+            if self._counts["hedges"] >= self.max_hedge_ratio * self._counts["calls"]:
+                return None
+        return delay
+
+    # ---------- sync path ----------
+
+    def create(self, deadline=None, admit=None, **kwargs):
+        """
+        chat.completions.create with the resilience policies
+
+        Args:
+            deadline (float): Seconds for this call (default: the client's)
+            admit (callable): Waits for upstream quota (see admission.py).
+                              The caller admits the first attempt; this is
+                              called before every retry and hedge, so they
+                              spend quota too (optional)
+            **kwargs: Passed to the SDK (model, messages, stream, ...)
+
+        Returns:
+            The SDK's ChatCompletion (or Stream when stream=True)
+        """
+        self._count("calls")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            if attempt and admit is not None:
+                admit()
+            remaining = self._before_attempt(deadline_at)
+            slot = self._slot()
+            started = time.monotonic()
+            try:
+                hedge_delay = self._hedge_delay(kwargs, remaining)
+                if hedge_delay is None:
+                    response = slot.client.chat.completions.create(timeout=remaining, **kwargs)
+                else:
+                    response = self._hedged(slot, kwargs, remaining, hedge_delay, admit)
+            except Exception as e:
+                time.sleep(self._after_failure(e, slot, attempt, deadline_at))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._after_success(started, kwargs.get("stream"))
+            return response
+
+    def _hedged(self, slot, kwargs, remaining, hedge_delay, admit=None):
+        """Run the call; if it's slower than hedge_delay, race a second one"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size * 2, thread_name_prefix="upstream-hedge"
+                    )
+
+        def call(target, timeout, admit=None):
+            if admit is not None:
+                admit()
+            return target.client.chat.completions.create(timeout=timeout, **kwargs)
+
+        primary = self._executor.submit(call, slot, remaining)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges", "hedge")
+        # The hedge waits for its own quota, with the request's admission
+        # client and priority (context variables don't follow the thread)
+        hedge = self._executor.submit(
+            contextvars.copy_context().run, call, self._slot(), remaining - hedge_delay, admit
+        )
+        pending = {primary, hedge}
+        error = None
+        # First success wins; the loser finishes in the background
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins", "hedge_win")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    # ---------- async path ----------
+
+    async def create_async(self, deadline=None, admit=None, **kwargs):
+        """Async version of create() (admit is a coroutine function)"""
+        self._count("calls")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            if attempt and admit is not None:
+                await admit()
+            remaining = self._before_attempt(deadline_at)
+            slot = self._slot()
+            started = time.monotonic()
+            try:
+                hedge_delay = self._hedge_delay(kwargs, remaining)
+                if hedge_delay is None:
+                    response = await next(slot.async_clients).chat.completions.create(
+                        timeout=remaining, **kwargs
+                    )
+                else:
+                    response = await self._hedged_async(slot, kwargs, remaining, hedge_delay, admit)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, slot, attempt, deadline_at))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled (e.g. the ASGI client went away): no verdict
+                self.breaker.release()
+                raise
+            self._after_success(started, kwargs.get("stream"))
+            return response
+
+    async def _hedged_async(self, slot, kwargs, remaining, hedge_delay, admit=None):
+        async def call(target, timeout, admit=None):
+            if admit is not None:
+                await admit()
+            return await next(target.async_clients).chat.completions.create(timeout=timeout, **kwargs)
+
+        primary = asyncio.ensure_future(call(slot, remaining))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges", "hedge")
+        hedge = asyncio.ensure_future(call(self._slot(), remaining - hedge_delay, admit))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins", "hedge_win")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ---------- stats ----------
+
+    def stats(self):
+        """Counters, breaker state and per-key usage"""
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "connected": self.connected,
+            "breaker": self.breaker.state,
+            "hedge_delay_s": self.latency.percentile(self.hedge_percentile) if self.hedge else None,
+            "keys": [
+                {"key": slot.index, "calls": slot.calls, "errors": slot.errors,
+                 "cooling_down": slot.cooldown_until > time.monotonic()}
+                for slot in self._slots or ()
+            ]
+        }
+
+# ============================================
+# TEST THE MODULE (against fake_groq.py)
+# ============================================
+
+if __name__ == "__main__":
+    from groq import APIStatusError, APIConnectionError
+    from fake_groq import FakeUpstreamConfig, serve_in_thread, parse_latency
+
+    print("Testing Upstream Client...\n")
+    messages = [{"role": "user", "content": "hello"}]
+
+    def upstream(config, **options):
+        port, _ = serve_in_thread(config)
+        return UpstreamClient(["key-a", "key-b"], base_url=f"http://127.0.0.1:{port}", **options)
+
+    # 1. Retries hide injected 503s
+    client = upstream(FakeUpstreamConfig(latency="fixed:0.01", tokens_per_s=0, error_rate=0.3,
+                                         error_statuses=(503,), seed=4),
+                      retries=4, backoff=0.01, breaker_failures=0)
+    ok = all(client.chat.completions.create(model="fake", messages=messages) for _ in range(30))
+    stats = client.stats()
+    print(f"1. {'✅' if ok and stats['retries'] > 0 else '❌'} 30/30 calls succeeded with "
+          f"{stats['retries']} retries, keys used: {[k['calls'] for k in stats['keys']]}")
+
+    # 2. Deadline
+    client = upstream(FakeUpstreamConfig(latency="fixed:2", tokens_per_s=0))
+    started = time.monotonic()
+    try:
+        client.create(model="fake", messages=messages, deadline=0.3)
+        print("2. ❌ Deadline not enforced")
+    except (UpstreamTimeout, APIConnectionError) as e:
+        print(f"2. ✅ Deadline enforced after {time.monotonic() - started:.2f}s ({type(e).__name__})")
+
+    # 3. Breaker opens, fails fast, then recovers through a probe
+    config = FakeUpstreamConfig(latency="fixed:0", tokens_per_s=0, error_rate=1.0, error_statuses=(500,))
+    client = upstream(config, retries=0, breaker_failures=3, breaker_cooldown=0.3)
+    for _ in range(3):
+        try:
+            client.create(model="fake", messages=messages)
+        except APIStatusError:
+            pass
+    try:
+        client.create(model="fake", messages=messages)
+        fast_fail = False
+    except UpstreamUnavailable:
+        fast_fail = True
+    config.error_rate = 0.0
+    time.sleep(0.35)
+    recovered = client.create(model="fake", messages=messages) is not None
+    ok = fast_fail and recovered and client.breaker.state == CircuitBreaker.CLOSED
+    print(f"3. {'✅' if ok else '❌'} Breaker opened, failed fast, closed after a good probe")
+
+    # 4. Hedging cuts the slow tail
+    config = FakeUpstreamConfig(latency="lognormal:0.02:1.2", tokens_per_s=0, seed=9)
+    plain = upstream(config)
+    hedged = upstream(config, hedge=True, max_hedge_ratio=0.2)
+    tails = {}
+    for name, target in (("plain", plain), ("hedged", hedged)):
+        took = []
+        for _ in range(300):
+            started = time.monotonic()
+            target.create(model="fake", messages=messages)
+            took.append(time.monotonic() - started)
+        took.sort()
+        tails[name] = took[int(len(took) * 0.99)]
+    hedge_stats = hedged.stats()
+    print(f"4. {'✅' if hedge_stats['hedges'] else '❌'} Hedging: p99 {tails['plain'] * 1000:.0f}ms -> "
+          f"{tails['hedged'] * 1000:.0f}ms ({hedge_stats['hedges']} hedges, "
+          f"{hedge_stats['hedge_wins']} won)")
+
+    # 5. Async path
+    async def run_async():
+        target = upstream(FakeUpstreamConfig(latency="fixed:0.05", tokens_per_s=0))
+        return await asyncio.gather(*(
+            target.create_async(model="fake", messages=messages) for _ in range(20)
+        ))
+    answers = asyncio.run(run_async())
+    print(f"5. {'✅' if len(answers) == 20 else '❌'} Async calls: {len(answers)}")
+
+    # 6. A cancelled half-open probe doesn't leave the breaker stuck
+    async def cancel_probe():
+        config = FakeUpstreamConfig(latency="fixed:0", tokens_per_s=0, error_rate=1.0, error_statuses=(500,))
+        target = upstream(config, retries=0, breaker_failures=1, breaker_cooldown=0.5)
+        try:
+            await target.create_async(model="fake", messages=messages)
+        except APIStatusError:
+            pass
+        config.error_rate, config.sample_latency = 0.0, parse_latency("fixed:1")
+        await asyncio.sleep(0.55)
+        probe = asyncio.ensure_future(target.create_async(model="fake", messages=messages))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        config.sample_latency = parse_latency("fixed:0")
+        await target.create_async(model="fake", messages=messages)
+        return target.breaker.state
+    try:
+        state = asyncio.run(cancel_probe())
+    except UpstreamUnavailable as e:
+        state = f"short-circuited ({e})"
+    print(f"6. {'✅' if state == CircuitBreaker.CLOSED else '❌'} Breaker after a cancelled probe: {state}")
+
+    # 7. Retries and hedges go through admission too
+    admitted = []
+    client = upstream(FakeUpstreamConfig(latency="fixed:0", tokens_per_s=0, error_rate=1.0,
+                                         error_statuses=(429,)),
+                      retries=2, backoff=0.01, breaker_failures=0)
+    try:
+        client.create(model="fake", messages=messages, admit=lambda: admitted.append("retry"))
+    except APIStatusError:
+        pass
+    config = FakeUpstreamConfig(latency="lognormal:0.02:1.2", tokens_per_s=0, seed=9)
+    hedged = upstream(config, hedge=True, max_hedge_ratio=0.2)
+    for _ in range(100):
+        hedged.create(model="fake", messages=messages, admit=lambda: admitted.append("hedge"))
+    hedges = hedged.stats()["hedges"]
+    ok = admitted.count("retry") == 2 and hedges and admitted.count("hedge") == hedges
+    print(f"7. {'✅' if ok else '❌'} Admitted 2 retries and {admitted.count('hedge')}/{hedges} hedges")
+
+    print("\n✅ Upstream client working!")